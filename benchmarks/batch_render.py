@@ -0,0 +1,82 @@
+# This file is part of quichem.
+#
+# quichem is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# quichem is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with quichem.  If not, see <http://www.gnu.org/licenses/>.
+"""Measure the throughput and peak memory use of rendering many
+equations into one file with `quichem.tools.batch.render_all`, against
+compiling each equation to a string and writing the joined strings.
+
+    $ python benchmarks/batch_render.py [count]
+
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from modgrammar import ParseError
+
+import quichem.compilers.html
+import quichem.parser
+import quichem.tools.batch
+from benchmarks.parse_throughput import corpus
+
+
+def strings(count):
+    formulas = corpus(1000)
+    return (formulas[index % len(formulas)] for index in range(count))
+
+
+def joined(strings, file_, compiler):
+    """Compile each equation to a string and write them all at once."""
+    parser = quichem.parser.get_parser('predictive')
+    outputs = []
+    for string in strings:
+        try:
+            outputs.append(compiler.compile(
+                quichem.parser.parse(string, parser)))
+        except ParseError:
+            outputs.append('')
+    file_.write('\n'.join(outputs) + '\n')
+
+
+def streamed(strings, file_, compiler):
+    quichem.tools.batch.render_all(strings, file_.write, compiler,
+                                   errors='ignore')
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    compiler = quichem.compilers.html.HtmlCompiler()
+    print('{:>10} {:>8} {:>14} {:>12}'.format(
+        'method', 'count', 'equations/s', 'peak memory'))
+    for function in (joined, streamed):
+        for size in (count // 10, count):
+            with open(os.devnull, 'w') as file_:
+                tracemalloc.start()
+                start = time.perf_counter()
+                function(strings(size), file_, compiler)
+                elapsed = time.perf_counter() - start
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            print('{:>10} {:8} {:14.0f} {:>9.1f} MB'.format(
+                function.__name__, size, size / elapsed, peak / 2 ** 20))
+
+if __name__ == '__main__':
+    main()
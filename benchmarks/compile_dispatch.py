@@ -0,0 +1,77 @@
+# This file is part of quichem.
+#
+# quichem is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# quichem is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with quichem.  If not, see <http://www.gnu.org/licenses/>.
+"""Measure how long the display compilers take to compile large
+equations, with and without the dispatch cache of
+`quichem.compilers.display.DisplayCompiler.handle`.
+
+    $ python benchmarks/compile_dispatch.py [repeat]
+
+"""
+
+from __future__ import print_function
+
+import os
+import random
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import quichem.parser
+from benchmarks.parse_throughput import SEPARATORS, SPECIES
+from quichem.gui.generic import COMPILERS
+
+
+def equation(items, seed=0):
+    random_ = random.Random(seed)
+    parts = [random_.choice(SPECIES)]
+    for _ in range(items - 1):
+        parts += [random_.choice(SEPARATORS), random_.choice(SPECIES)]
+    return ''.join(parts)
+
+
+def scan(compiler):
+    """Make a compiler look up the fragment of each token by scanning
+    its fragments, as it did before the dispatch cache."""
+    def get_fragment(token):
+        return compiler.token_fragments[next(
+            x for x in compiler.token_fragments if isinstance(token, x))]
+    compiler.get_fragment = get_fragment
+    return compiler
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    parser = quichem.parser.make_parser('predictive')
+    print('{:>6} {:>8} {:>12} {:>12} {:>8}'.format(
+        'items', 'chars', 'scan', 'cached', 'speed-up'))
+    for items in (10, 100, 1000):
+        ast = quichem.parser.parse(equation(items), parser)
+        characters = len(COMPILERS['plain'].compile(ast))
+        times = []
+        for compilers in (
+                [scan(type(compiler)()) for compiler in COMPILERS.values()],
+                [type(compiler)() for compiler in COMPILERS.values()]):
+            times.append(min(timeit.repeat(
+                lambda: [compiler.compile(ast) for compiler in compilers],
+                number=1, repeat=repeat)))
+        print('{:6} {:8} {:>9.2f} ms {:>9.2f} ms {:>7.2f}x'.format(
+            items, characters, times[0] * 1e3, times[1] * 1e3,
+            times[0] / times[1]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+# This file is part of quichem.
+#
+# quichem is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# quichem is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with quichem.  If not, see <http://www.gnu.org/licenses/>.
+"""Measure how long the HTML, LaTeX and reStructuredText compilers take
+to compile large equations, merging adjacent subscripts and
+superscripts while compiling, against the regular expressions they
+used to post-process their output with.
+
+Merging costs a little for each token. The reStructuredText compiler is
+slower than before (about 0.8x), as its regular expression was cheap;
+HTML and LaTeX are faster.
+
+    $ python benchmarks/compile_merge.py [repeat]
+
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import quichem.parser
+from benchmarks.compile_dispatch import equation
+from tests.test_compilers import (LEGACY, Unmerged, legacy_html,
+                                  legacy_latex, legacy_rst)
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    parser = quichem.parser.make_parser('predictive')
+    compilers = [(compiler, legacy) for compiler, legacy in LEGACY
+                 if legacy in (legacy_html, legacy_latex, legacy_rst)]
+    print('{:>6} {:>22} {:>12} {:>12} {:>8}'.format(
+        'items', 'compiler', 'regex', 'merge', 'speed-up'))
+    for items in (10, 100, 1000):
+        ast = quichem.parser.parse(equation(items), parser)
+        for compiler, legacy in compilers:
+            unmerged = Unmerged(compiler)
+            times = [min(timeit.repeat(function, number=1, repeat=repeat))
+                     for function in (
+                         lambda: legacy(unmerged.compile(ast)),
+                         lambda: compiler.compile(ast))]
+            print('{:6} {:>22} {:>9.2f} ms {:>9.2f} ms {:>7.2f}x'.format(
+                items, type(compiler).__name__, times[0] * 1e3,
+                times[1] * 1e3, times[0] / times[1]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+# This file is part of quichem.
+#
+# quichem is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# quichem is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with quichem.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Measure the latency of parsing long strings of element symbols.
+
+    $ python benchmarks/element_strings.py [repeat]
+
+"""
+
+from __future__ import print_function
+
+import os
+import random
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import quichem.parser
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    random_ = random.Random(0)
+    symbols = quichem.parser.ELEMENTS.split()
+    # The incremental engine would reuse every item of a string parsed
+    # again, so it is left out.
+    parsers = [(engine, quichem.parser.make_parser(engine))
+               for engine in quichem.parser.ENGINES if engine != 'incremental']
+    columns = [engine for engine, _ in parsers] + ['split']
+    print(('{:>8}' + ' {:>12}' * len(columns)).format('letters', *columns))
+    for count in (10, 40, 160, 640):
+        string = ''.join(random_.choice(symbols) for _ in range(count))
+        times = [min(timeit.repeat(
+            lambda: quichem.parser.parse(string, parser),
+            number=1, repeat=repeat)) for _, parser in parsers]
+        times.append(min(timeit.repeat(
+            lambda: quichem.parser.SEGMENTER.split(string),
+            number=1, repeat=repeat)))
+        print(('{:8}' + ' {:>9.3f} ms' * len(times)).format(
+            len(string), *[time * 1e3 for time in times]))
+
+
+if __name__ == '__main__':
+    main()
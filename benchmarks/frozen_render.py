@@ -0,0 +1,60 @@
+# This file is part of quichem.
+#
+# quichem is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# quichem is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with quichem.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Measure how long compiling equations takes with each compiler
+before and after `quichem.compilers.display.DisplayCompiler.freeze`.
+
+    $ python benchmarks/frozen_render.py [trials]
+
+"""
+
+from __future__ import print_function
+
+import os
+import statistics
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import quichem.parser
+from benchmarks.compile_dispatch import equation
+from quichem.gui.generic import COMPILERS
+
+
+def main():
+    trials = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    parser = quichem.parser.make_parser('predictive')
+    ast = quichem.parser.parse(equation(100), parser)
+    print('{:>16} {:>12} {:>12} {:>8}'.format(
+        'compiler', 'unfrozen', 'frozen', 'speed-up'))
+    for name, compiler in COMPILERS.items():
+        compiler, frozen = type(compiler)(), type(compiler)().freeze()
+        functions = (lambda: compiler.compile(ast),
+                     lambda: frozen.compile(ast))
+        # Alternate between the two and take the medians, which are
+        # less affected by other load on the machine.
+        times = [[], []]
+        for _ in range(trials):
+            for function, function_times in zip(functions, times):
+                function_times.append(timeit.timeit(function, number=10))
+        times = [statistics.median(function_times) / 10
+                 for function_times in times]
+        print('{:>16} {:>9.3f} ms {:>9.3f} ms {:>7.2f}x'.format(
+            name, times[0] * 1e3, times[1] * 1e3, times[0] / times[1]))
+
+if __name__ == '__main__':
+    main()
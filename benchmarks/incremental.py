@@ -0,0 +1,99 @@
+# This file is part of quichem.
+#
+# quichem is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# quichem is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with quichem.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Measure how long updating the output of the GUI takes for each
+keystroke while an equation is edited, parsing and compiling the whole
+equation each time and incrementally.
+
+    $ python benchmarks/incremental.py [items] [trials]
+
+"""
+
+from __future__ import print_function
+
+import os
+import statistics
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import quichem.parser
+from benchmarks.compile_dispatch import equation
+from quichem.compilers.cache import ItemCache
+from quichem.gui.generic import COMPILERS
+
+
+def keystrokes(string):
+    """Return the values of a text box while a species is typed at the
+    end of a string and then in its middle.
+
+    """
+    values = [string + '=2h2o;l'[:end] for end in range(1, 8)]
+    string = values[-1]
+    middle = string.index('=', len(string) // 2) + 1
+    values += [string[:middle] + 'nacl;aq='[:end] + string[middle:]
+               for end in range(1, 9)]
+    return values
+
+
+def main():
+    items = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    trials = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    values = keystrokes(equation(items))
+    predictive = quichem.parser.make_parser('predictive')
+    incremental = quichem.parser.make_parser('incremental')
+    caches = [ItemCache(compiler) for compiler in COMPILERS.values()]
+
+    def full():
+        for value in values:
+            try:
+                ast = quichem.parser.parse(value, predictive)
+            except quichem.parser.modgrammar.ParseError:
+                continue
+            for compiler in COMPILERS.values():
+                compiler.compile(ast)
+
+    def update():
+        for value in values:
+            try:
+                ast = quichem.parser.parse(value, incremental)
+            except quichem.parser.modgrammar.ParseError:
+                continue
+            for cache in caches:
+                cache.compile(ast)
+
+    # Alternate between the two and take the medians, which are less
+    # affected by other load on the machine.
+    times = [[], []]
+    for _ in range(trials):
+        for function, function_times in zip((full, update), times):
+            function_times.append(timeit.timeit(function, number=1))
+    times = [statistics.median(function_times) / len(values)
+             for function_times in times]
+    print('{} items, {} characters, {} keystrokes'.format(
+        items, len(values[0]), len(values)))
+    print('{:>12} {:>12} {:>8}'.format('full', 'incremental', 'speed-up'))
+    print('{:>9.3f} ms {:>9.3f} ms {:>7.2f}x'.format(
+        times[0] * 1e3, times[1] * 1e3, times[0] / times[1]))
+    print('items reused: {:.0%}, output reused: {:.0%}'.format(
+        incremental.hits / (incremental.hits + incremental.misses),
+        sum(cache.hits for cache in caches) /
+        sum(cache.hits + cache.misses for cache in caches)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+# This file is part of quichem.
+#
+# quichem is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# quichem is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with quichem.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Measure the start-up cost paid by the LaTeX tool for every formula.
+
+``quichem.sty`` starts a new Python process for each ``\\qc``, so the
+time of a single cold invocation of ``quichem.tools.latex`` is what a
+document pays per formula.
+
+    $ python benchmarks/latex_startup.py [runs [revision]]
+
+The client of a warm render server (``--socket``) and a hit in the
+on-disk render cache (``--cache``) are measured as well, and all three
+are compared to a cold invocation of the tool as of the given git
+revision (by default, the last one before the parser was shared and
+made faster to build).
+
+"""
+
+from __future__ import print_function
+
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FORMULA = '2cl-aq=2ag=aq-2agcl;s'
+BASELINE = '330edf3'
+
+
+def cold(runs, *commands):
+    """Return the best wall time of running Python with each of the
+    given arguments, with ``quichem`` imported from the given root.
+
+    The commands are run in turn, so that they are timed under the
+    same conditions.
+
+    """
+    times = [float('inf')] * len(commands)
+    for _ in range(runs):
+        for index, (args, root) in enumerate(commands):
+            # Run in `root`, since ``-m`` puts the working directory
+            # first on the module search path.
+            start = time.perf_counter()
+            subprocess.check_call([sys.executable] + args,
+                                  env=dict(os.environ, PYTHONPATH=root),
+                                  cwd=root, stdout=subprocess.DEVNULL)
+            times[index] = min(times[index], time.perf_counter() - start)
+    return times
+
+
+def checkout(revision, directory):
+    """Extract the tree of a git revision of this repository into a
+    directory.
+
+    """
+    archive = subprocess.check_output(['git', 'archive', revision],
+                                      cwd=ROOT)
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        tar.extractall(directory)
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    revision = sys.argv[2] if len(sys.argv) > 2 else BASELINE
+    sys.path.insert(0, ROOT)
+    import quichem.parser
+
+    baseline_root = tempfile.mkdtemp()
+    checkout(revision, baseline_root)
+    command = ['-m', 'quichem.tools.latex', FORMULA]
+    interpreter, imports, baseline, tool = cold(
+        runs, (['-c', 'pass'], ROOT), (['-c', 'import quichem.parser'], ROOT),
+        (command, baseline_root), (command, ROOT))
+    shutil.rmtree(baseline_root)
+    address = os.path.join(tempfile.mkdtemp(), 'quichem.sock')
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'quichem.tools.latex', '--serve',
+         '--socket', address], env=dict(os.environ, PYTHONPATH=ROOT),
+        cwd=ROOT)
+    while not os.path.exists(address):
+        time.sleep(0.01)
+    cache = ['-m', 'quichem.tools.latex', '--cache',
+             os.path.join(os.path.dirname(address), 'cache'), FORMULA]
+    cold(1, (cache, ROOT))
+    client, cached = cold(
+        runs, (['-m', 'quichem.tools.latex', '--socket', address, FORMULA],
+               ROOT), (cache, ROOT))
+    server.terminate()
+    server.wait()
+    shutil.rmtree(os.path.dirname(address))
+    make = min(timeit.repeat(quichem.parser.make_parser, number=1,
+                             repeat=runs))
+    quichem.parser.get_parser()
+    shared = min(timeit.repeat(quichem.parser.get_parser, number=1,
+                               repeat=runs))
+
+    print('cold interpreter:         {:8.2f} ms'.format(interpreter * 1e3))
+    print('cold import parser:       {:8.2f} ms'.format(imports * 1e3))
+    print('{:25} {:8.2f} ms'.format(
+        'cold latex tool ({}):'.format(revision[:7]), baseline * 1e3))
+    for name, time_ in (('cold latex tool:', tool),
+                        ('latex tool client:', client),
+                        ('latex tool cache hit:', cached)):
+        print('{:25} {:8.2f} ms {:6.2f}x'.format(
+            name, time_ * 1e3, baseline / time_))
+    print('make_parser():            {:8.2f} ms'.format(make * 1e3))
+    print('get_parser() (warm):      {:8.4f} ms'.format(shared * 1e3))
+
+
+if __name__ == '__main__':
+    main()
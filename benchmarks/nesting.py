@@ -0,0 +1,95 @@
+# This file is part of quichem.
+#
+# quichem is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# quichem is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with quichem.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Measure how long parsing and compiling deeply nested groups takes,
+and compare compiling them with the recursive traversal that
+`quichem.compilers.compiler.Compiler.compile_counters` replaced.
+
+    $ python benchmarks/nesting.py [trials]
+
+"""
+
+from __future__ import print_function
+
+import os
+import statistics
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import quichem.parser
+import quichem.tokens
+from quichem.compilers.compiler import tokened_strings
+from quichem.compilers.html import HtmlCompiler
+
+
+class RecursiveHtmlCompiler(HtmlCompiler):
+
+    """Compiles groups by recursion, as before."""
+
+    def compile_counters(self, counters, context):
+        for counter in counters:
+            self.compile_counter(counter, context)
+
+    def compile_counter(self, counter, context):
+        if isinstance(counter, quichem.tokens.Element):
+            self.emit(counter, context)
+        elif isinstance(counter, quichem.tokens.Group):
+            self.emit(tokened_strings['open group'](), context)
+            for element in counter.list_:
+                self.compile_counter(element, context)
+            self.emit(tokened_strings['close group'](), context)
+        elif isinstance(counter, quichem.tokens.Counter):
+            self.compile_counter(counter.item, context)
+            self.emit(counter, context)
+
+
+def nested(depth):
+    """Return an item with groups nested to the given depth."""
+    return "k'" * depth + 'fe' + "'2" * depth
+
+
+def median(function, trials):
+    return statistics.median(timeit.repeat(function, number=1,
+                                           repeat=trials))
+
+
+def main():
+    trials = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    parser = quichem.parser.make_parser('predictive')
+    compilers = RecursiveHtmlCompiler().freeze(), HtmlCompiler().freeze()
+    print('{:>6} {:>12} {:>12} {:>12} {:>12}'.format(
+        'depth', 'parse', 'key', 'recursive', 'iterative'))
+    for depth in (10, 100, 300, 1000, 10000):
+        string = nested(depth)
+        ast = quichem.parser.parse(string, parser)
+        times = [median(lambda: quichem.parser.parse(string, parser),
+                        trials),
+                 median(lambda: quichem.tokens.canonical(ast), trials)]
+        for compiler in compilers:
+            try:
+                times.append(median(lambda: compiler.compile(ast), trials))
+            except RecursionError:
+                times.append(None)
+        print('{:6} {}'.format(depth, ' '.join(
+            '{:>12}'.format('-' if time is None else
+                            '{:.3f} ms'.format(time * 1e3))
+            for time in times)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+# This file is part of quichem.
+#
+# quichem is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# quichem is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with quichem.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Compare the ``modgrammar`` parser with and without memoization on
+inputs with nested groups and on long equations.
+
+    $ python benchmarks/packrat.py [repeat]
+
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import quichem.parser
+from parse_throughput import corpus
+
+NESTED = ["'" * depth + 'h2o' + "'2" * depth + suffix
+          for depth in (1, 3, 6) for suffix in ('', '=', ';aq', '=-o2')]
+NESTED.append("ca3'po4'2=ge''nh4'2o'4-k4'fe'cn'6'2=o2")
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    plain = quichem.parser.make_parser()
+    packrat = quichem.parser.make_parser(memoize=True)
+    for name, formulas in (('nested groups', NESTED),
+                           ('long equations', corpus(200)[-140:])):
+        times = [min(timeit.repeat(
+            lambda: [quichem.parser.parse(formula, parser)
+                     for formula in formulas], number=1, repeat=repeat))
+            for parser in (plain, packrat)]
+        packrat.reset_stats()
+        for formula in formulas:
+            quichem.parser.parse(formula, packrat)
+        print('{:16} plain {:8.1f} ms  memoized {:8.1f} ms  ({:.2f}x)  '
+              'hits {} misses {}'.format(
+                  name, times[0] * 1e3, times[1] * 1e3, times[0] / times[1],
+                  packrat.hits, packrat.misses))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+# This file is part of quichem.
+#
+# quichem is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# quichem is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with quichem.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Measure the throughput of `quichem.parser.parse_many` with different
+numbers of worker processes.
+
+    $ python benchmarks/parse_many.py [formulas]
+
+"""
+
+from __future__ import print_function
+
+import multiprocessing
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import quichem.parser
+from parse_throughput import corpus
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    formulas = corpus(size)
+    jobs = 1
+    while True:
+        start = time.perf_counter()
+        for _ in quichem.parser.parse_many(formulas, jobs):
+            pass
+        elapsed = time.perf_counter() - start
+        print('jobs={:<3} {:10.0f} formulas/s'.format(
+            jobs, len(formulas) / elapsed))
+        if jobs >= multiprocessing.cpu_count():
+            break
+        jobs = min(jobs * 2, multiprocessing.cpu_count())
+
+
+if __name__ == '__main__':
+    main()
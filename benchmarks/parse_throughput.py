@@ -0,0 +1,72 @@
+# This file is part of quichem.
+#
+# quichem is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# quichem is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with quichem.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Measure how many formulas per second each parser engine parses.
+
+The corpus is the parser test cases plus longer generated equations.
+
+    $ python benchmarks/parse_throughput.py [repeat]
+
+"""
+
+from __future__ import print_function
+
+import os
+import random
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import quichem.parser
+from tests.test_parser import TEST_CASES
+
+SPECIES = ['h2o', '2cl-aq', 'fe.3=', 'c6h12o6;s', "ca3'po4'2", 'nacl;aq',
+           '3.5o2;g', 'cmgali', 'clina', "ge''nh4'2o'4", 'so4.2-', 'h=;aq']
+SEPARATORS = ['=', '-', '-/', '=/', ';=']
+
+
+def corpus(size=500, seed=0):
+    """Return the test cases followed by generated equations."""
+    random_ = random.Random(seed)
+    formulas = list(TEST_CASES)
+    while len(formulas) < size:
+        parts = [random_.choice(SPECIES)]
+        for _ in range(random_.randint(1, 6)):
+            parts += [random_.choice(SEPARATORS), random_.choice(SPECIES)]
+        formulas.append(''.join(parts))
+    return formulas
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    formulas = corpus()
+    characters = sum(map(len, formulas))
+    times = {}
+    for engine in quichem.parser.ENGINES:
+        parser = quichem.parser.make_parser(engine)
+        times[engine] = min(timeit.repeat(
+            lambda: [quichem.parser.parse(formula, parser)
+                     for formula in formulas], number=1, repeat=repeat))
+        print('{:12} {:10.0f} formulas/s {:10.0f} chars/s'.format(
+            engine, len(formulas) / times[engine],
+            characters / times[engine]))
+    print('speed-up:    {:10.1f}x'.format(
+        times['modgrammar'] / times['predictive']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+# This file is part of quichem.
+#
+# quichem is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# quichem is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with quichem.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Load-test ``quichem-serve`` on localhost.
+
+Starts the service in a new process (unless the URL of a running one is
+given) and renders short equations with several client threads: over
+kept-alive connections, with a new connection for each request, with
+every request answered from the response cache, and in batches.
+
+    $ python benchmarks/serve_load.py [requests] [clients] [url]
+
+"""
+
+from __future__ import print_function
+
+import http.client
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.compile_dispatch import equation
+
+
+TARGET = 'HTML'
+BATCH_SIZE = 50
+
+
+def start_server():
+    """Start the service on a free port, and return the process and its
+    URL once it accepts connections.
+
+    """
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'quichem.tools.serve', '--port', str(port)],
+        env=dict(os.environ, PYTHONPATH=ROOT), stderr=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while True:
+        try:
+            socket.create_connection(('127.0.0.1', port)).close()
+        except OSError:
+            if time.time() > deadline:
+                process.kill()
+                raise
+            time.sleep(0.05)
+        else:
+            return process, 'http://127.0.0.1:{}'.format(port)
+
+
+def client(url, requests, keep_alive, latencies):
+    """Send requests from one client, appending the latency of each to
+    `latencies`. Each request is a (method, path, body) tuple.
+
+    """
+    url = urllib.parse.urlsplit(url)
+    connection = None
+    for method, path, body in requests:
+        start = time.perf_counter()
+        if connection is None:
+            connection = http.client.HTTPConnection(url.hostname, url.port)
+        connection.request(method, path, body)
+        response = connection.getresponse()
+        response.read()
+        if response.status != 200:
+            raise RuntimeError('{} {}'.format(response.status, path))
+        if not keep_alive:
+            connection.close()
+            connection = None
+        latencies.append(time.perf_counter() - start)
+    if connection is not None:
+        connection.close()
+
+
+def load(url, requests, clients, keep_alive=True):
+    """Send requests from several client threads at once.
+
+    Returns
+    -------
+    A tuple of the requests answered per second and the median and 99th
+    percentile latency in seconds.
+
+    """
+    latencies = []
+    threads = [threading.Thread(
+        target=client, args=(url, requests[index::clients], keep_alive,
+                             latencies))
+        for index in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return (len(requests) / elapsed, statistics.median(latencies),
+            latencies[int(len(latencies) * 0.99)])
+
+
+def renders(formulas):
+    return [('GET', '/render?' + urllib.parse.urlencode(
+        {'q': formula, 'target': TARGET}), None) for formula in formulas]
+
+
+def batches(formulas):
+    return [('POST', '/batch?target=' + TARGET,
+             json.dumps(formulas[index:index + BATCH_SIZE]))
+            for index in range(0, len(formulas), BATCH_SIZE)]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    process = None
+    if len(sys.argv) > 3:
+        url = sys.argv[3]
+    else:
+        process, url = start_server()
+    try:
+        # Distinct formulas, so that only the cached run hits the
+        # response cache. Each run uses its own seeds.
+        def formulas(run):
+            return [equation(5, seed=run * count + index)
+                    for index in range(count)]
+
+        runs = [
+            ('keep-alive', renders(formulas(0)), True),
+            ('new connections', renders(formulas(1)), False),
+            ('cached', renders(formulas(0)), True),
+            ('batch of {}'.format(BATCH_SIZE), batches(formulas(2)), True),
+        ]
+        print('{} formulas, {} clients'.format(count, clients))
+        print('{:>16} {:>12} {:>10} {:>10}'.format(
+            '', 'formulas/s', 'p50 ms', 'p99 ms'))
+        for name, requests, keep_alive in runs:
+            rate, median, p99 = load(url, requests, clients, keep_alive)
+            rate *= count / len(requests)
+            print('{:>16} {:>12.0f} {:>10.2f} {:>10.2f}'.format(
+                name, rate, median * 1e3, p99 * 1e3))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == '__main__':
+    main()
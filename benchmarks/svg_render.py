@@ -0,0 +1,58 @@
+# This file is part of quichem.
+#
+# quichem is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# quichem is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with quichem.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Measure how many equation images per second
+`quichem.compilers.svg.SvgCompiler` makes, with and without parsing.
+
+    $ python benchmarks/svg_render.py [repeat]
+
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import quichem.parser
+from benchmarks.parse_throughput import corpus
+from quichem.compilers.svg import SvgCompiler
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    formulas = corpus(2000)
+    parser = quichem.parser.make_parser('predictive')
+    asts = [quichem.parser.parse(formula, parser)
+            for formula in formulas]
+    compilers = (('unfrozen', SvgCompiler()),
+                 ('frozen', SvgCompiler().freeze()))
+    print('{:>10} {:>16} {:>16}'.format(
+        'compiler', 'compile', 'parse+compile'))
+    for name, compiler in compilers:
+        times = [min(timeit.repeat(function, number=1, repeat=repeat))
+                 for function in (
+                     lambda: [compiler.compile(ast) for ast in asts],
+                     lambda: [compiler.compile(quichem.parser.parse(
+                         formula, parser)) for formula in formulas])]
+        print('{:>10} {:>12.0f} /s {:>12.0f} /s'.format(
+            name, *(len(formulas) / time for time in times)))
+
+
+if __name__ == '__main__':
+    main()
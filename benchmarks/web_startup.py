@@ -0,0 +1,129 @@
+# This file is part of quichem.
+#
+# quichem is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# quichem is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with quichem.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Measure how long loading the web files of the GUI takes in a new
+interpreter: importing a generated module holding all of them as a
+byte literal, as the PySide front-end used to, and opening
+`quichem.gui.resources.web_archive` to read the files the output page
+needs first.
+
+The generated module is written to a temporary directory, and imported
+both from source (as on the first run, when it is parsed and compiled)
+and from bytecode. Times and private memory (resident memory not backed
+by a file, measured on Linux only) do not include those of starting the
+interpreter. The pages of the archive are backed by the file, so the
+system can share and drop them.
+
+    $ python benchmarks/web_startup.py [trials]
+
+"""
+
+from __future__ import print_function
+
+import os
+import py_compile
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from quichem.gui.resources import web_archive
+
+
+FIRST_FILES = ['web/page.html', 'web/MathJax/MathJax.js']
+
+
+def write_module(directory):
+    """Write a module like the one ``pyside-rcc`` generates from
+    ``web.qrc`` into a directory, without the calls into Qt.
+
+    """
+    archive = web_archive()
+    data = b''.join(bytes(archive.read(name))
+                    for name in sorted(archive.names()))
+    path = os.path.join(directory, 'eager_web.py')
+    with open(path, 'w') as file_:
+        file_.write('qt_resource_data = {!r}\n'.format(data))
+    return path
+
+
+def run(code, directory, dont_write_bytecode=False):
+    """Run Python code in a new interpreter.
+
+    Returns
+    -------
+    A tuple of the time taken in seconds and the private memory of the
+    interpreter at the end in kilobytes (or 0 if it cannot be
+    measured).
+
+    """
+    code += ("\nimport os\ntry:\n    with open('/proc/self/statm') as f:\n"
+             "        resident, shared = map(int, f.read().split()[1:3])\n"
+             "    pages = resident - shared\n"
+             "except IOError:\n    pages = 0\n"
+             "print(pages * os.sysconf('SC_PAGE_SIZE') // 1024)")
+    command = [sys.executable, '-c', code]
+    if dont_write_bytecode:
+        command.insert(1, '-B')
+    start = time.perf_counter()
+    output = subprocess.check_output(command, cwd=directory,
+                                     env=dict(os.environ, PYTHONPATH=ROOT))
+    return time.perf_counter() - start, int(output)
+
+
+def main():
+    trials = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    directory = tempfile.mkdtemp()
+    try:
+        source = write_module(directory)
+        cache = os.path.join(directory, 'compiled')
+        os.mkdir(cache)
+        py_compile.compile(source, os.path.join(cache, 'eager_web.pyc'))
+        codes = [
+            ('interpreter', 'pass', {}),
+            ('module from source', 'import eager_web',
+             {'dont_write_bytecode': True}),
+            ('module from bytecode', 'import sys; sys.path.insert(0, '
+             "'compiled'); import eager_web", {}),
+            ('memory-mapped archive',
+             'from quichem.gui.resources import web_archive; '
+             'archive = web_archive(); '
+             '[bytes(archive.read(name)) for name in {!r}]'.format(
+                 FIRST_FILES), {}),
+        ]
+        times = dict((name, []) for name, _, _ in codes)
+        for _ in range(trials):
+            # Alternate the variants so that they see the same noise.
+            for name, code, kw in codes:
+                times[name].append(run(code, directory, **kw))
+    finally:
+        shutil.rmtree(directory)
+    base = [statistics.median(column) for column in zip(*times['interpreter'])]
+    print('{} trials, {:.1f} ms and {} kB to start the interpreter'.format(
+        trials, base[0] * 1e3, base[1]))
+    for name, _, _ in codes[1:]:
+        time_, memory = [statistics.median(column)
+                         for column in zip(*times[name])]
+        print('{:>24}: {:8.1f} ms {:8} kB'.format(
+            name, (time_ - base[0]) * 1e3, memory - base[1]))
+
+
+if __name__ == '__main__':
+    main()
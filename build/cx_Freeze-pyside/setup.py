@@ -26,6 +26,7 @@ build_exe_options = {
                   '_hashlib', '_lzma', '_socket', '_ssl'],
      'optimize': 2,
      'compressed': True,
+     'include_files': [('../../quichem/gui/web.tar', 'web.tar')],
      'include_msvcr': True,
      }
 
@@ -0,0 +1,160 @@
+# This file is part of quichem.
+#
+# quichem is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# quichem is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with quichem.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Caching compiled output."""
+
+
+from __future__ import unicode_literals
+
+import collections
+import threading
+
+from quichem import tokens
+
+
+class OutputCache(object):
+
+    """Bounded cache of compiled output, keyed by the canonical key of
+    the compiled AST (see `quichem.tokens.canonical`) and the compiler,
+    which discards the least recently used output first.
+
+    Inputs which are written differently but parse to the same tokens
+    share one cached output for each compiler. The cache may be used
+    from several threads.
+
+    Parameters
+    ----------
+    max_entries : int
+        The maximum number of cached outputs.
+
+    Attributes
+    ----------
+    hits : int
+        The number of lookups which found a cached output.
+    misses : int
+        The number of lookups which did not.
+
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def hit_rate(self):
+        """The fraction of lookups which found a cached output."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def clear(self):
+        """Remove all outputs and reset the statistics."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def compile(self, ast, compiler):
+        """Return the output of the given compiler for an AST,
+        compiling it only if it is not cached.
+
+        Returns
+        -------
+        The output of ``compiler.compile(ast)``, shared with other
+        callers. It must not be modified.
+
+        """
+        key = tokens.canonical(ast), compiler
+        with self._lock:
+            try:
+                output = self._entries[key]
+            except KeyError:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return output
+        output = compiler.compile(ast)
+        with self._lock:
+            self._entries[key] = output
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return output
+
+
+class ItemCache(object):
+
+    """Compiles successive ASTs with one compiler, reusing the output of
+    the items and separators each AST shares with the AST before it.
+
+    Tokens are shared if they are the same objects, like the items a
+    `quichem.predictive.IncrementalParser` reuses. The output of each
+    token is kept as returned by ``compiler.prerender`` and replayed
+    into the result of the next AST, so the output is the same as that
+    of ``compiler.compile(ast)``. Not for use from several threads.
+
+    Parameters
+    ----------
+    compiler : quichem.compilers.compiler.Compiler
+
+    Attributes
+    ----------
+    compiler : quichem.compilers.compiler.Compiler
+    hits : int
+        The number of tokens whose output was reused.
+    misses : int
+        The number of tokens which were compiled.
+
+    """
+
+    def __init__(self, compiler):
+        self.compiler = compiler
+        self.clear()
+
+    def clear(self):
+        """Forget the output of the last AST and reset the
+        statistics.
+
+        """
+        # Maps the id of each token of the last AST to the token and
+        # its output. Holding the token keeps the id from being reused.
+        self._outputs = {}
+        self.hits = self.misses = 0
+
+    def compile(self, ast):
+        """Return the output of the compiler for an AST."""
+        compiler = self.compiler
+        previous = self._outputs
+        entries = {}
+        outputs = []
+        for token in ast:
+            entry = previous.get(id(token))
+            if entry is None:
+                self.misses += 1
+                entry = token, compiler.prerender(token)
+            else:
+                self.hits += 1
+            entries[id(token)] = entry
+            outputs.append(entry[1])
+        self._outputs = entries
+        context = compiler.start()
+        compiler.replay(outputs, context)
+        return compiler.finish(context)
+
+
+OUTPUT_CACHE = OutputCache()
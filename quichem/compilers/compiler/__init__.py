@@ -18,17 +18,35 @@
 
 from __future__ import unicode_literals
 
-from quichem.tokens import Counter, Element, Group, Item, Separator
+from quichem.tokens import Group, Item, Separator
 import quichem.tokens
 from quichem.compilers.compiler import flat_tokens
 
 
+class Context(object):
+
+    """The state of a single call to `Compiler.compile`.
+
+    Compilers keep no state of their own while compiling, so a compiler
+    may compile several ASTs at once (such as in different threads).
+
+    Attributes
+    ----------
+    result : list
+        The output for the tokens compiled so far.
+
+    """
+
+    def __init__(self):
+        self.result = []
+
+
 class Compiler(object):
 
     """Abstract compiler for `quichem` ASTs."""
 
     def __init__(self):
-        self.result = None
+        pass
 
     def compile(self, ast):
         """Compile a `quichem` AST into the desirable output type.
@@ -36,32 +54,73 @@ class Compiler(object):
         By default, return a list of compiled tokens.
 
         """
-        self.result = []
+        context = self.start()
+        self.traverse(ast, context)
+        return self.finish(context)
+
+    def start(self):
+        """Return a new `Context` for compiling an AST."""
+        return Context()
+
+    def finish(self, context):
+        """Return the output for the AST compiled in the given
+        context.
+
+        """
+        return context.result
+
+    def traverse(self, ast, context):
+        """Emit each token of a `quichem` AST in order."""
         for token in ast:
             if isinstance(token, Separator):
-                self.result.append(self.handle(token))
+                self.emit(token, context)
             elif isinstance(token, Item):
-                self.result.append(self.handle(token.coefficient))
-                for counter in token.compound.list_:
-                    self.compile_counter(counter)
-                self.result.append(self.handle(token.charge))
-                self.result.append(self.handle(token.state))
+                self.emit(token.coefficient, context)
+                self.compile_counters(token.compound.list_, context)
+                self.emit(token.charge, context)
+                self.emit(token.state, context)
             else:
                 raise Exception('Invalid token in AST.')
-        return self.result
-
-    def compile_counter(self, counter):
-        """Recursively compile a counter."""
-        if isinstance(counter, Element):
-            self.result.append(self.handle(counter))
-        elif isinstance(counter, Group):
-            self.result.append(self.handle(tokened_strings['open group']()))
-            for element in counter.list_:
-                self.compile_counter(element)
-            self.result.append(self.handle(tokened_strings['close group']()))
-        elif isinstance(counter, Counter):
-            self.compile_counter(counter.item)
-            self.result.append(self.handle(counter))
+
+    def compile_counter(self, counter, context):
+        """Compile a counter."""
+        self.compile_counters((counter,), context)
+
+    def compile_counters(self, counters, context):
+        """Compile a list of counters, and the contents of the groups
+        they contain.
+
+        Groups are compiled with an explicit stack rather than by
+        recursion, so any depth of nesting can be compiled.
+
+        """
+        # The counters left to compile in each enclosing group, and the
+        # counter of the group.
+        stack = []
+        counters = iter(counters)
+        while True:
+            for counter in counters:
+                item = counter.item
+                if isinstance(item, Group):
+                    self.emit(tokened_strings['open group'](), context)
+                    stack.append((counters, counter))
+                    counters = iter(item.list_)
+                    break
+                self.emit(item, context)
+                self.emit(counter, context)
+            else:
+                if not stack:
+                    return
+                counters, counter = stack.pop()
+                self.emit(tokened_strings['close group'](), context)
+                self.emit(counter, context)
+
+    def emit(self, token, context):
+        """Add the output for a given individual token to the result
+        in the given context.
+
+        """
+        context.result.append(self.handle(token))
 
     def handle(self, token):
         """Return the desirable output for a given individual token.
@@ -71,6 +130,50 @@ class Compiler(object):
         """
         raise NotImplementedError
 
+    def prerender(self, token):
+        """Return the output for an item or separator of an AST in a
+        form which `replay` adds to the result in any context.
+
+        The output can be kept and replayed for each AST the token is
+        part of, instead of compiling the token again (see
+        `quichem.compilers.cache.ItemCache`).
+
+        """
+        return [self.handle(emitted) for emitted in flatten(token)]
+
+    def replay(self, outputs, context):
+        """Add the outputs returned by `prerender` for the tokens of an
+        AST to the result in the given context, as `traverse` would
+        have added the output of the tokens.
+
+        """
+        for output in outputs:
+            context.result.extend(output)
+
+
+class _Flattener(Compiler):
+
+    """Collects the tokens emitted by `Compiler.traverse` in a list
+    passed as the context.
+
+    """
+
+    def emit(self, token, context):
+        context.append(token)
+
+
+_FLATTENER = _Flattener()
+
+
+def flatten(token):
+    """Return the list of tokens `Compiler.traverse` emits for an item
+    or separator of an AST.
+
+    """
+    emitted = []
+    _FLATTENER.traverse((token,), emitted)
+    return emitted
+
 
 tokened_strings = {
     'separator': quichem.tokens.Separator,
@@ -16,10 +16,75 @@
 
 from __future__ import unicode_literals
 
-from quichem.compilers.compiler import Compiler, tokened_strings
+from quichem.compilers.compiler import (Compiler, Context, flatten,
+                                        tokened_strings)
 from quichem.compilers.display import fragments
 
 
+class DisplayContext(Context):
+
+    """The state of a single call to `DisplayCompiler.compile` or
+    `DisplayCompiler.compile_to`.
+
+    Output is held back in ``pending`` until it is known that the
+    output after it will not be merged into it, and then written.
+
+    Parameters
+    ----------
+    write : callable
+        Called with each string of output. Defaults to appending to
+        ``result``.
+
+    Attributes
+    ----------
+    result : list
+        The strings written so far, or None if `write` was given.
+    write : callable
+    pending : string
+        The output which has not been written yet.
+    script : tuple
+        The ``script`` of the fragment whose output ends ``pending``,
+        if the output is a run of that script; otherwise None.
+
+    """
+
+    def __init__(self, write=None):
+        Context.__init__(self)
+        if write is None:
+            write = self.result.append
+        else:
+            self.result = None
+        self.write = write
+        self.pending = ''
+        self.script = None
+
+
+# The most states of a context for which `DisplayCompiler.replay`
+# remembers the effect of adding the same output.
+_MAX_EFFECTS = 64
+
+
+class Prerendered(object):
+
+    """The output of the display fragments for an item or separator of
+    an AST, returned by `DisplayCompiler.prerender`.
+
+    Attributes
+    ----------
+    outputs : list
+        Pairs of a display fragment and its output, in order.
+    effects : dict
+        Used by `DisplayCompiler.replay`.
+
+    """
+
+    __slots__ = ('outputs', 'effects')
+
+    def __init__(self, outputs):
+        self.outputs = outputs
+        self.effects = {}
+
+
 class DisplayCompiler(Compiler):
 
     """Generic compiler for rendering to displayable text formats.
@@ -32,6 +97,21 @@ class DisplayCompiler(Compiler):
         Maps between token class objects and display fragments. The
         display fragment objects are the same objects as those stored
         in ``fragments``.
+    dispatch : dict
+        Maps the classes of the tokens handled so far to display
+        fragments. Filled in from ``token_fragments`` the first time a
+        token of each class is handled, using the nearest class in its
+        method resolution order. Must be cleared if
+        ``token_fragments`` is changed.
+    prefix, suffix : string
+        Written before and after the output for each AST.
+
+    Notes
+    -----
+    Adjacent runs of the same script (see
+    `fragments.DisplayFragment`), such as the subscripts of a counter
+    and a state, are merged into one run as they are added to the
+    result.
 
     """
 
@@ -48,13 +128,223 @@ class DisplayCompiler(Compiler):
             'close group': fragments.OpenCloseGroup()}
         self.token_fragments = {tokened_strings[string]: fragment for
                                 string, fragment in self.fragments.items()}
+        self.dispatch = {}
+        self.prefix = ''
+        self.suffix = ''
 
     def compile(self, ast):
         """Compile a `quichem` AST into a string of the compiled
         tokens.
 
         """
-        return ''.join(Compiler.compile(self, ast))
+        return Compiler.compile(self, ast)
+
+    def compile_to(self, ast, write):
+        """Compile a `quichem` AST, passing the output to `write` in
+        pieces instead of joining it into a string.
+
+        Parameters
+        ----------
+        ast : list
+        write : callable
+            Called with each string of output, such as the ``write``
+            method of a file.
+
+        """
+        context = self.start(write)
+        self.traverse(ast, context)
+        self.finish(context)
+
+    def compile_iter(self, ast):
+        """Compile a `quichem` AST, yielding the output in pieces.
+
+        The AST is compiled one item or separator at a time, as the
+        pieces are consumed.
+
+        """
+        pieces = []
+        context = self.start(pieces.append)
+        for token in ast:
+            self.traverse((token,), context)
+            for piece in pieces:
+                yield piece
+            del pieces[:]
+        self.finish(context)
+        for piece in pieces:
+            yield piece
+
+    def start(self, write=None):
+        """Return a new `DisplayContext` for compiling an AST, writing
+        the output with `write` (see `DisplayContext`).
+
+        """
+        context = DisplayContext(write)
+        if self.prefix:
+            context.write(self.prefix)
+        return context
+
+    def finish(self, context):
+        """Write the output which has been held back in the given
+        context.
+
+        Returns
+        -------
+        The whole output as a string, or None if the context was given
+        its own `write`.
+
+        """
+        if context.pending:
+            context.write(context.pending)
+        if self.suffix:
+            context.write(self.suffix)
+        if context.result is not None:
+            return ''.join(context.result)
+
+    def emit(self, token, context):
+        fragment = self.get_fragment(token)
+        self.add(fragment, fragment.render(token), context)
+
+    def add(self, fragment, output, context):
+        """Add the output of a display fragment to the result in the
+        given context, merging it with the output before it if both
+        are runs of the same script.
+
+        """
+        if not output:
+            return
+        script = fragment.script
+        if script is not None and not (output.startswith(script[0]) and
+                                       output.endswith(script[1])):
+            script = None
+        if script is not None and script == context.script:
+            context.pending = (context.pending[:-len(script[1])] +
+                               output[len(script[0]):])
+        else:
+            if context.pending:
+                context.write(context.pending)
+            context.pending = self.join(context.pending, output)
+        context.script = script
+
+    def join(self, previous, output):
+        """Return the output of a display fragment as it should be
+        written after the output before it.
+
+        By default, return `output` unchanged.
+
+        """
+        return output
 
     def handle(self, token):
-        return self.token_fragments[next(x for x in self.token_fragments if isinstance(token, x))].render(token)
+        return self.get_fragment(token).render(token)
+
+    def prerender(self, token):
+        outputs = []
+        for emitted in flatten(token):
+            fragment = self.get_fragment(emitted)
+            outputs.append((fragment, fragment.render(emitted)))
+        return Prerendered(outputs)
+
+    def replay(self, outputs, context):
+        """Add the outputs returned by `prerender` for the tokens of an
+        AST to the result in the given context.
+
+        What adding an output writes, and the state of the context
+        afterwards, is remembered for each state of a context it is
+        added in (see `save`), and repeated instead of adding it again
+        when it is next added in the same state.
+
+        """
+        state = self.save(context)
+        if state is None:
+            for output in outputs:
+                for fragment, fragment_output in output.outputs:
+                    self.add(fragment, fragment_output, context)
+            return
+        for output in outputs:
+            try:
+                written, state = output.effects[state]
+            except KeyError:
+                written, state = self.effect(output, state)
+            if written:
+                context.write(written)
+        self.load(context, state)
+
+    def effect(self, output, state):
+        """Add an output returned by `prerender` in a context with the
+        given state, and remember what it writes and the state of the
+        context afterwards.
+
+        Returns
+        -------
+        A tuple of the string written and the state.
+
+        """
+        written = []
+        probe = self.start(written.append)
+        del written[:]
+        self.load(probe, state)
+        for fragment, fragment_output in output.outputs:
+            self.add(fragment, fragment_output, probe)
+        if len(output.effects) == _MAX_EFFECTS:
+            output.effects.clear()
+        effect = output.effects[state] = ''.join(written), self.save(probe)
+        return effect
+
+    def save(self, context):
+        """Return the state of a context between two items or
+        separators, which decides how the output after it is added.
+
+        Returns
+        -------
+        A hashable value to pass to `load`, or None if the state
+        cannot be saved, in which case `replay` adds the output of
+        each fragment again.
+
+        """
+        return context.pending, context.script
+
+    def load(self, context, state):
+        """Restore the state of a context returned by `save`."""
+        context.pending, context.script = state
+
+    def freeze(self):
+        """Replace the ``render`` method of each display fragment with
+        a function specialized for its current settings (see
+        `fragments.DisplayFragment.freeze`).
+
+        The output is unchanged. The fragments must not be changed
+        after the compiler is frozen, except by freezing it again.
+
+        Returns
+        -------
+        The compiler.
+
+        """
+        for fragment in set(self.fragments.values()):
+            fragment.__dict__.pop('render', None)
+            fragment.render = fragment.freeze()
+        return self
+
+    def get_fragment(self, token):
+        """Return the display fragment for the given token."""
+        try:
+            return self.dispatch[type(token)]
+        except KeyError:
+            fragment = self.dispatch[type(token)] = self.find_fragment(
+                type(token))
+            return fragment
+
+    def find_fragment(self, class_):
+        """Return the display fragment for tokens of the given class.
+
+        Raises
+        ------
+        KeyError
+            If no class in the method resolution order of `class_` has
+            a display fragment.
+
+        """
+        for base in class_.__mro__:
+            if base in self.token_fragments:
+                return self.token_fragments[base]
+        raise KeyError(class_)
@@ -18,6 +18,10 @@
 
 from __future__ import unicode_literals
 
+import string
+
+DIGITS = '0123456789'
+
 
 class DisplayFragment(object):
 
@@ -35,12 +39,18 @@ class DisplayFragment(object):
     literals : dict
         Contains rendered outputs for individual symbols within the
         token.
+    script : tuple
+        The opening and closing strings of the run (such as a
+        subscript) which the rendered fragment forms, or None if it
+        does not form one. Adjacent runs with the same ``script`` are
+        merged by the compiler.
 
     """
 
     def __init__(self):
         self.wrap = ()
         self.literals = {}
+        self.script = None
 
     def render(self, token):
         """Render the given token using the literals and wrap defined
@@ -73,6 +83,54 @@ class DisplayFragment(object):
         """
         raise NotImplementedError
 
+    def freeze(self):
+        """Return a function which renders tokens like `render`, but is
+        specialized for the current ``wrap`` and ``literals``.
+
+        The fragment must not be changed while the function is used.
+        Subclasses override this to do as much of the work of `render`
+        as possible in advance; by default, `render` itself is
+        returned.
+
+        """
+        return self.render
+
+    def affixes(self, count):
+        """Split the wrap string for the given number of parts at its
+        format substitutions.
+
+        Returns
+        -------
+        A tuple of the `count` + 1 strings around the parts in the
+        output of `render`, or None if the wrap string does not consist
+        of exactly `count` plain ``{}`` substitutions and literal text.
+
+        """
+        if not self.wrap:
+            return ('',) * (count + 1)
+        if len(self.wrap) < count:
+            return None
+        segments = ['']
+        for text, field, spec, conversion in string.Formatter().parse(
+                self.wrap[count - 1]):
+            segments[-1] += text
+            if field is not None:
+                if field or spec or conversion:
+                    return None
+                segments.append('')
+        if len(segments) != count + 1:
+            return None
+        return tuple(segments)
+
+    def digits(self):
+        """Return a `str.translate` table mapping each digit to its
+        literal, or None if some digit has no literal.
+
+        """
+        if not all(digit in self.literals for digit in DIGITS):
+            return None
+        return {ord(digit): self.literals[digit] for digit in DIGITS}
+
 
 class Separator(DisplayFragment):
 
@@ -88,6 +146,17 @@ class Separator(DisplayFragment):
     def compile_parts(self, token):
         return (self.literals[token.type_],)
 
+    def freeze(self):
+        affixes = self.affixes(1)
+        if affixes is None:
+            return DisplayFragment.freeze(self)
+        outputs = {type_: affixes[0] + literal + affixes[1]
+                   for type_, literal in self.literals.items()}
+
+        def render(token):
+            return outputs[token.type_]
+        return render
+
 
 class Coefficient(DisplayFragment):
 
@@ -107,6 +176,20 @@ class Coefficient(DisplayFragment):
             return (token.numerator,)
         return (token.numerator, token.denominator)
 
+    def freeze(self):
+        whole, fraction = self.affixes(1), self.affixes(2)
+        if whole is None or fraction is None:
+            return DisplayFragment.freeze(self)
+
+        def render(token):
+            if token.denominator == '1':
+                if token.numerator == '1':
+                    return ''
+                return whole[0] + token.numerator + whole[1]
+            return (fraction[0] + token.numerator + fraction[1] +
+                    token.denominator + fraction[2])
+        return render
+
 
 class Charge(DisplayFragment):
 
@@ -127,6 +210,24 @@ class Charge(DisplayFragment):
         sign = self.literals[token.sign]
         return (value + sign,)
 
+    def freeze(self):
+        affixes, digits = self.affixes(1), self.digits()
+        if affixes is None or digits is None:
+            return DisplayFragment.freeze(self)
+        prefix, suffix = affixes
+        literals = dict(self.literals)
+        ones = {sign: prefix + literal + suffix
+                for sign, literal in literals.items()}
+
+        def render(token):
+            if token.value == '0':
+                return ''
+            if token.value == '1':
+                return ones[token.sign]
+            return (prefix + token.value.translate(digits) +
+                    literals[token.sign] + suffix)
+        return render
+
 
 class State(DisplayFragment):
 
@@ -146,6 +247,21 @@ class State(DisplayFragment):
             return (self.literals['l'],)
         return (token.state,)
 
+    def freeze(self):
+        affixes = self.affixes(1)
+        if affixes is None or 'l' not in self.literals:
+            return DisplayFragment.freeze(self)
+        prefix, suffix = affixes
+        liquid = prefix + self.literals['l'] + suffix
+
+        def render(token):
+            if token.state == '':
+                return ''
+            if token.state == 'l':
+                return liquid
+            return prefix + token.state + suffix
+        return render
+
 
 class Element(DisplayFragment):
 
@@ -162,6 +278,21 @@ class Element(DisplayFragment):
     def compile_parts(self, token):
         return (token.symbol.title(),)
 
+    def freeze(self):
+        affixes = self.affixes(1)
+        if affixes is None:
+            return DisplayFragment.freeze(self)
+        outputs = {}
+
+        def render(token):
+            try:
+                return outputs[token.symbol]
+            except KeyError:
+                output = outputs[token.symbol] = (
+                    affixes[0] + token.symbol.title() + affixes[1])
+                return output
+        return render
+
 
 class Counter(DisplayFragment):
 
@@ -178,6 +309,18 @@ class Counter(DisplayFragment):
             return ()
         return (''.join(self.literals[number] for number in token.count),)
 
+    def freeze(self):
+        affixes, digits = self.affixes(1), self.digits()
+        if affixes is None or digits is None:
+            return DisplayFragment.freeze(self)
+        prefix, suffix = affixes
+
+        def render(token):
+            if token.count == '1':
+                return ''
+            return prefix + token.count.translate(digits) + suffix
+        return render
+
 
 class OpenCloseGroup(DisplayFragment):
 
@@ -193,3 +336,13 @@ class OpenCloseGroup(DisplayFragment):
 
     def compile_parts(self, token):
         return (self.literals["'"],)
+
+    def freeze(self):
+        affixes = self.affixes(1)
+        if affixes is None or "'" not in self.literals:
+            return DisplayFragment.freeze(self)
+        output = affixes[0] + self.literals["'"] + affixes[1]
+
+        def render(token):
+            return output
+        return render
@@ -16,8 +16,6 @@
 
 from __future__ import unicode_literals
 
-import re
-
 from quichem.compilers.display import DisplayCompiler
 
 
@@ -38,15 +36,13 @@ class HtmlCompiler(DisplayCompiler):
         for numeral in range(10):
             self.fragments['charge'].literals[str(numeral)] = str(numeral)
         self.fragments['charge'].wrap = ('<sup>{}</sup>',)
+        self.fragments['charge'].script = ('<sup>', '</sup>')
         self.fragments['state'].literals['l'] = '&#x2113;'
         self.fragments['state'].wrap = ('<sub>({})</sub>',)
+        self.fragments['state'].script = ('<sub>', '</sub>')
         for numeral in range(10):
             self.fragments['counter'].literals[str(numeral)] = str(numeral)
         self.fragments['counter'].wrap = ('<sub>{}</sub>',)
+        self.fragments['counter'].script = ('<sub>', '</sub>')
         self.fragments['open group'].literals["'"] = '('
         self.fragments['close group'].literals["'"] = ')'
-
-    def compile(self, ast):
-        # Merge adjacent subscripts and superscripts.
-        return re.sub(r'<(sup|sub)>(.+?)</\1><\1>(.+?)</\1>', r'<\1>\2\3</\1>',
-                      DisplayCompiler.compile(self, ast))
@@ -16,8 +16,6 @@
 
 from __future__ import unicode_literals
 
-import re
-
 from quichem.compilers.display import DisplayCompiler
 
 
@@ -41,31 +39,19 @@ class LatexCompiler(DisplayCompiler):
         for numeral in range(10):
             self.fragments['charge'].literals[str(numeral)] = str(numeral)
         self.fragments['charge'].wrap = ('^{{{}}}{{}}',)
+        self.fragments['charge'].script = ('^{', '}{}')
         self.fragments['state'].literals['l'] = r'\ell'
         self.fragments['state'].wrap = (r'_{{\mathrm{{({})}}}}{{}}',)
         self.fragments['element'].wrap = (r'\mathrm{{{}}}',)
+        self.fragments['element'].script = (r'\mathrm{', '}')
         for numeral in range(10):
             self.fragments['counter'].literals[str(numeral)] = str(numeral)
         self.fragments['counter'].wrap = ('_{{{}}}{{}}',)
+        self.fragments['counter'].script = ('_{', '}{}')
         self.fragments['open group'].literals["'"] = r'\left('
         self.fragments['close group'].literals["'"] = r'\right)'
-
-    def _replace(self, match):
-        """Take a regex match containing adjacent, identical LaTeX
-        commands and combine them into a single command.
-
-        """
-        command = match.group(1)
-        return ''.join(
-            [command, '{',
-             re.sub('\\' + command + r'\{(.*?)\}', r'\1', match.group(0)),
-             '}'])
-
-    def compile(self, ast):
-        # Merge adjacent subscripts, superscripts and \mathrms.
-        return r'\({}\)'.format(re.sub(
-            r'(_|\^|\\mathrm)\{([^{}]+?)\}(?:\{\})?(?:\1\{([^{}]+?)\})+',
-            self._replace, DisplayCompiler.compile(self, ast)))
+        self.prefix = r'\('
+        self.suffix = r'\)'
 
 
 class LatexMhchemV3Compiler(DisplayCompiler):
@@ -92,6 +78,5 @@ class LatexMhchemV3Compiler(DisplayCompiler):
             self.fragments['counter'].literals[str(numeral)] = str(numeral)
         self.fragments['open group'].literals["'"] = '('
         self.fragments['close group'].literals["'"] = ')'
-
-    def compile(self, ast):
-        return r'\ce{{{}}}'.format(DisplayCompiler.compile(self, ast))
+        self.prefix = r'\ce{'
+        self.suffix = '}'
@@ -0,0 +1,150 @@
+# This file is part of quichem.
+#
+# quichem is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# quichem is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with quichem.  If not, see <http://www.gnu.org/licenses/>.
+
+"""MathML compiler."""
+
+
+from __future__ import unicode_literals
+
+from quichem.compilers.compiler import tokened_strings
+from quichem.compilers.display import DisplayCompiler, fragments
+
+
+class Charge(fragments.Charge):
+
+    """Renders the value of a charge as one number, rather than each
+    digit on its own.
+
+    """
+
+    def compile_parts(self, token):
+        if token.value == '0':
+            return ()
+        sign = self.literals[token.sign]
+        if token.value == '1':
+            return (sign,)
+        return ('<mn>{}</mn>{}'.format(token.value, sign),)
+
+    def freeze(self):
+        # The renderer of fragments.Charge assumes its compile_parts.
+        return fragments.DisplayFragment.freeze(self)
+
+
+class MathmlCompiler(DisplayCompiler):
+
+    """MathML compiler.
+
+    Counts, charges and states are written as ``msub`` and ``msup``
+    elements whose base is the element or group before them, and the
+    contents of each group are wrapped in an ``mrow``. The output
+    needs no further processing (such as by MathJax) to be displayed.
+
+    Notes
+    -----
+    The ``script`` of a display fragment is the pair of tags of the
+    element (``msub`` or ``msup``) it is written in. As in other
+    compilers, adjacent runs of the same script are merged, so the
+    count and state of ``o2;g`` share one subscript.
+
+    """
+
+    def __init__(self):
+        DisplayCompiler.__init__(self)
+        self.fragments['charge'] = Charge()
+        self.token_fragments[tokened_strings['charge']] = (
+            self.fragments['charge'])
+        self.fragments['separator'].literals['='] = '+'
+        self.fragments['separator'].literals['-'] = '&#x27f6;'
+        self.fragments['separator'].literals['/'] = '&#x00b7;'
+        self.fragments['separator'].literals['=,'] = '='
+        self.fragments['separator'].literals['-/'] = '&#x21c4;'
+        self.fragments['separator'].literals['=/'] = '&#x21cc;'
+        self.fragments['separator'].wrap = ('<mo>{}</mo>',)
+        self.fragments['coefficient'].wrap = (
+            '<mn>{}</mn><mspace width="0.167em"/>',
+            '<mfrac><mn>{}</mn><mn>{}</mn></mfrac><mspace width="0.167em"/>')
+        self.fragments['charge'].literals['='] = '<mo>+</mo>'
+        self.fragments['charge'].literals['-'] = '<mo>&#x2212;</mo>'
+        self.fragments['charge'].script = ('<msup>', '</msup>')
+        self.fragments['state'].literals['l'] = '&#x2113;'
+        self.fragments['state'].wrap = ('<mo>(</mo><mi>{}</mi><mo>)</mo>',)
+        self.fragments['state'].script = ('<msub>', '</msub>')
+        self.fragments['element'].wrap = ('<mi mathvariant="normal">{}</mi>',)
+        for numeral in range(10):
+            self.fragments['counter'].literals[str(numeral)] = str(numeral)
+        self.fragments['counter'].wrap = ('<mn>{}</mn>',)
+        self.fragments['counter'].script = ('<msub>', '</msub>')
+        self.fragments['open group'].literals["'"] = '<mo>(</mo>'
+        self.fragments['close group'].literals["'"] = '<mo>)</mo>'
+        self.prefix = '<math xmlns="http://www.w3.org/1998/Math/MathML">'
+        self.suffix = '</math>'
+
+    def start(self, write=None):
+        context = DisplayCompiler.start(self, write)
+        # The output of each group which has been opened but not closed
+        # yet, innermost last.
+        context.groups = []
+        return context
+
+    def add(self, fragment, output, context):
+        """Add the output of a display fragment to the result in the
+        given context.
+
+        The output of a fragment with a ``script`` becomes a script of
+        the output before it, or is added to that script if it is
+        already one of the same kind. The output of a group is held
+        back until the group is closed, so that it can become the base
+        of a script.
+
+        """
+        if not output:
+            return
+        script = fragment.script
+        if script is None:
+            if fragment is self.fragments['close group']:
+                self.write(context.pending, context)
+                context.pending = '<mrow>{}{}</mrow>'.format(
+                    ''.join(context.groups.pop()), output)
+            else:
+                self.write(context.pending, context)
+                context.pending = output
+                if fragment is self.fragments['open group']:
+                    # Written to the group once its contents follow.
+                    context.groups.append([])
+        elif script == context.script:
+            close = '</mrow>' + script[1]
+            context.pending = (context.pending[:-len(close)] + output +
+                               close)
+        else:
+            context.pending = '{}{}<mrow>{}</mrow>{}'.format(
+                script[0], context.pending or '<mrow/>', output, script[1])
+        context.script = script
+
+    def save(self, context):
+        if context.groups:
+            return None
+        return DisplayCompiler.save(self, context)
+
+    def write(self, output, context):
+        """Write output in the given context, into the innermost open
+        group if there is one.
+
+        """
+        if not output:
+            return
+        if context.groups:
+            context.groups[-1].append(output)
+        else:
+            context.write(output)
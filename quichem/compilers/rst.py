@@ -16,8 +16,6 @@
 
 from __future__ import unicode_literals
 
-import re
-
 from quichem.compilers.display import DisplayCompiler
 
 
@@ -40,16 +38,24 @@ class RstCompiler(DisplayCompiler):
         for numeral in range(10):
             self.fragments['charge'].literals[str(numeral)] = str(numeral)
         self.fragments['charge'].wrap = (r'\ :sup:`{}`\ ',)
+        self.fragments['charge'].script = (r'\ :sup:`', r'`\ ')
         self.fragments['state'].literals['l'] = '\u2113'
         self.fragments['state'].wrap = (r'\ :sub:`({})`\ ',)
+        self.fragments['state'].script = (r'\ :sub:`', r'`\ ')
         for numeral in range(10):
             self.fragments['counter'].literals[str(numeral)] = str(numeral)
         self.fragments['counter'].wrap = (r'\ :sub:`{}`\ ',)
+        self.fragments['counter'].script = (r'\ :sub:`', r'`\ ')
         self.fragments['open group'].literals["'"] = '('
         self.fragments['close group'].literals["'"] = ')'
 
-    def compile(self, ast):
-        return re.sub(r'(\\ :(?:sub|sup):`)([^`]+?)`\\ \1([^`]+?)`\\ ',
-                      r'\1\2\3`\\ ',
-                      DisplayCompiler.compile(self, ast)
-                      ).replace(r'\ \ ', r'\ ').rstrip(r'\ ')
+    def join(self, previous, output):
+        # Only one escaped space is needed between two runs. The output
+        # of a single fragment never contains two in a row.
+        if output[:2] == r'\ ' and previous[-2:] == r'\ ':
+            return output[2:]
+        return output
+
+    def finish(self, context):
+        context.pending = context.pending.rstrip(r'\ ')
+        return DisplayCompiler.finish(self, context)
@@ -0,0 +1,301 @@
+# This file is part of quichem.
+#
+# quichem is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# quichem is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with quichem.  If not, see <http://www.gnu.org/licenses/>.
+
+"""SVG compiler.
+
+Lays out equations with fixed font metrics, so images can be made
+without a browser or a GUI toolkit. The metrics are those of
+Helvetica, which the images ask for (falling back to Arial and other
+sans-serif fonts of about the same widths).
+
+"""
+
+
+from __future__ import unicode_literals
+
+from xml.sax.saxutils import escape
+
+from quichem.compilers.display import DisplayCompiler, DisplayContext
+
+
+# Advance widths of Helvetica characters, in ems.
+WIDTHS = dict(zip(
+    'ABCDEFGHIJKLMNOPQRSTUVWXYZ',
+    (0.667, 0.667, 0.722, 0.722, 0.667, 0.611, 0.778, 0.722, 0.278, 0.5,
+     0.667, 0.556, 0.833, 0.722, 0.778, 0.667, 0.778, 0.722, 0.667, 0.611,
+     0.722, 0.667, 0.944, 0.667, 0.667, 0.611)))
+WIDTHS.update(zip(
+    'abcdefghijklmnopqrstuvwxyz',
+    (0.556, 0.556, 0.5, 0.556, 0.556, 0.278, 0.556, 0.556, 0.222, 0.222,
+     0.5, 0.222, 0.833, 0.556, 0.556, 0.556, 0.556, 0.333, 0.5, 0.278,
+     0.556, 0.5, 0.722, 0.5, 0.5, 0.5)))
+WIDTHS.update(dict.fromkeys('0123456789', 0.556))
+WIDTHS.update({' ': 0.278, '\u2006': 0.167, '(': 0.333, ')': 0.333,
+               '+': 0.584, '=': 0.584, '\u2212': 0.584, '.': 0.278,
+               '\xb7': 0.278, '\u2113': 0.417})
+DEFAULT_WIDTH = 0.6
+
+# The size and the baseline offset of the text of each script, in ems
+# of the font size.
+SCRIPTS = {None: (1.0, 0.0), 'sub': (0.7, 0.25), 'sup': (0.7, -0.45)}
+# The height of the line of fractions and of arrows above the baseline.
+AXIS = 0.3
+# The space above and below the baseline.
+ASCENT = 1.05
+DESCENT = 0.5
+
+
+def width(text):
+    """Return the width of a string of text, in ems."""
+    return sum(WIDTHS.get(character, DEFAULT_WIDTH) for character in text)
+
+
+def _arrow(start, end, y, barbs):
+    """Return SVG path data for an arrow from `start` to `end` at
+    height `y`, with the barbs given as pairs of the offsets of their
+    ends from the head.
+
+    """
+    direction = 1 if end > start else -1
+    return 'M{:.2f} {:.2f}H{:.2f}'.format(start, y, end) + ''.join(
+        'M{:.2f} {:.2f}l{:.2f} {:.2f}'.format(end, y, -direction * dx, dy)
+        for dx, dy in barbs)
+
+
+class SvgContext(DisplayContext):
+
+    """The state of a single call to `SvgCompiler.compile` or
+    `SvgCompiler.compile_to`.
+
+    The whole image is laid out before it is written, since its size
+    is only known at the end.
+
+    Attributes
+    ----------
+    x : float
+        The position at which the next output is placed.
+    shapes : list
+        The SVG elements of the image so far.
+    run : list
+        The script, start and text of the text which has not been added
+        to ``shapes`` yet, or None. Adjacent text of the same script is
+        written as one element.
+    scripts : dict
+        Maps each script in the run of scripts which ends at ``x`` to
+        the position at which it ends. Scripts start where the run of
+        scripts starts, so that superscripts and subscripts of the same
+        base are stacked.
+    start : float
+        The position at which the run of scripts starts.
+
+    """
+
+    def __init__(self, write=None):
+        DisplayContext.__init__(self, write)
+        self.x = 0.0
+        self.shapes = []
+        self.run = None
+        self.scripts = {}
+        self.start = 0.0
+
+
+class SvgCompiler(DisplayCompiler):
+
+    """SVG image compiler.
+
+    Attributes
+    ----------
+    font_size : float
+        The font size of the image, in pixels.
+    font_family : string
+        The font family of the image, as a CSS font family list.
+    arrows : dict
+        Maps the separator literals which are drawn as arrows to a list
+        of the arrows, each a tuple of the height of the arrow above
+        the axis, whether it points right, and the barbs of its head
+        (as in `_arrow`). All lengths are in ems.
+    script_fragments : dict
+        Maps the display fragments whose output is a subscript or
+        superscript of the output before it to "sub" or "sup". The
+        ``script`` of every display fragment is left None, since the
+        output is laid out by `add` rather than wrapped in tags.
+
+    """
+
+    def __init__(self):
+        DisplayCompiler.__init__(self)
+        self.font_size = 16
+        self.font_family = 'Helvetica, Arial, sans-serif'
+        self.fragments['separator'].literals['='] = ' + '
+        self.fragments['separator'].literals['-'] = '\u27f6'
+        self.fragments['separator'].literals['/'] = '\xb7'
+        self.fragments['separator'].literals['=,'] = ' = '
+        self.fragments['separator'].literals['-/'] = '\u21c4'
+        self.fragments['separator'].literals['=/'] = '\u21cc'
+        self.fragments['coefficient'].wrap = ('{}\u2006', '{}/{}\u2006')
+        self.fragments['charge'].literals['='] = '+'
+        self.fragments['charge'].literals['-'] = '\u2212'
+        for numeral in range(10):
+            self.fragments['charge'].literals[str(numeral)] = str(numeral)
+        self.fragments['state'].literals['l'] = '\u2113'
+        self.fragments['state'].wrap = ('({})',)
+        for numeral in range(10):
+            self.fragments['counter'].literals[str(numeral)] = str(numeral)
+        self.fragments['open group'].literals["'"] = '('
+        self.fragments['close group'].literals["'"] = ')'
+        self.script_fragments = {self.fragments['charge']: 'sup',
+                                 self.fragments['state']: 'sub',
+                                 self.fragments['counter']: 'sub'}
+        head = ((0.25, -0.12), (0.25, 0.12))
+        self.arrows = {
+            '\u27f6': [(0.0, True, head)],
+            '\u21c4': [(0.12, True, head), (-0.12, False, head)],
+            '\u21cc': [(0.06, True, ((0.25, -0.12),)),
+                       (-0.06, False, ((0.25, 0.12),))]}
+
+    def start(self, write=None):
+        """Return a new `SvgContext` for compiling an AST, writing the
+        output with `write` (see `quichem.compilers.display.
+        DisplayContext`).
+
+        """
+        return SvgContext(write)
+
+    def finish(self, context):
+        self.flush(context)
+        size = self.font_size
+        padding = 0.1 * size
+        context.write(
+            '<svg xmlns="http://www.w3.org/2000/svg" width="{0:.2f}" '
+            'height="{1:.2f}" viewBox="{2:.2f} {3:.2f} {0:.2f} {1:.2f}" '
+            'font-family="{4}" font-size="{5}">'.format(
+                context.x * size + 2 * padding,
+                (ASCENT + DESCENT) * size + 2 * padding, -padding,
+                -ASCENT * size - padding, escape(self.font_family), size))
+        for shape in context.shapes:
+            context.write(shape)
+        context.write('</svg>')
+        if context.result is not None:
+            return ''.join(context.result)
+
+    def save(self, context):
+        # The output is laid out at the position the context has
+        # reached, so what it writes is never the same twice.
+        return None
+
+    def add(self, fragment, output, context):
+        """Lay out the output of a display fragment after the output
+        before it.
+
+        """
+        if not output:
+            return
+        script = self.script_fragments.get(fragment)
+        if script is None:
+            context.scripts = {}
+            if fragment is self.fragments['separator'] and (
+                    output in self.arrows):
+                self.add_arrow(self.arrows[output], context)
+            elif (fragment is self.fragments['coefficient'] and
+                  '/' in output):
+                self.add_fraction(output, context)
+            else:
+                self.add_text(None, context.x, output, context)
+        else:
+            if not context.scripts:
+                context.start = context.x
+            start = context.scripts.get(script, context.start)
+            end = context.scripts[script] = self.add_text(
+                script, start, output, context)
+            context.x = max(context.x, end)
+
+    def add_text(self, script, x, text, context):
+        """Place text of the given script at a position.
+
+        Returns
+        -------
+        The position at which the text ends.
+
+        """
+        scale = SCRIPTS[script][0]
+        run = context.run
+        if run is not None and run[0] == script and run[3] == x:
+            run[2] += text
+        else:
+            self.flush(context)
+            # Leading spaces of SVG text elements are not displayed.
+            stripped = text.lstrip(' ')
+            x += width(text[:len(text) - len(stripped)]) * scale
+            text = stripped
+            run = context.run = [script, x, text, x]
+        run[3] += width(text) * scale
+        if script is None:
+            context.x = run[3]
+        return run[3]
+
+    def add_fraction(self, output, context):
+        """Place a fraction with a line between its numerator and
+        denominator.
+
+        """
+        self.flush(context)
+        numerator, denominator = output.rstrip('\u2006').split('/')
+        scale = SCRIPTS['sup'][0]
+        widths = width(numerator) * scale, width(denominator) * scale
+        line = max(widths) + 0.1
+        x = context.x
+        for text, text_width, y in zip((numerator, denominator), widths,
+                                       (-AXIS - 0.1, 0.35)):
+            context.shapes.append(self.text_element(
+                x + (line - text_width) / 2, y, scale, text))
+        context.shapes.append(
+            '<path d="M{:.2f} {:.2f}h{:.2f}" stroke="black" '
+            'stroke-width="{:.2f}"/>'.format(
+                x * self.font_size, -AXIS * self.font_size,
+                line * self.font_size, 0.06 * self.font_size))
+        context.x = x + line + width(output[len(numerator) +
+                                            len(denominator) + 1:])
+
+    def add_arrow(self, arrows, context):
+        """Draw arrows in the space of a separator."""
+        self.flush(context)
+        size = self.font_size
+        start, end = (context.x + 0.3) * size, (context.x + 1.9) * size
+        context.shapes.append(
+            '<path d="{}" fill="none" stroke="black" stroke-width="{:.2f}" '
+            'stroke-linecap="round"/>'.format(''.join(
+                _arrow(*((start, end) if right else (end, start)),
+                       y=(-AXIS - height) * size,
+                       barbs=[(dx * size, dy * size) for dx, dy in barbs])
+                for height, right, barbs in arrows), 0.06 * size))
+        context.x += 2.2
+
+    def flush(self, context):
+        """Add the text which has not been written yet to the image."""
+        if context.run is not None:
+            script, x, text, _ = context.run
+            scale, y = SCRIPTS[script]
+            context.shapes.append(self.text_element(x, y, scale, text))
+            context.run = None
+
+    def text_element(self, x, y, scale, text):
+        """Return an SVG text element, with its position and font size
+        given in ems of the font size of the image.
+
+        """
+        size = self.font_size
+        return '<text x="{:.2f}" y="{:.2f}"{}>{}</text>'.format(
+            x * size, y * size, '' if scale == 1 else
+            ' font-size="{:.2f}"'.format(scale * size), escape(text))
@@ -17,10 +17,14 @@ from __future__ import unicode_literals
 
 import argparse
 import collections
+import functools
 import re
 import sys
 import os
 import html
+import threading
+import time
+import traceback
 
 from modgrammar import ParseError
 
@@ -28,19 +32,24 @@ import quichem.parser
 import quichem.compilers.html
 import quichem.compilers.plain
 import quichem.compilers.latex
+import quichem.compilers.mathml
 import quichem.compilers.rst
+from quichem.compilers.cache import OUTPUT_CACHE, ItemCache
 
 
-parser = quichem.parser.make_parser()
+parser = quichem.parser.get_parser()
+DEBOUNCE = 0.05
 COMPILERS = collections.OrderedDict((
-    ('plain', quichem.compilers.plain.PlainCompiler()),
-    ('LaTeX_mhchem_V3', quichem.compilers.latex.LatexMhchemV3Compiler()),
-    ('HTML', quichem.compilers.html.HtmlCompiler()),
-    ('plain_ASCII', quichem.compilers.plain.PlainAsciiCompiler()),
-    ('LaTeX', quichem.compilers.latex.LatexCompiler()),
-    ('reStructuredText', quichem.compilers.rst.RstCompiler()),
+    ('plain', quichem.compilers.plain.PlainCompiler().freeze()),
+    ('LaTeX_mhchem_V3',
+     quichem.compilers.latex.LatexMhchemV3Compiler().freeze()),
+    ('HTML', quichem.compilers.html.HtmlCompiler().freeze()),
+    ('plain_ASCII', quichem.compilers.plain.PlainAsciiCompiler().freeze()),
+    ('LaTeX', quichem.compilers.latex.LatexCompiler().freeze()),
+    ('reStructuredText', quichem.compilers.rst.RstCompiler().freeze()),
 ))
-MML_JS = 'MathJax.Hub.getAllJax("output")[0].root.toMathML("")'
+# Only used for copying Word equations, so not a source widget.
+MATHML = quichem.compilers.mathml.MathmlCompiler().freeze()
 
 
 class GenericGui(object):
@@ -50,12 +59,65 @@ class GenericGui(object):
     Not tied to any particular GUI toolkit. Automatically handles
     parsing input text and updating widgets with parsed text.
 
+    Attributes
+    ----------
+    incremental : bool
+        Whether to parse and compile each new value incrementally,
+        reusing the tokens and output of the items it shares with the
+        value before it (see `quichem.predictive.IncrementalParser`
+        and `quichem.compilers.cache.ItemCache`). The output is the
+        same either way, and so are the error messages for input up to
+        `quichem.parser.MAX_EXPLAINED_LENGTH` characters long. The
+        error messages for longer input only give the position the
+        incremental parser got to, where the ``modgrammar`` parser used
+        otherwise can take very long to report what was expected.
+    background : bool
+        Whether to parse and compile on a worker thread, so that a slow
+        parse never blocks input. Subclasses only need to implement
+        `call_in_ui` to hand the results back to the UI thread.
+        Results for any value but the latest are dropped.
+    debounce : float
+        With `background`, the number of seconds to wait for another
+        value before parsing one, so that a burst of keystrokes is
+        parsed once.
+
+    Notes
+    -----
+    Only the LaTeX for the formatted output view is compiled for each
+    value. The output of every other compiler is compiled when it is
+    first asked for by `output`, at most once for each AST: when its
+    source widget is shown (see `set_source` and `refresh_source`) or
+    copied to the clipboard.
+
     """
 
+    incremental = True
+    background = True
+    debounce = DEBOUNCE
+
     def __init__(self):
         self.compilers = {}
         self.sources = []
         self._ast = None
+        self._parser = quichem.parser.make_parser('incremental')
+        self._error = ''
+        # The LaTeX for the formatted output view is compiled on the
+        # worker thread, everything else on the UI thread, so they
+        # keep separate caches.
+        self._latex = ItemCache(COMPILERS['LaTeX'])
+        self._items = {}
+        # The outputs compiled for the displayed AST by compiler name,
+        # and the indices of the source widgets not showing them yet.
+        self._outputs = {}
+        self._dirty = set()
+        # The generation of the latest value given to `change_value`,
+        # and the one waiting for the worker thread with the time it is
+        # due, if any.
+        self._generation = 0
+        self._pending = None
+        self._due = 0
+        self._condition = threading.Condition()
+        self._worker = None
 
     def _set_latex(self, latex):
         """Set the LaTeX code for MathJax to display in the formatted
@@ -72,36 +134,195 @@ class GenericGui(object):
     @property
     def html(self):
         if self._ast is None:
-            return html.escape(str(e))
-        return COMPILERS['HTML'].compile(self._ast)
+            return html.escape(self._error)
+        return self.output('HTML')
 
     @property
     def plain(self):
         if self._ast is None:
-            return e
-        return COMPILERS['plain'].compile(self._ast)
+            return self._error
+        return self.output('plain')
+
+    @property
+    def mathml(self):
+        if self._ast is None:
+            return ''
+        return OUTPUT_CACHE.compile(self._ast, MATHML)
+
+    def output(self, name):
+        """Return the output of the named compiler for the displayed
+        AST, compiling it only the first time it is asked for.
+
+        Returns an empty string if the displayed value could not be
+        parsed.
+
+        """
+        if self._ast is None:
+            return ''
+        try:
+            return self._outputs[name]
+        except KeyError:
+            pass
+        if self.incremental:
+            items = self._items.get(name)
+            if items is None:
+                items = self._items[name] = ItemCache(COMPILERS[name])
+            output = items.compile(self._ast)
+        else:
+            output = OUTPUT_CACHE.compile(self._ast, COMPILERS[name])
+        self._outputs[name] = output
+        return output
+
+    def _parse(self, value):
+        """Parse the given text, incrementally if `incremental` is
+        true.
+
+        """
+        if self.incremental:
+            return quichem.parser.parse(value, self._parser)
+        return quichem.parser.parse(value, parser,
+                                    quichem.parser.PARSE_CACHE)
 
     def change_value(self, value):
         """Update all displays and source widgets with the given
         unparsed text.
 
+        If `background` is true, the text is handed to the worker
+        thread, and the displays are updated later on the UI thread
+        through `call_in_ui`.
+
+        """
+        if not self.background:
+            self._generation += 1
+            self.show(self._generation, self.process(value))
+            return
+        with self._condition:
+            self._generation += 1
+            self._pending = self._generation, value
+            self._due = time.monotonic() + self.debounce
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._work,
+                                                name='quichem-gui-worker')
+                self._worker.daemon = True
+                self._worker.start()
+            self._condition.notify()
+
+    def _work(self):
+        """Parse and compile the values given to `change_value`, once
+        no newer value has been given for `debounce` seconds.
+
+        Runs on the worker thread until the program exits.
+
+        """
+        while True:
+            with self._condition:
+                while True:
+                    if self._pending is None:
+                        self._condition.wait()
+                        continue
+                    delay = self._due - time.monotonic()
+                    if delay <= 0:
+                        break
+                    self._condition.wait(delay)
+                generation, value = self._pending
+                self._pending = None
+            try:
+                result = self.process(value, generation)
+            except Exception:
+                # Keep the worker alive for the next value.
+                traceback.print_exc()
+                continue
+            if result is not None:
+                self.call_in_ui(functools.partial(self.show, generation,
+                                                  result))
+
+    def _stale(self, generation):
+        """Return whether a newer value than the one with the given
+        generation has been given to `change_value`.
+
+        """
+        return generation is not None and generation != self._generation
+
+    def process(self, value, generation=None):
+        """Parse and compile the given unparsed text.
+
+        Only touches the parser and compilers, so it may run on any
+        one thread (the worker thread if `background` is true).
+
+        Parameters
+        ----------
+        value : string
+        generation : int
+            The generation of `value`. If given, the compile is skipped
+            if a newer value has been given to `change_value` by the
+            time the text is parsed.
+
+        Returns
+        -------
+        None if the value was skipped; otherwise a tuple of the AST (or
+        None) and either its LaTeX or the parse error.
+
         """
         try:
-            self._ast = quichem.parser.parse(value, parser)
+            ast = self._parse(value)
         except ParseError as e:
-            self._ast = None
-            self._set_latex(r'\text{{{}}}'.format(e))
-            for source in self.sources:
-                self.set_source(source, lambda: '')
+            return None, e
+        if self._stale(generation):
+            return None
+        # Reuse the output of the items which have not changed (or,
+        # when not incremental, all of it if an equivalent input has
+        # been compiled before).
+        if self.incremental:
+            return ast, self._latex.compile(ast)
+        return ast, OUTPUT_CACHE.compile(ast, COMPILERS['LaTeX'])
+
+    def show(self, generation, result):
+        """Update all displays and source widgets with the result of
+        `process` for the value with the given generation.
+
+        Runs on the UI thread. Results for any value but the latest one
+        given to `change_value` are dropped.
+
+        """
+        if self._stale(generation):
+            return
+        self._ast, latex = result
+        if isinstance(latex, ParseError):
+            self._error = str(latex)
+            self._outputs = {}
+            self._set_latex(r'\text{{{}}}'.format(latex))
         else:
-            self._set_latex(COMPILERS['LaTeX'].compile(self._ast))
-            for compiler, source in zip(self.compilers.values(), self.sources):
-                self.set_source(source, lambda: compiler.compile(self._ast))
+            self._error = ''
+            self._outputs = {'LaTeX': latex}
+            self._set_latex(latex)
+        self._dirty = set(range(len(self.sources)))
+        for index in range(len(self.sources)):
+            self.refresh_source(index)
+
+    def refresh_source(self, index):
+        """Offer the output for the displayed AST to the source widget
+        with the given index through `set_source`, unless the widget
+        already shows it.
+
+        Subclasses call this when a source widget becomes visible.
+
+        """
+        if index not in self._dirty:
+            return
+        name = list(self.compilers)[index]
+
+        def source_factory():
+            self._dirty.discard(index)
+            return self.output(name)
+
+        self.set_source(self.sources[index], source_factory)
 
     def run(self):
         """Create the compiler objects and source widgets."""
+        args = parse_args()
+        self.debounce = args.debounce
         self.compilers = collections.OrderedDict(
-            (name, COMPILERS[name]) for name in parse_args().compilers)
+            (name, COMPILERS[name]) for name in args.compilers)
         self.sources = [self.make_source(name) for name in self.compilers]
 
     def make_source(self, name):
@@ -122,8 +343,25 @@ class GenericGui(object):
         """
         raise NotImplementedError
 
-    def set_source(self, widget, source):
-        """Display the given source in the given widget.
+    def set_source(self, widget, source_factory):
+        """Display the source returned by the given function in the
+        given widget.
+
+        The function compiles the source if it has not been compiled
+        yet, so subclasses should only call it if the widget is
+        visible. Hidden widgets are offered the source again through
+        `refresh_source`.
+
+        Must be implemented in subclasses.
+
+        """
+        raise NotImplementedError
+
+    def call_in_ui(self, function):
+        """Call the given function (with no arguments) on the UI thread.
+
+        Called on the worker thread if `background` is true. Must not
+        wait for the function to return.
 
         Must be implemented in subclasses.
 
@@ -132,11 +370,10 @@ class GenericGui(object):
 
 
 def word_equation_from_mathml(mathml):
-    # Replace empty boxes with zero-width spaces.
+    if not mathml:
+        return ''
     # Confuse Word into thinking this is an equation.
-    return ('<?xml version="1.0"?>\n' +
-            re.sub(r'(?<=<mrow class="MJX-TeXAtom-ORD">)\s*(?=</mrow>)',
-                   '<mo>&#x180e;</mo>', mathml))
+    return '<?xml version="1.0"?>\n' + mathml
 
 
 def data_file(filename):
@@ -160,4 +397,7 @@ def parse_args():
     parser.add_argument('-c', '--compilers', nargs='+', dest='compilers',
                         choices=COMPILERS.keys(), default=COMPILERS.keys(),
                         help='which compilers to enable; default is all')
+    parser.add_argument('-d', '--debounce', type=float, default=DEBOUNCE,
+                        help='seconds to wait after the last keystroke '
+                             'before parsing; default is %(default)s')
     return parser.parse_args()
@@ -17,20 +17,22 @@
 from __future__ import unicode_literals
 
 import functools
+import mimetypes
 import os
 import sys
 
-from PySide.QtCore import Qt, QMimeData, QBuffer, QIODevice, QSize
+from PySide.QtCore import (Qt, QMimeData, QBuffer, QIODevice, QSize, QObject,
+                           QTimer, Signal, Slot)
 from PySide.QtGui import (QWidget, QFormLayout, QHBoxLayout, QLineEdit, QImage,
                           QApplication, QTextEdit, QSizePolicy, QVBoxLayout,
                           QPushButton, QTabWidget, QFont, QStyle, QPainter,
                           QListWidget, QStackedWidget, QFrame)
+from PySide.QtNetwork import (QNetworkAccessManager, QNetworkReply,
+                              QNetworkRequest)
 from PySide.QtWebKit import QWebView, QWebPage
 
 from quichem.gui import generic
-
-# Load MathJax and other web files from Qt resource system.
-from quichem.gui import web
+from quichem.gui.resources import web_archive
 
 
 class AutoSizingListWidget(QListWidget):
@@ -44,10 +46,91 @@ class AutoSizingListWidget(QListWidget):
         return size
 
 
+class _Invoker(QObject):
+
+    """Calls functions emitted from any thread on the thread the invoker
+    was created in.
+
+    """
+
+    called = Signal(object)
+
+    def __init__(self):
+        QObject.__init__(self)
+        self.called.connect(self.call)
+
+    @Slot(object)
+    def call(self, function):
+        function()
+
+
+class _ArchiveReply(QNetworkReply):
+
+    """A finished reply with the contents of a file, read from a
+    ``memoryview`` as the web view asks for them.
+
+    """
+
+    def __init__(self, parent, request, data):
+        QNetworkReply.__init__(self, parent)
+        self._data = data
+        self._offset = 0
+        self.setRequest(request)
+        self.setUrl(request.url())
+        self.setOperation(QNetworkAccessManager.GetOperation)
+        content_type = mimetypes.guess_type(request.url().path())[0]
+        self.setHeader(QNetworkRequest.ContentTypeHeader,
+                       content_type or 'application/octet-stream')
+        self.setHeader(QNetworkRequest.ContentLengthHeader, len(data))
+        self.open(QIODevice.ReadOnly | QIODevice.Unbuffered)
+        # Signals may only be emitted once the reply has been returned.
+        QTimer.singleShot(0, self._ready)
+
+    def _ready(self):
+        self.metaDataChanged.emit()
+        self.readyRead.emit()
+        self.finished.emit()
+
+    def abort(self):
+        pass
+
+    def isSequential(self):
+        return True
+
+    def bytesAvailable(self):
+        return (len(self._data) - self._offset +
+                QNetworkReply.bytesAvailable(self))
+
+    def readData(self, size):
+        chunk = self._data[self._offset:self._offset + size]
+        self._offset += len(chunk)
+        return bytes(chunk)
+
+
+class _ArchiveAccessManager(QNetworkAccessManager):
+
+    """Serves ``qrc:/web/`` URLs from `quichem.gui.resources.web_archive`
+    rather than from the Qt resource system, so that each file is only
+    read when the web view first asks for it.
+
+    """
+
+    def createRequest(self, operation, request, data=None):
+        url = request.url()
+        name = url.path().lstrip('/')
+        if (url.scheme() == 'qrc' and
+                operation == QNetworkAccessManager.GetOperation and
+                name in web_archive()):
+            return _ArchiveReply(self, request, web_archive().read(name))
+        return QNetworkAccessManager.createRequest(self, operation, request,
+                                                   data)
+
+
 class PysideGui(generic.GenericGui):
 
     def __init__(self):
         generic.GenericGui.__init__(self)
+        self._invoker = _Invoker()
         window = QWidget()
         window.setWindowTitle('quichem-pyside')
 
@@ -59,6 +142,8 @@ class PysideGui(generic.GenericGui):
         self.edit.setPlaceholderText('Type quichem input...')
         self.edit.textChanged.connect(self.change_value)
         self.view = QWebView()
+        self._network = _ArchiveAccessManager()
+        self.view.page().setNetworkAccessManager(self._network)
         self.view.page().mainFrame().setScrollBarPolicy(Qt.Vertical,
                                                         Qt.ScrollBarAlwaysOff)
         self.view.page().action(QWebPage.Reload).setVisible(False)
@@ -107,7 +192,7 @@ class PysideGui(generic.GenericGui):
         if not self.sources:
             return
         self.stacked_widget.setCurrentIndex(index)
-        self.change_value(self.edit.text())
+        self.refresh_source(index)
 
     def _resize_view(self):
         """Set the QWebView's minimum height based on its current
@@ -148,6 +233,9 @@ class PysideGui(generic.GenericGui):
         if widget.isVisible():
             widget.setPlainText(source_factory())
 
+    def call_in_ui(self, function):
+        self._invoker.called.emit(function)
+
     def set_clipboard_image(self):
         """Export the formatted output to an image and store it in the
         clipboard.
@@ -187,8 +275,8 @@ class PysideGui(generic.GenericGui):
         XML.
 
         """
-        QApplication.clipboard().setText(generic.word_equation_from_mathml(
-            self.view.page().mainFrame().evaluateJavaScript(generic.MML_JS)))
+        QApplication.clipboard().setText(
+            generic.word_equation_from_mathml(self.mathml))
 
     def set_clipboard_html(self):
         """Place the HTML displayed in the HTML view widget into the
@@ -0,0 +1,161 @@
+# This file is part of quichem.
+#
+# quichem is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# quichem is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with quichem.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Lazy access to the web files displayed by the GUI front-ends.
+
+The output page and the included ``MathJax`` are stored in an
+uncompressed tar archive, ``web.tar``. Rather than loading every file
+into memory when the GUI starts, `Archive` memory-maps the archive and
+reads the headers of its members only when a file is first asked for.
+The contents of each file are a view of the map, so only the pages of
+the files actually used are read from disk.
+
+"""
+
+from __future__ import unicode_literals
+
+import mmap
+import os
+import sys
+
+
+__all__ = ['Archive', 'web_archive']
+
+ARCHIVE_NAME = 'web.tar'
+_BLOCK = 512
+# Type flags of the members `_index` understands: regular files,
+# directories and links.
+_SIMPLE_TYPES = frozenset(b'\x0001234567')
+
+_web_archive = None
+
+
+class Archive(object):
+
+    """Read-only access to the files in an uncompressed tar archive,
+    which is memory-mapped when a file is first asked for.
+
+    Parameters
+    ----------
+    path : string
+        The path of the archive.
+
+    Attributes
+    ----------
+    path : string
+
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._map = None
+        # Maps the name of each file to the offset and size of its
+        # contents.
+        self._index = None
+
+    def _open(self):
+        with open(self.path, 'rb') as file_:
+            self._map = mmap.mmap(file_.fileno(), 0, access=mmap.ACCESS_READ)
+        index = _index(self._map)
+        if index is None:
+            # Importing tarfile takes longer than reading the headers
+            # of a simple archive, so it is only used when needed.
+            import tarfile
+            with tarfile.open(self.path, mode='r:') as tar:
+                index = dict((member.name, (member.offset_data, member.size))
+                             for member in tar if member.isfile())
+        self._index = index
+
+    def __contains__(self, name):
+        if self._index is None:
+            self._open()
+        return name in self._index
+
+    def names(self):
+        """Return the names of the files in the archive."""
+        if self._index is None:
+            self._open()
+        return list(self._index)
+
+    def read(self, name):
+        """Return the contents of the named file as a read-only
+        ``memoryview`` of the archive.
+
+        Raises
+        ------
+        KeyError
+            If there is no such file in the archive.
+
+        """
+        if self._index is None:
+            self._open()
+        offset, size = self._index[name]
+        return memoryview(self._map)[offset:offset + size]
+
+    def close(self):
+        """Unmap the archive. It is mapped again if a file is asked for
+        afterwards, so views returned by `read` must have been released.
+
+        """
+        if self._map is not None:
+            self._map.close()
+        self._map = self._index = None
+
+
+def _index(data):
+    """Return a dict mapping the name of each regular file in an
+    uncompressed tar archive to the offset and size of its contents.
+
+    Returns None if the archive has extended headers (such as those of
+    long names), which are left to `tarfile`.
+
+    """
+    index = {}
+    offset = 0
+    while offset + _BLOCK <= len(data):
+        header = data[offset:offset + _BLOCK]
+        if not header.strip(b'\0'):
+            break  # The end of the archive.
+        if header[156] not in _SIMPLE_TYPES or header[124] & 0x80:
+            return None
+        name = header[:100].split(b'\0', 1)[0]
+        if header[257:262] == b'ustar':
+            prefix = header[345:500].split(b'\0', 1)[0]
+            if prefix:
+                name = prefix + b'/' + name
+        size = int(header[124:136].strip(b' \0') or b'0', 8)
+        offset += _BLOCK
+        if header[156] in b'\x000':
+            index[name.decode('utf-8')] = offset, size
+        offset += -(-size // _BLOCK) * _BLOCK
+    return index
+
+
+def web_archive():
+    """Return the `Archive` of the web files shared by the GUI.
+
+    The archive is looked for next to the executable in a frozen build,
+    and in this package otherwise. Nothing is read until a file is
+    asked for.
+
+    """
+    global _web_archive
+    if _web_archive is None:
+        if getattr(sys, 'frozen', False):
+            directory = os.path.dirname(sys.executable)
+        else:
+            directory = os.path.dirname(os.path.abspath(__file__))
+        _web_archive = Archive(os.path.join(directory, ARCHIVE_NAME))
+    return _web_archive
@@ -97,6 +97,9 @@ class WxpythonGui(generic.GenericGui):
 
     def change_value_from_event(self, event):
         self.change_value(event.GetString())
+
+    def show(self, generation, result):
+        generic.GenericGui.show(self, generation, result)
         self.scroll_area.FitInside()
 
     def make_source(self, name):
@@ -117,6 +120,9 @@ class WxpythonGui(generic.GenericGui):
     def set_source(self, widget, source_factory):
         widget.SetValue(source_factory())
 
+    def call_in_ui(self, function):
+        wx.CallAfter(function)
+
     def set_clipboard_word(self, event):
         """Store the formatted output in the clipboard in a Microsoft
         Word friendly format.
@@ -125,17 +131,8 @@ class WxpythonGui(generic.GenericGui):
         equation. Other programs will see it as plain text containing
         XML.
 
-        Note
-        ----
-        Currently, wx has no way of obtaining returned results from
-        JavaScript functions. In order to do this, any data that needs
-        to be read from the page is stored in the page title, which
-        is accessible from wx. This is a hack that will be changed
-        when wx implements the required functionality.
-
         """
-        self.view.RunScript("document.title = {}".format(generic.MML_JS))
-        mml = generic.word_equation_from_mathml(self.view.GetCurrentTitle())
+        mml = generic.word_equation_from_mathml(self.mathml)
         print(mml.encode('utf-8'))
         if wx.TheClipboard.Open():
             wx.TheClipboard.SetData(_TextDataObject(mml))
@@ -20,10 +20,14 @@ more structured.
 
 from __future__ import unicode_literals
 
-from modgrammar import REF, Grammar, GrammarClass, Reference
+from modgrammar import (REF, EOI, Grammar, GrammarClass, GrammarParser,
+                        Literal, NotFollowedBy, OR_Operator, ParseError,
+                        ParserSession, Reference, Text)
+from modgrammar.util import RepeatingTuple, calc_line_col
 
 
-__all__ = ['default', 'string', 'Token', 'g', 'ref']
+__all__ = ['default', 'string', 'Token', 'g', 'ref', 'memoize',
+           'PackratParser', 'explain']
 
 
 def default(token, default):
@@ -46,6 +50,8 @@ class Token(object):
 
     """Abstract """
 
+    __slots__ = ()
+
     @classmethod
     def from_attributes(cls, **kw):
         """Create a Token instance with the provided instance
@@ -78,6 +84,80 @@ class Token(object):
         """
         raise NotImplementedError
 
+    def token_class(self):
+        """Return the token class this token is an instance of, which
+        is its own class unless it was found by a parse.
+
+        """
+        return next(cls for cls in type(self).__mro__
+                    if not issubclass(cls, Grammar))
+
+    def detach(self):
+        """Copy the token, and the tokens it contains, into plain token
+        instances.
+
+        Tokens found by a parse are instances of the grammar classes
+        created by `g`, and keep the whole parse tree alive. The copies
+        only store the attributes named in the ``__slots__`` of the
+        token classes, and can be pickled. Tokens which are already
+        plain are returned as they are. Tokens are copied with an
+        explicit stack rather than by recursion, so any depth of nesting
+        can be copied.
+
+        Returns
+        -------
+        An instance of the token class this token is an instance of.
+
+        """
+        # Pairs of a token and its copy, whose attributes have not been
+        # copied yet.
+        pending = []
+
+        def copy(token):
+            cls = token.token_class()
+            if cls is type(token):
+                return token
+            instance = cls()
+            pending.append((token, instance))
+            return instance
+
+        root = copy(self)
+        while pending:
+            token, instance = pending.pop()
+            for name in type(instance).__slots__:
+                value = getattr(token, name)
+                if isinstance(value, Token):
+                    value = copy(value)
+                elif isinstance(value, list):
+                    value = [copy(item) for item in value]
+                setattr(instance, name, value)
+        return root
+
+    def key(self):
+        """Return a hashable value which is equal for any two tokens of
+        the same token class with equal attributes, whether they were
+        found by a parse or not.
+
+        The attributes are those named in the ``__slots__`` of the
+        token class; tokens and lists of tokens in them are replaced by
+        their keys. Subclasses may override this with a faster
+        equivalent, or to leave out attributes which make no
+        difference to the token.
+
+        """
+        cls = self.token_class()
+        return (cls.__name__,) + tuple(
+            _key(getattr(self, name)) for name in cls.__slots__)
+
+
+def _key(value):
+    """Return the key of a token attribute (see `Token.key`)."""
+    if isinstance(value, Token):
+        return value.key()
+    if isinstance(value, list):
+        return tuple(_key(item) for item in value)
+    return value
+
 
 def g(grammar, name, token=None, desc=None):
     """Constructs a grammar class that doubles as the given token.
@@ -176,3 +256,263 @@ def ref(function):
     reference = GrammarClass(
         "<REF>", (_FunctionReference,), dict(ref_name=staticmethod(function)))
     return reference
+
+
+def memoize(grammar):
+    """Make a grammar class cache its matches during parses by a
+    `PackratParser`.
+
+    The grammar is modified in place. Parsers other than
+    `PackratParser` are not affected.
+
+    Returns
+    -------
+    The grammar.
+
+    """
+    parse = grammar.grammar_parse.__func__
+
+    def grammar_parse(cls, text, index, session):
+        parser = getattr(text, 'packrat', None)
+        if parser is None or not text.eof:
+            # Results depending on text which has not arrived yet
+            # cannot be reused.
+            return parse(cls, text, index, session)
+        return parser.matches(cls, index,
+                              lambda: parse(cls, text, index, session))
+
+    type.__setattr__(grammar, 'grammar_parse', classmethod(grammar_parse))
+    return grammar
+
+
+def _replay(results, source):
+    """Yield the results already taken from a match generator, then
+    take more from it as needed, sharing them through `results`.
+
+    """
+    index = 0
+    while True:
+        if index == len(results):
+            results.append(next(source))
+        yield results[index]
+        index += 1
+
+
+class PackratParser(GrammarParser):
+
+    """A ``modgrammar`` parser which remembers the matches of grammars
+    passed to `memoize` at each position of the text being parsed.
+
+    ``modgrammar`` backtracks, and without memoization matches the same
+    grammar at the same position again whenever it tries another
+    alternative. With it, the matches found the first time are
+    replayed instead. The table is cleared for each new text.
+
+    Attributes
+    ----------
+    hits : int
+        The number of times a grammar was matched at a position where
+        it had been matched before, since creation or the last call to
+        `reset_stats`.
+    misses : int
+        The number of times a grammar was matched at a new position.
+
+    """
+
+    def __init__(self, grammar, sessiondata=None, tabs=1, debug=False,
+                 debug_flags=None):
+        self.reset_stats()
+        GrammarParser.__init__(self, grammar, sessiondata, tabs, debug,
+                               debug_flags)
+
+    def clear_remainder(self):
+        GrammarParser.clear_remainder(self)
+        self.table = {}
+        self.text.packrat = self
+
+    def reset_stats(self):
+        """Set `hits` and `misses` to 0."""
+        self.hits = self.misses = 0
+
+    def matches(self, grammar, index, parse):
+        """Return a generator of the matches of a grammar at a position
+        of the current text.
+
+        `parse` is called to create the generator the first time the
+        grammar is matched at the position.
+
+        """
+        key = id(grammar), index
+        try:
+            results, source = self.table[key]
+        except KeyError:
+            self.misses += 1
+            results, source = self.table[key] = [], parse()
+        else:
+            self.hits += 1
+            if results and results[-1][0] is False:
+                # All matches have been found; the last result is the
+                # error which ends every match generator.
+                return iter(results)
+        return _replay(results, source)
+
+
+def explain(grammar, string):
+    """Return the error ``modgrammar`` raises when a string does not
+    match a grammar, without parsing the string with ``modgrammar``.
+
+    When a parse fails, ``modgrammar`` has tried every way of matching
+    every rule, and reports the furthest position at which a rule failed
+    to match, with the descriptions of all the rules which failed
+    there. That search can take exponential time. The positions at
+    which the matches of a rule end, and the error a rule fails with,
+    only depend on the rule and the position it is tried at, so here
+    they are found once for each rule and position.
+
+    Parameters
+    ----------
+    grammar : modgrammar.Grammar
+        The top-level grammar, as passed to `modgrammar.GrammarParser`.
+    string : string
+        The complete input.
+
+    Returns
+    -------
+    The `modgrammar.ParseError` which parsing the string with
+    ``grammar.parser().parse_string`` raises, or None if the parse
+    succeeds.
+
+    """
+    text = Text(string, bol=True, eof=True)
+    session = ParserSession({})
+    session.debugger = None
+    outcomes = {}
+    # Outcomes are found with an explicit stack of `_outcome`
+    # generators rather than by recursion, so any depth of nesting can
+    # be explained.
+    stack = [((id(grammar), 0), _outcome(grammar, text, 0, session))]
+    outcome = None
+    while stack:
+        key, pending = stack[-1]
+        try:
+            rule, index = pending.send(outcome)
+        except StopIteration as stop:
+            stack.pop()
+            outcome = outcomes[key] = stop.value
+            continue
+        key = id(rule), index
+        outcome = outcomes.get(key)
+        if outcome is not None:
+            continue
+        if rule.grammar_parse.__func__ is Literal.grammar_parse.__func__:
+            # Most outcomes are of literals, which are found directly.
+            ends = ((index + len(rule.string),)
+                    if string.startswith(rule.string, index) else ())
+            outcome = outcomes[key] = ends, (index, frozenset([rule]))
+        else:
+            stack.append((key, _outcome(rule, text, index, session)))
+    ends, error = outcome
+    if not string or len(string) in ends:
+        return None
+    for end in ends:
+        # Matches which leave some input over fail as if an end of
+        # input grammar had failed to match after them.
+        error = _merge_error(error, (end, frozenset([EOI])))
+    position, expected = error
+    line, col = calc_line_col(string, position, 0, 0, 1)
+    return ParseError(grammar, string, position, position, line=line,
+                      col=col, expected=set(expected))
+
+
+def _merge_error(error, other):
+    """Combine two errors the way ``modgrammar`` does: keep the one at
+    the furthest position, or both sets of grammars if their positions
+    are equal.
+
+    """
+    if error is None or other[0] > error[0]:
+        return other
+    if other[0] == error[0]:
+        return error[0], error[1] | other[1]
+    return error
+
+
+def _outcome(rule, text, index, session):
+    """Find the outcome of matching a grammar at a position: the set of
+    positions at which its matches end, and the error it fails with,
+    as a pair of a position and a set of grammars.
+
+    This is a generator which yields a grammar and a position for each
+    outcome it needs, is sent that outcome, and returns its own.
+    Sequences, repetitions, `modgrammar.OR` and
+    `modgrammar.NOT_FOLLOWED_BY` are followed as ``modgrammar`` matches
+    them; other grammars are matched by ``modgrammar`` itself.
+
+    """
+    parse = rule.grammar_parse.__func__
+    if parse is Reference.grammar_parse.__func__:
+        return (yield rule.resolve(session.data), index)
+    if parse is OR_Operator.grammar_parse.__func__:
+        ends = set()
+        error = None
+        for alternative in rule.grammar:
+            matches, failure = yield alternative, index
+            ends.update(matches)
+            error = _merge_error(error, failure)
+        return ends, error
+    if parse is NotFollowedBy.grammar_parse.__func__:
+        matches, _ = yield rule.grammar[0], index
+        return (() if matches else (index,)), (index, frozenset([rule]))
+    if (parse is Grammar.grammar_parse.__func__ and
+            rule.grammar_whitespace_mode not in ('optional', 'required')):
+        return (yield from _sequence(rule, text, index))
+    ends = set()
+    for count, match in rule.grammar_parse(text, index, session):
+        if count is False:
+            return ends, (match[0], frozenset(match[1]))
+        ends.add(index + count)
+
+
+def _sequence(rule, text, index):
+    """Find the outcome of matching a sequence or repetition at a
+    position (see `_outcome`).
+
+    """
+    grammar = rule.grammar
+    minimum = rule.grammar_min
+    maximum = rule.grammar_max
+    null_ok = rule.grammar_null_subtoken_ok
+    # Past the first item, the items of a repetition are all the same
+    # grammar. If every item takes some input, a repetition cannot
+    # reach its maximum, and the number of items matched only matters
+    # up to the minimum.
+    limit = maximum
+    if (isinstance(grammar, RepeatingTuple) and not null_ok and
+            maximum > len(text.string)):
+        limit = max(minimum, 1)
+    ends = set()
+    error = None
+    pending = [(0, index)]
+    seen = set(pending)
+    while pending:
+        count, position = pending.pop()
+        if count >= minimum:
+            ends.add(position)
+        if count >= maximum:
+            continue
+        matches, failure = yield grammar[count], position
+        error = _merge_error(error, failure)
+        for end in matches:
+            if end == position and not null_ok:
+                continue
+            state = min(count + 1, limit), end
+            if state not in seen:
+                seen.add(state)
+                pending.append(state)
+    if rule.grammar_error_override or (
+            len(grammar) == 1 and error[0] == index and
+            rule.grammar_desc != rule.grammar_name):
+        # A failed alias of a single grammar with its own description
+        # reports itself.
+        error = index, frozenset([rule])
+    return ends, error
@@ -17,13 +17,22 @@
 
 from __future__ import unicode_literals
 
+import collections
+import functools
+import itertools
+import sys
+import threading
+
 import modgrammar
 from modgrammar import (L, WORD, OPTIONAL, ZERO_OR_MORE, ONE_OR_MORE, OR,
-                        LIST_OF, GRAMMAR, NOT_FOLLOWED_BY)
+                        LIST_OF, GRAMMAR, NOT_FOLLOWED_BY, Terminal)
 from modgrammar.extras import RE
+from modgrammar.util import error_result
 
 from quichem import tokens
 from quichem import modgrammar_fixes as fixes
+from quichem.predictive import IncrementalParser, PredictiveParser
+from quichem.segmentation import Segmenter
 
 
 modgrammar.grammar_whitespace_mode = 'explicit'
@@ -38,8 +47,75 @@ ELEMENTS = (
 # FIXME: Still missing "aq, inf".
 STATES = 'mon pol sln vit ads cd cr am aq lc s f l g n a'
 
+ENGINES = ('modgrammar', 'predictive', 'incremental')
+
+# The longest input for which the predictive engines report errors as
+# the "modgrammar" engine does. Finding such an error takes about 0.2 ms
+# for each character of input, so longer input gets the cheaper error
+# of `quichem.predictive.PredictiveParser`.
+MAX_EXPLAINED_LENGTH = 100
+
+SEGMENTER = Segmenter(ELEMENTS.split())
+
+_parsers = {}
+_parsers_lock = threading.Lock()
+_worker_parser = None
+
+
+def _literal(string, **kwargs):
+    """Create a literal grammar.
+
+    Equivalent to `modgrammar.L`, but passes an explicit whitespace
+    setting so that ``modgrammar`` does not walk the call stack to look
+    up the calling module's whitespace settings. With well over a
+    hundred literals in the grammar, that lookup is the bulk of the
+    time spent in `make_parser`.
+
+    """
+    return L(string, whitespace=None, **kwargs)
+
+
+class _ElementWord(Terminal):
 
-def make_parser():
+    """Grammar matching an element symbol.
+
+    Equivalent to an `OR` of a literal for each symbol in `ELEMENTS`,
+    but looks the symbols up in the prefix tree of `SEGMENTER` instead
+    of trying each of them in turn.
+
+    """
+
+    grammar = ()
+    grammar_name = 'element_word'
+    grammar_desc = 'element'
+    grammar_whitespace_mode = 'explicit'
+    grammar_whitespace = None
+
+    @classmethod
+    def grammar_parse(cls, text, index, sessiondata):
+        while len(text.string) < index + SEGMENTER.depth and not text.eof:
+            text = yield (None, None)
+        for symbol in SEGMENTER.matches(text.string, index):
+            yield (len(symbol), cls(symbol))
+        yield error_result(index, cls)
+
+
+def segmentations(string):
+    """Return every way of splitting a string of letters into elements,
+    in the order in which the parser tries them.
+
+    The first split is the one the parser picks when the letters form
+    a compound on their own (e.g. ``cnergy`` -> ``c ne rg y``).
+
+    Returns
+    -------
+    A list of lists of element symbols.
+
+    """
+    return list(SEGMENTER.splits(string))
+
+
+def make_parser(engine='modgrammar', memoize=False):
     """Create a parser for the ``quichem`` syntax.
 
     The parser handles coefficients, compounds, compounds, ions,
@@ -54,11 +130,44 @@ def make_parser():
     For a full syntax description, see SYNTAX.rst, included with the
     library.
 
+    Parameters
+    ----------
+    engine : string
+        One of `ENGINES`. The default, "modgrammar", builds the
+        grammar below with ``modgrammar``. "predictive" creates a
+        `quichem.predictive.PredictiveParser`, which accepts the same
+        input and produces the same tokens many times faster. For
+        input up to `MAX_EXPLAINED_LENGTH` characters long, it raises
+        the same errors; for longer input, its errors only give the
+        position the parser got to.
+        "incremental" creates a
+        `quichem.predictive.IncrementalParser`, a predictive parser
+        which reuses what it parsed of the previous string; use it to
+        parse a string again after each edit.
+    memoize : bool
+        Only used by the "modgrammar" engine. If true, return a
+        `quichem.modgrammar_fixes.PackratParser`, which remembers
+        where the coefficient, compound and charge rules matched
+        during a parse instead of matching them again when
+        backtracking.
+
     Returns
     -------
     The `quichem` parser.
 
+    See Also
+    --------
+    get_parser
+
     """
+    if engine == 'predictive':
+        return PredictiveParser(ELEMENTS.split(), STATES.split(),
+                                _explain_error)
+    if engine == 'incremental':
+        return IncrementalParser(ELEMENTS.split(), STATES.split(),
+                                 _explain_error)
+    if engine != 'modgrammar':
+        raise ValueError('Unknown parser engine: {!r}'.format(engine))
 
     # Note: Support for isotopes can be added by requiring brackets around
     # the value. E.g. 3'14'c -> 3^{14}C, '12''nh4'2s -> ^{12}(NH_3)_2S.
@@ -68,22 +177,23 @@ def make_parser():
     # because brackets must always end in a number, but these quotes cannot
     # end in a number.
 
-    element_word = OR(*ELEMENTS.split())
-    dot = L('.')
-    semicolon = L(';')
-    comma = L(',')
-    hyphen = L('-', tags=('sign',))
-    equals = L('=', tags=('sign',))
-    slash = L('/')
+    element_word = _ElementWord
+    dot = _literal('.')
+    semicolon = _literal(';')
+    comma = _literal(',')
+    hyphen = _literal('-', tags=('sign',))
+    equals = _literal('=', tags=('sign',))
+    slash = _literal('/')
     stoichiometric = GRAMMAR(equals, comma) | (comma, equals)
     leftright = GRAMMAR(hyphen, slash)
     equilibrium = GRAMMAR(equals, slash)
     state_word = GRAMMAR(
-        OR(*(L(state, tags=('state_word',)) for state in STATES.split())),
+        OR(*(_literal(state, tags=('state_word',))
+             for state in STATES.split())),
         collapse=True, desc='state')
     number = RE(r'\d+', tags=('number',), desc='number')
     decimal = RE(r'\d+\.\d*|\.\d+', tags=('decimal',))
-    parenthesis = L("'")
+    parenthesis = _literal("'")
 
     element = fixes.g([element_word], 'element', tokens.Element)
     compound_segment_ref = fixes.ref(lambda: compound_segment)
@@ -127,16 +237,285 @@ def make_parser():
         grammar = LIST_OF(item, sep=separator, collapse=True)
 
     Grammar.grammar_resolve_refs()
-    return Grammar.parser()
+    if not memoize:
+        return Grammar.parser()
+    # Both alternatives of item start by matching these at the same
+    # position. Memoizing the other rules costs more than it saves.
+    for rule in (coefficient, compound, charge):
+        fixes.memoize(rule)
+    return fixes.PackratParser(Grammar)
+
+
+def _explain_error(string):
+    """Return the error the ``modgrammar`` engine raises for a string,
+    or None if the string parses or is longer than
+    `MAX_EXPLAINED_LENGTH`.
+
+    Used by the predictive engines, so that every engine reports the
+    same errors. The string is not parsed by the ``modgrammar`` engine
+    (see `quichem.modgrammar_fixes.explain`).
+
+    """
+    if len(string) > MAX_EXPLAINED_LENGTH:
+        return None
+    return fixes.explain(get_parser('modgrammar').grammar, string)
+
+
+def get_parser(engine='modgrammar'):
+    """Return a parser for the ``quichem`` syntax shared by the whole
+    process.
+
+    The parser is created by `make_parser` the first time this
+    function is called for an engine; later calls return the same
+    object, even when called from several threads at once. Prefer this
+    over `make_parser` unless a private parser is needed.
+
+    """
+    try:
+        return _parsers[engine]
+    except KeyError:
+        pass
+    with _parsers_lock:
+        parser = _parsers.get(engine)
+        if parser is None:
+            parser = _parsers[engine] = make_parser(engine)
+        return parser
+
+
+class ParseCache(object):
+
+    """Bounded cache of parse results, keyed by the parsed string and
+    the engine of the parser, which discards the least recently used
+    results first.
 
+    Only successful parses are cached. The tokens are stored as plain
+    token instances (see `quichem.tokens.to_ast`), so cached results
+    do not keep the parse trees of the ``modgrammar`` engine alive. The
+    cache may be used from several threads.
 
-def parse(string, parser):
+    Parameters
+    ----------
+    max_entries : int
+        The maximum number of cached results.
+    max_bytes : int
+        The maximum estimated memory used by the cached results, or
+        None for no limit. Estimating the size of a result takes
+        about as long as parsing it with the predictive engine, so
+        only set this if the entry limit is not good enough.
+
+    Attributes
+    ----------
+    hits : int
+        The number of lookups which found a cached result.
+    misses : int
+        The number of lookups which did not.
+    size : int
+        The estimated memory used by the cached results, in bytes (0
+        unless `max_bytes` is set).
+
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def hit_rate(self):
+        """The fraction of lookups which found a cached result."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def clear(self):
+        """Remove all results and reset the statistics."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.size = 0
+
+    def parse(self, string, parser):
+        """Return the tokens of a string parsed by the given parser,
+        parsing it only if it is not cached.
+
+        Results are shared by every parser of the same engine (see
+        `ENGINES`), so the cache does not keep parsers alive.
+
+        Returns
+        -------
+        A new list of plain tokens, shared with other results for the
+        same string and engine. The tokens must not be modified.
+
+        """
+        key = _engine(parser), string
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return list(entry[0])
+            self.misses += 1
+        result = parser.parse_string(string)
+        tokens_ = () if result is None else tuple(
+            tokens.to_ast(result.elements))
+        size = 0 if self.max_bytes is None else _size(tokens_)
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = tokens_, size
+                self.size += size
+            while self._entries and (
+                    len(self._entries) > self.max_entries or
+                    (self.max_bytes is not None and
+                     self.size > self.max_bytes)):
+                self.size -= self._entries.popitem(last=False)[1][1]
+        return list(tokens_)
+
+
+def _engine(parser):
+    """Return the name of the engine of a parser created by
+    `make_parser`.
+
+    """
+    if isinstance(parser, IncrementalParser):
+        return 'incremental'
+    if isinstance(parser, PredictiveParser):
+        return 'predictive'
+    return 'modgrammar'
+
+
+def _size(root):
+    """Estimate the memory used by an object and the objects it refers
+    to, in bytes.
+
+    """
+    size = 0
+    seen = set()
+    pending = [root]
+    while pending:
+        object_ = pending.pop()
+        if id(object_) in seen or isinstance(object_, type):
+            continue
+        seen.add(id(object_))
+        size += sys.getsizeof(object_)
+        if isinstance(object_, (list, tuple)):
+            pending.extend(object_)
+        elif isinstance(object_, dict):
+            pending.extend(object_.values())
+        else:
+            if hasattr(object_, '__dict__'):
+                pending.append(object_.__dict__)
+            pending.extend(getattr(object_, name, None) for name in
+                           getattr(type(object_), '__slots__', ()))
+    return size
+
+
+PARSE_CACHE = ParseCache()
+
+
+def parse(string, parser, cache=None):
     """Parse a string using the given parser.
 
+    Parameters
+    ----------
+    string : string
+    parser
+        A parser created by `make_parser` or `get_parser`.
+    cache : ParseCache
+        The cache in which to look up and store the result, such as
+        `PARSE_CACHE`, which is shared by the whole process. By
+        default, the string is always parsed.
+
     Returns
     -------
-    A list of tokens storing the parsed data.
+    A list of tokens storing the parsed data. With a cache, the tokens
+    are plain token instances (see `quichem.tokens.to_ast`) for every
+    engine, including the ``modgrammar`` one, whose own tokens are
+    elements of its parse tree; they are shared with other callers and
+    must not be modified. With `cache` None, the tokens are those found
+    by the parser.
 
     """
+    if cache is not None:
+        return cache.parse(string, parser)
     result = parser.parse_string(string)
     return [] if result is None else list(result.elements)
+
+
+def parse_many(strings, jobs=None, chunksize=256, engine='predictive'):
+    """Parse many strings, in several processes.
+
+    Each worker process creates its own parser once and parses the
+    strings sent to it, so the cost of creating the parser and of
+    starting the processes is only paid once.
+
+    Parameters
+    ----------
+    strings : iterable
+        The strings to parse. Consumed lazily.
+    jobs : int
+        The number of worker processes. Defaults to the number of CPUs.
+        With 1, the strings are parsed in this process.
+    chunksize : int
+        The number of strings sent to a worker at a time.
+    engine : string
+        The parser engine (see `make_parser`).
+
+    Returns
+    -------
+    An iterator over the results, in the order of `strings`. Each
+    result is either the list of plain tokens (see
+    `quichem.tokens.to_ast`) or the `modgrammar.ParseError` raised for
+    that string.
+
+    """
+    if jobs is None:
+        # Imported here: multiprocessing pulls in socket, which the
+        # frozen GUI leaves out, and slows down starting the LaTeX tool.
+        import multiprocessing
+        jobs = multiprocessing.cpu_count()
+    if jobs == 1:
+        return map(functools.partial(_parse_one, parser=get_parser(engine)),
+                   strings)
+    return _parse_in_pool(strings, jobs, chunksize, engine)
+
+
+def _parse_in_pool(strings, jobs, chunksize, engine):
+    import multiprocessing
+    # Pool.imap reads all of its input up front, so the strings are
+    # passed to it in windows to bound memory use. The next window is
+    # sent to the workers before the results of the last are consumed.
+    strings = iter(strings)
+    size = jobs * chunksize * 4
+    windows = collections.deque()
+    with multiprocessing.Pool(jobs, _init_worker, (engine,)) as pool:
+        while True:
+            window = list(itertools.islice(strings, size))
+            if window:
+                windows.append(pool.imap(_parse_one, window, chunksize))
+                if len(windows) < 2:
+                    continue
+            if not windows:
+                return
+            for result in windows.popleft():
+                yield result
+
+
+def _init_worker(engine):
+    global _worker_parser
+    _worker_parser = get_parser(engine)
+
+
+def _parse_one(string, parser=None):
+    """Parse a string with the given parser (by default, the parser of
+    this worker), returning parse errors instead of raising them.
+
+    """
+    try:
+        return tokens.to_ast(parse(string, parser or _worker_parser))
+    except modgrammar.ParseError as e:
+        # Drop the grammar classes, which cannot be pickled.
+        return modgrammar.ParseError(None, e.buffer, e.buffer_pos, e.char,
+                                     e.line, e.col, message=e.message)
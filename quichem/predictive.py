@@ -0,0 +1,771 @@
+# This file is part of quichem.
+#
+# quichem is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# quichem is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with quichem.  If not, see <http://www.gnu.org/licenses/>.
+
+"""A hand-written parser for the ``quichem`` syntax.
+
+`PredictiveParser` accepts exactly the language of the ``modgrammar``
+grammar built by `quichem.parser.make_parser` and produces the same
+tokens, without backtracking. Use ``make_parser(engine='predictive')``
+to create one.
+
+Notes
+-----
+The ``modgrammar`` parser returns the first complete parse found by a
+depth-first search which tries the alternatives of every rule in
+order, repetitions longest first. Almost every choice that search makes
+is decided by the next character:
+
+* A coefficient, a counter's number and a counter's dot are always
+  taken when present. Leaving them out never leads to a parse that
+  taking them does not reach first.
+* A quote opens a group if it is followed by a letter or a quote, and
+  closes one if it is followed by a digit.
+* A compound continues as long as the next character is a letter or an
+  opening quote.
+
+What remains is how runs of letters are split into elements, where the
+last item of the input ends, and which separators follow which items.
+Only the last run of letters in an item can end in something other than
+an element (a state written without a semicolon), and an item can only
+end where a separator or the end of the input follows. The parser first
+works out, from right to left, at which of those positions the rest of
+the input can be parsed, then splits each run of letters with a dynamic
+program over the positions in the run which reproduces the search
+order of ``modgrammar`` (see `quichem.segmentation`). Each position is
+visited a bounded number of times, so parsing takes linear time.
+
+Errors are found separately, once a parse has failed. On its own, the
+parser reports the furthest position it examined, which is often not
+where ``modgrammar`` reports the error, and does not say what was
+expected there. Parsers created by `quichem.parser.make_parser` are
+given a function finding the error ``modgrammar`` reports instead (see
+`quichem.modgrammar_fixes.explain`), for input up to
+`quichem.parser.MAX_EXPLAINED_LENGTH` characters long.
+
+"""
+
+from __future__ import unicode_literals
+
+import itertools
+import re
+
+from modgrammar import ParseError
+from modgrammar.util import get_found_txt
+
+from quichem import tokens
+from quichem.segmentation import Segmenter
+
+
+__all__ = ['PredictiveParser', 'IncrementalParser']
+
+
+_LETTERS = re.compile('[a-z]+')
+_NUMBER = re.compile(r'\d+')
+_DECIMAL = re.compile(r'\d+\.\d*|\.\d+')
+_CHARGE = re.compile(r'(\d*)([=-])')
+_SEPARATOR_WORDS = ('=,', ',=', '-/', '=/', '=', '-', '/')
+# The separator words starting with each character, in order.
+_SEPARATOR_WORDS_AT = {
+    character: tuple(word for word in _SEPARATOR_WORDS
+                     if word[0] == character)
+    for character in '=,-/'}
+_SEPARATOR_START = frozenset(';=-/,')
+# Matches what an item may read after a position it has reached, short
+# of the two characters after the match.
+_LOOKAHEAD = re.compile(r"[.;']?[a-z]*\d*")
+
+
+class Result(object):
+
+    """The result of `PredictiveParser.parse_string`.
+
+    Mirrors the parts of a ``modgrammar`` parse result used by
+    `quichem.parser.parse`.
+
+    Attributes
+    ----------
+    string : string
+        The parsed string.
+    elements : list
+        The parsed items and separators (`quichem.tokens.Item` and
+        `quichem.tokens.Separator`), in order.
+
+    """
+
+    __slots__ = ('string', 'elements')
+
+    def __init__(self, string, elements):
+        self.string = string
+        self.elements = elements
+
+
+class PredictiveParser(object):
+
+    """Parser for the ``quichem`` syntax which does not backtrack.
+
+    Parameters
+    ----------
+    elements : iterable
+        The element symbols, in lowercase, in the order in which the
+        ``modgrammar`` grammar tries them.
+    states : iterable
+        The state symbols, in the order in which the ``modgrammar``
+        grammar tries them.
+    explain : callable
+        Called with a string which does not parse; returns the
+        `modgrammar.ParseError` to raise for it, or None to raise an
+        error at the furthest position examined by the parser.
+
+    See Also
+    --------
+    quichem.parser.make_parser
+
+    """
+
+    def __init__(self, elements, states, explain=None):
+        self.explain = explain
+        self.segmenter = Segmenter(elements)
+        self.states = tuple(states)
+        self.state_set = frozenset(self.states)
+        self.longest_state = max(map(len, self.states))
+
+    def parse_string(self, string):
+        """Parse a string.
+
+        Returns
+        -------
+        A `Result`, or None if the string is empty.
+
+        Raises
+        ------
+        modgrammar.ParseError
+            If the string is not valid ``quichem`` input.
+
+        """
+        if not string:
+            return None
+        return Result(string, _Parse(self, string).elements())
+
+
+class IncrementalParser(PredictiveParser):
+
+    """A `PredictiveParser` for successive versions of a string, such as
+    the contents of a text box while it is being edited.
+
+    Each parse reuses the items of the parse before it which the edit
+    cannot have changed, with the tokens created for them, and only
+    parses the others. Items are also reused from the last parse of
+    valid input if the parse before was of invalid input, or the other
+    way around, as text being typed is often invalid for a moment. All
+    separators of a type share one token. The tokens and errors are
+    the same as those of a `PredictiveParser`.
+
+    Attributes
+    ----------
+    hits : int
+        The number of items reused from earlier parses, since
+        creation or the last call to `reset_stats`.
+    misses : int
+        The number of items parsed.
+
+    Notes
+    -----
+    An item depends on the text after its start in two ways only: on
+    the characters it reads, and on whether the rest of the input can
+    be parsed after each position at which it tries to end. Each parse
+    records both for every item it parses. An item of an earlier parse
+    is reused at the same position in the new text (or, after the edit,
+    at the position it has been moved to) if the characters are
+    unchanged and the rest of the input can be parsed after the same
+    positions as before. Separators are still found from right to
+    left, as by `PredictiveParser`, so an edit which changes how the
+    input before it is parsed is handled like any other input.
+
+    """
+
+    def __init__(self, elements, states, explain=None):
+        PredictiveParser.__init__(self, elements, states, explain)
+        # Maps separator types to the one token used for all separators
+        # of each type.
+        self.separators = {}
+        # The last parses of valid and of invalid input, the most
+        # recent first.
+        self._recent = []
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Set `hits` and `misses` to 0."""
+        self.hits = self.misses = 0
+
+    def parse_string(self, string):
+        """Parse a string, reusing the items of earlier calls.
+
+        Returns
+        -------
+        A `Result`, or None if the string is empty. The tokens of the
+        items reused are shared with earlier results and must not be
+        modified.
+
+        Raises
+        ------
+        modgrammar.ParseError
+            If the string is not valid ``quichem`` input.
+
+        """
+        if not string:
+            return None
+        parse = _IncrementalParse(self, string, self._recent)
+        valid = False
+        try:
+            result = Result(string, parse.elements())
+            valid = True
+            return result
+        finally:
+            # What was recorded while parsing invalid input is as valid
+            # as the rest.
+            parse.previous = []
+            parse.valid = valid
+            self._recent = [parse] + [
+                recent for recent in self._recent if recent.valid != valid]
+            self.hits += parse.hits
+            self.misses += parse.misses
+
+
+class _Parse(object):
+
+    """The state of one call to `PredictiveParser.parse_string`.
+
+    Items are stored in a raw form until the parse is known to succeed:
+    a tuple of the end position, the coefficient as a pair of strings
+    (or None), a list of counters, the charge as a pair of strings (or
+    None) and the state (or None). A counter is a pair of an element
+    symbol or a list of counters (for a group) and a count.
+
+    """
+
+    def __init__(self, parser, text):
+        self.parser = parser
+        self.text = text
+        self.items = {}
+        # Maps the position of each separator after which the rest of
+        # the input can be parsed to its type and end position.
+        self.separators = {}
+        # Maps item start positions to the furthest position examined
+        # and the item end positions tried, for error messages.
+        self.reached = {}
+
+    def elements(self):
+        """Parse the whole input and return the list of tokens."""
+        text = self.text
+        self.find_separators(len(text))
+        item = self.item(0)
+        if item is None:
+            explain = self.parser.explain
+            error = None if explain is None else explain(text)
+            if error is None:
+                position = self.error_position()
+                error = ParseError(None, text, position, position, 0,
+                                   position, message='Unexpected {}'.format(
+                                       get_found_txt(text, position)))
+            raise error
+        elements = [self.item_token(0)]
+        while item[0] < len(text):
+            type_, start = self.separators[item[0]]
+            item = self.item(start)
+            elements.append(self.separator_token(type_))
+            elements.append(self.item_token(start))
+        return elements
+
+    def find_separators(self, stop):
+        """Find the separators before the given position after which
+        the rest of the input can be parsed, from right to left.
+
+        Those at or after the position must have been found.
+
+        """
+        text = self.text
+        for position in range(stop - 1, -1, -1):
+            if text[position] not in _SEPARATOR_START:
+                continue
+            for type_, end in self.separator_options(position):
+                if self.item(end) is not None:
+                    self.separators[position] = type_, end
+                    break
+
+    def separator_token(self, type_):
+        """Return a `quichem.tokens.Separator` of the given type."""
+        return tokens.Separator.from_attributes(type_=type_)
+
+    def item_token(self, start):
+        """Return the `quichem.tokens.Item` for the raw item starting at
+        the given position.
+
+        """
+        return _item_token(self.items[start])
+
+    def complete(self, position):
+        """Return whether the input can be parsed to the end if an item
+        ends at the given position.
+
+        Only valid for positions after those of all items being
+        parsed.
+
+        """
+        return position == len(self.text) or position in self.separators
+
+    def separator_options(self, position):
+        """Yield the type and end position of each separator starting at
+        the given position, in the order tried by ``modgrammar``.
+
+        """
+        text = self.text
+        starts = (position + 1, position) if text[position] == ';' else (
+            position,)
+        for start in starts:
+            for word in _SEPARATOR_WORDS_AT.get(text[start:start + 1], ()):
+                if text.startswith(word, start):
+                    yield '=,' if word == ',=' else word, start + len(word)
+
+    def item(self, start):
+        """Return the raw item starting at the given position which the
+        ``modgrammar`` parser would choose, or None if none can be
+        followed by the rest of the input.
+
+        """
+        try:
+            return self.items[start]
+        except KeyError:
+            pass
+        item = self.items[start] = self.parse_item(start)
+        return item
+
+    def parse_item(self, start):
+        """Parse the item starting at the given position; see `item`."""
+        text = self.text
+        parser = self.parser
+        tried = []
+        self.reached[start] = [start, tried]
+
+        position = start
+        coefficient = None
+        match = _DECIMAL.match(text, position)
+        if match is not None:
+            coefficient = match.group(), '1'
+            position = match.end()
+        else:
+            match = _NUMBER.match(text, position)
+            if match is not None:
+                coefficient = match.group(), '1'
+                position = match.end()
+                if text.startswith('/', position):
+                    match = _NUMBER.match(text, position + 1)
+                    if match is not None:
+                        coefficient = coefficient[0], match.group()
+                        position = match.end()
+
+        compound = self.compound(position, start)
+        if compound is None:
+            return None
+        counters, run, end = compound
+        if run is None:
+            full = []
+        else:
+            full = self.segment(run, end, (end,), True)
+            if full is None:
+                self.reach(start, parser.segmenter.split_end(text, run, end))
+            else:
+                full = full[0]
+        charges = self.charge_options(end) if full is not None else ()
+
+        # An item without a state, not followed by a charge.
+        for charge_end, charge in charges:
+            tried.append(charge_end)
+            if (_CHARGE.match(text, charge_end) is None and
+                    self.complete(charge_end)):
+                return charge_end, coefficient, counters + full, charge, None
+
+        # An item with an optional state.
+        suffix = None
+        for charge_end, charge in charges:
+            for state_end, state in self.state_options(charge_end):
+                tried.append(state_end)
+                if self.complete(state_end):
+                    suffix = state_end, charge, state
+                    break
+            if suffix is not None:
+                break
+        if run is None:
+            return None if suffix is None else (
+                (suffix[0], coefficient, counters) + suffix[1:])
+        # The compound may also end inside its last run of letters, with
+        # the rest of the run as the state.
+        goals = set() if suffix is None else {end}
+        if self.complete(end):
+            for stop in range(max(run, end - parser.longest_state), end):
+                if text[stop:end] in parser.state_set:
+                    goals.add(stop)
+        segments = self.segment(run, end, goals, bool(counters))
+        if segments is None:
+            return None
+        symbols, stop = segments
+        if stop == end:
+            return (suffix[0], coefficient, counters + symbols) + suffix[1:]
+        tried.append(end)
+        return end, coefficient, counters + symbols, None, text[stop:end]
+
+    def compound(self, position, start):
+        """Scan the counters of a compound starting at the given
+        position.
+
+        Groups are scanned with an explicit stack rather than by
+        recursion, so any depth of nesting can be parsed.
+
+        Returns
+        -------
+        None if no compound can start at the position. Otherwise, a
+        tuple of the counters, the start of the last run of letters if
+        it has not been split into elements (or None), and the end
+        position of the compound.
+
+        """
+        text = self.text
+        counters = []
+        # The counters of the enclosing compound and groups, while the
+        # counters of a group are scanned.
+        outer = []
+        while True:
+            group = bool(outer)
+            self.reach(start, position)
+            match = _LETTERS.match(text, position)
+            if match is not None:
+                end = match.end()
+                number = _NUMBER.match(text, end)
+                if (number is None and not text.startswith('.', end) and
+                        not self.opens(end) and
+                        not (group and self.closes(end))):
+                    # The last run of letters; how it is split depends on
+                    # what follows the compound.
+                    if group:
+                        self.reach(start, end + text.startswith("'", end))
+                        return None
+                    return counters, position, end
+                segments = self.segment(position, end, (end,), True)
+                if segments is None:
+                    return None
+                counters.extend(segments[0])
+                item = counters.pop()[0]
+                position = end
+            elif self.opens(position):
+                outer.append(counters)
+                counters = []
+                position += 1
+                continue
+            elif group and counters and self.closes(position):
+                item, counters = counters, outer.pop()
+                number = _NUMBER.match(text, position + 1)
+            elif group or not counters:
+                if text.startswith("'", position):
+                    self.reach(start, position + 1)
+                return None
+            else:
+                return counters, None, position
+            if number is not None:
+                counters.append((item, number.group()))
+                position = number.end()
+            else:
+                counters.append((item, '1'))
+            if text.startswith('.', position):
+                position += 1
+
+    def reach(self, start, position):
+        """Record that the item starting at `start` was parsed up to the
+        given position.
+
+        """
+        reached = self.reached[start]
+        reached[0] = max(reached[0], position)
+
+    def opens(self, position):
+        """Return whether a quote opening a group is at the given
+        position.
+
+        """
+        text = self.text
+        return (text.startswith("'", position) and
+                (text.startswith("'", position + 1) or
+                 _LETTERS.match(text, position + 1) is not None))
+
+    def closes(self, position):
+        """Return whether a quote closing a group is at the given
+        position.
+
+        """
+        return (self.text.startswith("'", position) and
+                _NUMBER.match(self.text, position + 1) is not None)
+
+    def segment(self, start, end, goals, stop_at_start):
+        """Split the letters between two positions into elements with
+        `quichem.segmentation.Segmenter.split`.
+
+        Returns
+        -------
+        None if no split ends at a goal position; otherwise a tuple of
+        the counters of the elements and the position at which the
+        split stops.
+
+        """
+        split = self.parser.segmenter.split(self.text, start, end, goals,
+                                            stop_at_start)
+        if split is None:
+            return None
+        symbols, stop = split
+        return [(symbol, '1') for symbol in symbols], stop
+
+    def charge_options(self, position):
+        """Return the end position and charge of each way an item can
+        continue after its compound ends at the given position, in the
+        order tried by ``modgrammar``.
+
+        """
+        text = self.text
+        match = _CHARGE.match(text, position + text.startswith(
+            '.', position))
+        if match is None:
+            return ((position, None),)
+        return ((match.end(), (match.group(1) or '1', match.group(2))),
+                (position, None))
+
+    def state_options(self, position):
+        """Yield the end position and state of each way an item can end
+        after its charge ends at the given position, in the order tried
+        by ``modgrammar``.
+
+        """
+        text = self.text
+        starts = (position + 1, position) if text.startswith(
+            ';', position) else (position,)
+        for start in starts:
+            for state in self.parser.states:
+                if text.startswith(state, start):
+                    yield start + len(state), state
+        yield position, None
+
+    def error_position(self):
+        """Return the furthest position examined while trying to parse
+        the input from its start.
+
+        """
+        text = self.text
+        furthest = 0
+        pending = [0]
+        seen = set(pending)
+        while pending:
+            start = pending.pop()
+            if start not in self.reached:
+                self.item(start)
+            reached, tried = self.reached[start]
+            furthest = max(furthest, reached, *tried)
+            for position in tried:
+                if position >= len(text) or text[position] not in (
+                        _SEPARATOR_START):
+                    continue
+                if text[position] == ';':
+                    # Both states and separators may start with one.
+                    furthest = max(furthest, position + 1)
+                for _, end in self.separator_options(position):
+                    if end not in seen:
+                        seen.add(end)
+                        pending.append(end)
+        return furthest
+
+
+class _IncrementalParse(_Parse):
+
+    """The state of one call to `IncrementalParser.parse_string`.
+
+    Besides the raw items, records for each item start position the
+    text the item depends on, whether the input could be parsed after
+    each position at which it tried to end, and what `reached` holds
+    for it, all relative to the start position.
+
+    """
+
+    def __init__(self, parser, text, previous):
+        _Parse.__init__(self, parser, text)
+        # Each earlier parse, with the length of the text it shares
+        # with this one at the start, the position from which this
+        # text is the same as its text to the end, and the length by
+        # which this text is longer.
+        self.previous = [(parse,) + _edit(parse.text, text)
+                         for parse in previous]
+        self.valid = None
+        self.records = {}
+        # The tokens created for the items, and those of the previous
+        # parse for the items reused, by start position.
+        self.tokens = {}
+        # The positions passed to `complete` by the item being parsed.
+        self.completions = None
+        self.hits = self.misses = 0
+
+    def complete(self, position):
+        complete = _Parse.complete(self, position)
+        if self.completions is not None:
+            self.completions.append((position, complete))
+        return complete
+
+    def item(self, start):
+        try:
+            return self.items[start]
+        except KeyError:
+            pass
+        item = self.reuse(start)
+        if item is False:
+            self.misses += 1
+            self.completions = []
+            item = self.items[start] = self.parse_item(start)
+            reached, tried = self.reached[start]
+            completions = self.completions
+            self.completions = None
+            end = max(self.extent(position) for position in itertools.chain(
+                (reached,), tried, (position for position, _ in completions)))
+            self.records[start] = (
+                self.text[start:end], end - start,
+                [(position - start, complete)
+                 for position, complete in completions],
+                reached - start, [position - start for position in tried])
+        return item
+
+    def reuse(self, start):
+        """Reuse the item of an earlier parse which starts at the
+        position corresponding to the given one, if it is unchanged.
+
+        Returns
+        -------
+        The raw item (which may be None), or False if it cannot be
+        reused.
+
+        """
+        text = self.text
+        for previous, prefix, suffix, shift in self.previous:
+            if start <= prefix:
+                old = start
+            elif start >= suffix:
+                old = start - shift
+            else:
+                continue
+            record = previous.records.get(old)
+            if record is None:
+                continue
+            window, length, completions, reached, tried = record
+            if (text[start:start + length] != window or
+                    any(self.complete(start + offset) != complete
+                        for offset, complete in completions)):
+                continue
+            self.hits += 1
+            item = previous.items[old]
+            if item is not None:
+                item = (item[0] + start - old,) + item[1:]
+            self.items[start] = item
+            self.records[start] = record
+            self.reached[start] = [reached + start,
+                                   [position + start for position in tried]]
+            token = previous.tokens.get(old)
+            if token is not None:
+                self.tokens[start] = token
+            return item
+        return False
+
+    def extent(self, position):
+        """Return the position before which lies all the text an item
+        can have read after reaching the given position.
+
+        """
+        return _LOOKAHEAD.match(self.text, position).end() + 2
+
+    def find_separators(self, stop):
+        # The separators in the text after the edit are those of the
+        # earlier parse, as they only depend on the text after them.
+        if self.previous:
+            previous, _, suffix, shift = min(
+                self.previous, key=lambda previous: previous[2])
+            for position, (type_, end) in previous.separators.items():
+                if position + shift >= suffix:
+                    self.separators[position + shift] = type_, end + shift
+            stop = min(stop, suffix)
+        _Parse.find_separators(self, stop)
+
+    def separator_token(self, type_):
+        try:
+            return self.parser.separators[type_]
+        except KeyError:
+            token = self.parser.separators[type_] = _Parse.separator_token(
+                self, type_)
+            return token
+
+    def item_token(self, start):
+        try:
+            return self.tokens[start]
+        except KeyError:
+            token = self.tokens[start] = _Parse.item_token(self, start)
+            return token
+
+
+def _edit(old, new):
+    """Return the length of the common start of two strings, the
+    position in the new string of their common end, and the difference
+    in their lengths.
+
+    """
+    limit = min(len(old), len(new))
+    prefix = 0
+    while prefix < limit and old[prefix] == new[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and old[-1 - suffix] == new[-1 - suffix]:
+        suffix += 1
+    return prefix, len(new) - suffix, len(new) - len(old)
+
+
+def _counter_tokens(counters):
+    """Create a list of `quichem.tokens.Counter` from raw counters."""
+    result = []
+    # The raw counters of each group whose tokens have not been created
+    # yet, and the list to put them in.
+    pending = [(counters, result)]
+    while pending:
+        counters, list_ = pending.pop()
+        for item, count in counters:
+            if isinstance(item, str):
+                item = tokens.Element.from_attributes(symbol=item)
+            else:
+                pending.append((item, []))
+                item = tokens.Group.from_attributes(list_=pending[-1][1])
+            list_.append(tokens.Counter.from_attributes(item=item,
+                                                       count=count))
+    return result
+
+
+def _item_token(item):
+    """Create a `quichem.tokens.Item` from a raw item."""
+    _, coefficient, counters, charge, state = item
+    numerator, denominator = coefficient or ('1', '1')
+    value, sign = charge or ('0', '')
+    return tokens.Item.from_attributes(
+        coefficient=tokens.Coefficient.from_attributes(
+            numerator=numerator, denominator=denominator),
+        compound=tokens.Compound.from_attributes(
+            list_=_counter_tokens(counters)),
+        charge=tokens.Charge.from_attributes(value=value, sign=sign),
+        state=tokens.State.from_attributes(state=state or ''))
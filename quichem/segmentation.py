@@ -0,0 +1,203 @@
+# This file is part of quichem.
+#
+# quichem is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# quichem is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with quichem.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Splitting runs of letters into element symbols.
+
+The ``quichem`` syntax writes compounds without capital letters, so
+``cnergy`` has to be split into elements: here ``c ne rg y``, since
+``cn er`` cannot be continued. `Segmenter` finds the split the parser
+picks in time linear in the length of the string, and can list all
+other valid splits.
+
+"""
+
+from __future__ import unicode_literals
+
+
+__all__ = ['Segmenter']
+
+
+class Segmenter(object):
+
+    """Splits strings into symbols from a fixed set.
+
+    Splits are made as by a parser which tries the symbols matching at
+    each position in the order given, and backtracks to the next symbol
+    when the rest of the string cannot be split.
+
+    Parameters
+    ----------
+    symbols : iterable
+        The symbols, in order of preference.
+
+    Attributes
+    ----------
+    trie : dict
+        A prefix tree of the symbols. Each node maps characters to
+        child nodes; the key None maps to a pair of the preference and
+        the symbol ending at that node.
+    depth : int
+        The length of the longest symbol.
+
+    """
+
+    def __init__(self, symbols):
+        self.trie = {}
+        self.depth = 0
+        for preference, symbol in enumerate(symbols):
+            node = self.trie
+            for character in symbol:
+                node = node.setdefault(character, {})
+            node.setdefault(None, (preference, symbol))
+            self.depth = max(self.depth, len(symbol))
+
+    def matches(self, string, position=0, end=None):
+        """Return the symbols which occur in a string at the given
+        position (and end by `end`), in order of preference.
+
+        """
+        if end is None:
+            end = len(string)
+        found = []
+        node = self.trie
+        for character in string[position:min(end, position + self.depth)]:
+            node = node.get(character)
+            if node is None:
+                break
+            if None in node:
+                found.append(node[None])
+        if len(found) > 1:
+            found.sort()
+        return [symbol for _, symbol in found]
+
+    def reachable(self, string, start, end, stops, stop_at_start=False):
+        """Return, for each position between `start` and `end`, whether
+        the string can be split from there up to one of the given stop
+        positions.
+
+        Returns
+        -------
+        A list of booleans, indexed by position minus `start`.
+
+        """
+        reachable = [False] * (end - start + 1)
+        for position in range(end, start - 1, -1):
+            if position in stops and (position > start or stop_at_start):
+                reachable[position - start] = True
+                continue
+            for symbol in self.matches(string, position, end):
+                if reachable[position + len(symbol) - start]:
+                    reachable[position - start] = True
+                    break
+        return reachable
+
+    def split(self, string, start=0, end=None, stops=None,
+              stop_at_start=False):
+        """Split part of a string into symbols.
+
+        Takes the preferred symbol at each position which lets the rest
+        of the string be split, and only stops before `end` (at one of
+        `stops`) once no symbol can be taken.
+
+        Parameters
+        ----------
+        string : string
+        start, end : int
+            The part of the string to split. `end` defaults to the end
+            of the string.
+        stops : container
+            The positions at which the split may stop. Defaults to
+            `end` alone.
+        stop_at_start : bool
+            Whether the split may stop at `start` without taking any
+            symbol.
+
+        Returns
+        -------
+        None if the string cannot be split up to one of `stops`;
+        otherwise a tuple of the list of symbols and the position at
+        which the split stops.
+
+        See Also
+        --------
+        splits
+
+        """
+        if end is None:
+            end = len(string)
+        if stops is None:
+            stops = (end,)
+        reachable = self.reachable(string, start, end, stops, stop_at_start)
+        if not reachable[0]:
+            return None
+        symbols = []
+        position = start
+        while True:
+            for symbol in self.matches(string, position, end):
+                if reachable[position + len(symbol) - start]:
+                    symbols.append(symbol)
+                    position += len(symbol)
+                    break
+            else:
+                return symbols, position
+
+    def splits(self, string, start=0, end=None):
+        """Yield every split of part of a string into symbols, as
+        lists of symbols.
+
+        The splits are yielded in the order a backtracking parser would
+        find them, so the first is the one `split` returns.
+
+        """
+        if end is None:
+            end = len(string)
+        reachable = self.reachable(string, start, end, (end,))
+
+        def options(position):
+            return iter([symbol for symbol in self.matches(
+                string, position, end)
+                if reachable[position + len(symbol) - start]])
+
+        if start == end or not reachable[0]:
+            return
+        symbols = []
+        stack = [(start, options(start))]
+        while stack:
+            position, remaining = stack[-1]
+            symbol = next(remaining, None) if position < end else None
+            if position == end:
+                yield list(symbols)
+            if symbol is None:
+                stack.pop()
+                if stack:
+                    symbols.pop()
+                continue
+            symbols.append(symbol)
+            position += len(symbol)
+            stack.append((position, options(position)))
+
+    def split_end(self, string, start=0, end=None):
+        """Return the furthest position up to which part of a string can
+        be split into symbols.
+
+        """
+        if end is None:
+            end = len(string)
+        ends = {start}
+        for position in range(start, end):
+            if position in ends:
+                ends.update(position + len(symbol)
+                            for symbol in self.matches(string, position, end))
+        return max(ends)
@@ -22,7 +22,7 @@ from quichem.modgrammar_fixes import Token, default, string
 
 
 __all__ = ['Element', 'Group', 'Counter', 'Compound', 'State', 'Coefficient',
-           'Charge', 'Item', 'Separator']
+           'Charge', 'Item', 'Separator', 'to_ast', 'canonical']
 
 
 class Element(Token):
@@ -36,12 +36,17 @@ class Element(Token):
 
     """
 
+    __slots__ = ('symbol',)
+
     def grammar_init(self):
         self.symbol = string(self)
 
     def __repr__(self):
         return 'Element[{}]'.format(self.symbol)
 
+    def key(self):
+        return 'Element', self.symbol
+
 
 class Group(Token):
 
@@ -58,12 +63,17 @@ class Group(Token):
 
     """
 
+    __slots__ = ('list_',)
+
     def grammar_init(self):
         self.list_ = self.get_all('compound_segment', 'counter')
 
     def __repr__(self):
         return 'Group[{!r}]'.format(self.list_)
 
+    def key(self):
+        return 'Group', _counters_key(self.list_)
+
 
 class Counter(Token):
 
@@ -78,6 +88,8 @@ class Counter(Token):
 
     """
 
+    __slots__ = ('item', 'count')
+
     def grammar_init(self):
         self.item = self.get('element') or self.get('group')
         self.count = default(string(self.get('number')), '1')
@@ -85,6 +97,9 @@ class Counter(Token):
     def __repr__(self):
         return 'Counter[{!r}, {}]'.format(self.item, self.count)
 
+    def key(self):
+        return 'Counter', self.item.key(), self.count
+
 
 class Compound(Token):
 
@@ -101,12 +116,17 @@ class Compound(Token):
 
     """
 
+    __slots__ = ('list_',)
+
     def grammar_init(self):
         self.list_ = self.get_all('compound_segment', 'counter')
 
     def __repr__(self):
         return 'Compound[{!r}]'.format(self.list_)
 
+    def key(self):
+        return 'Compound', _counters_key(self.list_)
+
 
 class State(Token):
 
@@ -119,12 +139,17 @@ class State(Token):
 
     """
 
+    __slots__ = ('state',)
+
     def grammar_init(self):
         self.state = string(self.find('state_word'))
 
     def __repr__(self):
         return 'State[{}]'.format(self.state)
 
+    def key(self):
+        return 'State', self.state
+
 
 class Coefficient(Token):
 
@@ -140,6 +165,8 @@ class Coefficient(Token):
 
     """
 
+    __slots__ = ('numerator', 'denominator')
+
     def grammar_init(self):
         self.numerator, self.denominator = string(self.find('decimal')), '1'
         if self.numerator is None:
@@ -149,6 +176,9 @@ class Coefficient(Token):
     def __repr__(self):
         return 'Coefficient[{}, {}]'.format(self.numerator, self.denominator)
 
+    def key(self):
+        return 'Coefficient', self.numerator, self.denominator
+
 
 class Charge(Token):
 
@@ -165,6 +195,8 @@ class Charge(Token):
 
     """
 
+    __slots__ = ('value', 'sign')
+
     def grammar_init(self):
         self.value = default(string(self.find('number')), '1')
         self.sign = string(self.find('sign'))
@@ -172,6 +204,12 @@ class Charge(Token):
     def __repr__(self):
         return 'Charge[{}, {}]'.format(self.value, self.sign)
 
+    def key(self):
+        # The sign of a charge of 0 is not displayed.
+        if self.value == '0':
+            return 'Charge', '0', ''
+        return 'Charge', self.value, self.sign
+
 
 class Item(Token):
 
@@ -187,6 +225,8 @@ class Item(Token):
 
     """
 
+    __slots__ = ('coefficient', 'compound', 'charge', 'state')
+
     def grammar_init(self):
         self.coefficient = default(
             self.find('coefficient'),
@@ -201,6 +241,10 @@ class Item(Token):
         return 'Item[{!r}, {!r}, {!r}, {!r}]'.format(
             self.coefficient, self.compound, self.charge, self.state)
 
+    def key(self):
+        return ('Item', self.coefficient.key(), self.compound.key(),
+                self.charge.key(), self.state.key())
+
 
 class Separator(Token):
 
@@ -214,6 +258,8 @@ class Separator(Token):
 
     """
 
+    __slots__ = ('type_',)
+
     def grammar_init(self):
         self.type_ = string(self.find('separator_word'))
         if self.type_ == ',=':
@@ -221,3 +267,67 @@ class Separator(Token):
 
     def __repr__(self):
         return 'Separator[{}]'.format(self.type_)
+
+    def key(self):
+        return 'Separator', self.type_
+
+
+def _counters_key(counters):
+    """Return the key of a list of counters, for `Group.key` and
+    `Compound.key`.
+
+    The key is a flat tuple of the symbol and count of each element,
+    with a quote before the contents of each group and a quote and the
+    count after them, so that deeply nested groups need no recursion.
+
+    """
+    key = []
+    # The counters left in each enclosing group, and the count of the
+    # group.
+    stack = [(iter(counters), None)]
+    while stack:
+        counters, count = stack[-1]
+        for counter in counters:
+            item = counter.item
+            if isinstance(item, Group):
+                key.append("'")
+                stack.append((iter(item.list_), counter.count))
+                break
+            key += (item.symbol, counter.count)
+        else:
+            stack.pop()
+            if count is not None:
+                key += ("'", count)
+    return tuple(key)
+
+
+def to_ast(ast):
+    """Copy a list of tokens into plain token instances, which can be
+    pickled and use far less memory than the tokens found by the
+    ``modgrammar`` parser.
+
+    Compilers accept the copy in place of the original list.
+
+    See Also
+    --------
+    quichem.modgrammar_fixes.Token.detach
+
+    """
+    return [token.detach() for token in ast]
+
+
+def canonical(ast):
+    """Return a hashable key for a list of tokens, which is the same
+    for all inputs that parse to the same tokens.
+
+    Inputs which only differ in how they are written, such as
+    ``c.mgali`` and ``cmg.ali``, ``=,`` and ``,=``, or ``h`` and
+    ``h1``, have the same key, and are compiled to the same output by
+    any compiler.
+
+    See Also
+    --------
+    quichem.modgrammar_fixes.Token.key
+
+    """
+    return tuple(token.key() for token in ast)
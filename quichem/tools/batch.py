@@ -0,0 +1,79 @@
+# This file is part of quichem.
+#
+# quichem is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# quichem is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with quichem.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Rendering many ``quichem`` strings into one output.
+
+Strings are parsed and compiled one at a time and the output is written
+as it is produced, so any number of strings (such as every equation in
+a reaction database) can be rendered into one file in bounded memory.
+
+    >>> import quichem.compilers.html
+    >>> with open('reactions.txt') as source:
+    ...     with open('reactions.html', 'w') as output:
+    ...         render_all((line.strip() for line in source), output.write,
+    ...                    quichem.compilers.html.HtmlCompiler())
+    (1000000, 0)
+
+"""
+
+from __future__ import unicode_literals
+
+from modgrammar import ParseError
+
+import quichem.parser
+
+
+def render_all(strings, write, compiler, separator='\n', errors='strict',
+               jobs=1, engine='predictive'):
+    """Parse and compile each of the given strings, writing the output
+    for each followed by `separator`.
+
+    Parameters
+    ----------
+    strings : iterable
+        The strings to render. Consumed lazily.
+    write : callable
+        Called with each piece of output, such as the ``write`` method
+        of a file.
+    compiler : quichem.compilers.display.DisplayCompiler
+    separator : string
+        Written after the output for each string.
+    errors : string
+        What to do with a string which cannot be parsed: "strict" to
+        raise the `modgrammar.ParseError`, or "ignore" to write only
+        the separator for it.
+    jobs, engine
+        Passed on to `quichem.parser.parse_many`. The strings are parsed
+        in this process by default.
+
+    Returns
+    -------
+    The number of strings rendered, and the number which could not be
+    parsed.
+
+    """
+    if errors not in ('strict', 'ignore'):
+        raise ValueError('Unknown error handling: {!r}'.format(errors))
+    count = failed = 0
+    for result in quichem.parser.parse_many(strings, jobs, engine=engine):
+        if isinstance(result, ParseError):
+            if errors == 'strict':
+                raise result
+            failed += 1
+        else:
+            compiler.compile_to(result, write)
+            count += 1
+        write(separator)
+    return count, failed
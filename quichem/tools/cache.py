@@ -0,0 +1,149 @@
+# This file is part of quichem.
+#
+# quichem is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# quichem is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with quichem.  If not, see <http://www.gnu.org/licenses/>.
+
+"""On-disk cache of rendered ``quichem`` output.
+
+Looking up an entry does not import the parser or the compilers, so
+that tools can skip loading them entirely when every formula they are
+asked to render is cached.
+
+"""
+
+from __future__ import unicode_literals
+
+import hashlib
+import os
+
+import quichem
+
+
+DEFAULT_MAX_SIZE = 4 * 1024 * 1024
+
+
+class RenderCache(object):
+
+    """Content-addressed, size-bounded on-disk cache of rendered
+    output.
+
+    Each entry is stored in its own file, named after a hash of the
+    input string, the name of the compiler and the ``quichem``
+    version. Reading an entry marks it as recently used by updating
+    the modification time of its file. Once the total size of the
+    entries exceeds `max_size`, the least recently used entries are
+    removed until it is at most three quarters of `max_size`.
+
+    Finding the least recently used entries means listing the whole
+    directory, so the cache only does it when an estimate of the total
+    size exceeds `max_size`. The estimate is the size found the last
+    time the directory was listed plus the size of each entry written
+    since; it does not count entries written by other processes, so a
+    cache shared by several processes can exceed `max_size` until one
+    of them lists the directory.
+
+    Entries are written to a temporary file which is then renamed, so
+    concurrent processes sharing a cache never see a partially written
+    entry.
+
+    Attributes
+    ----------
+    directory : string
+        The directory containing the cache entries. Created if it does
+        not exist.
+    max_size : int
+        The maximum total size of the entries, in bytes.
+
+    """
+
+    def __init__(self, directory, max_size=DEFAULT_MAX_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+        self._size = None
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def path(self, string, compiler):
+        """Return the path of the file storing the output of the given
+        compiler for the given input string.
+
+        """
+        key = '\0'.join((quichem.__version__, compiler, string))
+        return os.path.join(self.directory,
+                            hashlib.sha1(key.encode('utf-8')).hexdigest())
+
+    def get(self, string, compiler):
+        """Return the cached output of the given compiler for the given
+        input string, or None if it is not cached.
+
+        """
+        path = self.path(string, compiler)
+        try:
+            with open(path, 'rb') as file_:
+                output = file_.read().decode('utf-8')
+            os.utime(path, None)
+        except (IOError, OSError):
+            return None
+        return output
+
+    def set(self, string, compiler, output, evict=True):
+        """Store the output of the given compiler for the given input
+        string.
+
+        Unless `evict` is false, entries are then evicted if the cache
+        may have grown too large. Pass False when storing many entries
+        at once and call `evict` afterwards.
+
+        """
+        path = self.path(string, compiler)
+        temp = os.path.join(self.directory, '.{}.{}'.format(
+            os.path.basename(path), os.getpid()))
+        data = output.encode('utf-8')
+        with open(temp, 'wb') as file_:
+            file_.write(data)
+        os.replace(temp, path)
+        if self._size is not None:
+            self._size += len(data)
+        if evict and (self._size is None or self._size > self.max_size):
+            self.evict()
+
+    def evict(self):
+        """Remove the least recently used entries if the total size of
+        the cache exceeds `max_size`, until it is at most three quarters
+        of `max_size`.
+
+        """
+        entries = []
+        size = 0
+        for name in os.listdir(self.directory):
+            if name.startswith('.'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, name, stat.st_size))
+            size += stat.st_size
+        if size > self.max_size:
+            # Leave room for more entries, so that the next few writes
+            # do not list the directory again.
+            entries.sort()
+            for _, name, entry_size in entries:
+                if size <= self.max_size * 3 // 4:
+                    break
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+                size -= entry_size
+        self._size = size
@@ -22,17 +22,350 @@ Takes one argument from the command line and outputs the LaTeX
     $ python -m quichem.tools.latex h==oh-
     \ce{H^+ + OH^-}
 
+Building the parser takes far longer than rendering a formula, so the
+tool can also be run as a server which keeps one parser and compiler
+loaded. The server listens on a Unix socket, and the tool becomes a
+thin client when given the same address. The client falls back to
+rendering the formula itself if no server is running.
+
+    $ python -m quichem.tools.latex --serve --socket _quichem.sock &
+    $ python -m quichem.tools.latex --socket _quichem.sock h==oh-
+    \ce{H^+ + OH^-}
+
+Where Unix sockets are not available, the address may instead be a TCP
+port number, on which the server listens on localhost. Any local user
+could connect to that port, so the server then writes a random token
+to a file only readable by the user running it (see `token_path`), and
+only answers clients which send that token first.
+
+Rendered formulas can also be kept in an on-disk cache shared by all
+invocations of the tool (see `quichem.tools.cache`). A formula found in
+the cache is printed without loading the parser.
+
+    $ python -m quichem.tools.latex --cache _quichem_cache h==oh-
+    \ce{H^+ + OH^-}
+
+Finally, all formulas used by a document can be rendered at once. The
+tool collects the arguments of every ``\qc`` and ``\dqc`` in the given
+LaTeX sources (or, for files not ending in ``.tex``, reads one formula
+per line) and writes a lookup file, which ``quichem.sty`` reads with its
+``prerender`` option instead of running the tool for each formula.
+
+    $ python -m quichem.tools.latex --prerender doc.tex doc.qcf
+    $ cat doc.qcl
+    \@namedef{quichem@f@h==oh-}{\ce{H^+ + OH^-}}
+
 """
 
 from __future__ import absolute_import, print_function
 
+import argparse
 import os
+import re
 import sys
+import threading
+
+from quichem.tools.cache import DEFAULT_MAX_SIZE, RenderCache
+
+
+# Note: quichem.parser and the compilers (and with them, modgrammar) are
+# only imported when a formula actually needs to be rendered in this
+# process. Most of the start-up time of the tool is spent importing
+# them, which the client does not need to do. Likewise, socket is only
+# imported by the client and the server.
+
+COMPILER_NAME = 'LaTeX_mhchem_V3'
+LOOKUP_EXTENSION = '.qcl'
+_QC_RE = re.compile(r'\\d?qc\s*(?:\[[^\]]*\]\s*)?\{([^{}]*)\}')
+_COMMENT_RE = re.compile(r'(?<!\\)%.*')
+# Characters which may not appear in a control sequence name made with
+# \csname. None of them are valid quichem input anyway.
+_UNSAFE_RE = re.compile(r'[\s\\{}%#]')
+# The directory of the token files of TCP servers (see `token_path`).
+TOKEN_DIRECTORY = os.path.expanduser('~')
+# The number of seconds the server waits for the next request on a
+# connection before closing it.
+CONNECTION_TIMEOUT = 10
+
+_compiler = None
+
+
+def render(formula):
+    """Return the LaTeX code rendering the given ``quichem`` input.
+
+    Parse errors are rendered as a LaTeX ``\\PackageError``. The
+    formula is parsed by the predictive engine, which takes far less
+    time to create than the ``modgrammar`` one; see
+    `quichem.parser.make_parser` for how its errors differ.
+
+    """
+    global _compiler
+    from modgrammar import ParseError
+    import quichem.parser
+    import quichem.compilers.latex
+    from quichem.compilers.cache import OUTPUT_CACHE
+    if _compiler is None:
+        _compiler = (
+            quichem.compilers.latex.LatexMhchemV3Compiler().freeze())
+    try:
+        return OUTPUT_CACHE.compile(
+            quichem.parser.parse(
+                formula, quichem.parser.get_parser('predictive'),
+                quichem.parser.PARSE_CACHE),
+            _compiler)
+    except ParseError as e:
+        return (r"\PackageError{{quichem}}{{ \protect {} }}{{"
+                r"I don't know what to do with \protect {}}}").format(
+                    e, formula)
+
+
+def _socket(address):
+    """Create a socket for the given server address.
+
+    Returns
+    -------
+    A tuple of the socket and the address to bind or connect it to.
+
+    """
+    import socket
+    if address.isdigit():
+        return (socket.socket(socket.AF_INET, socket.SOCK_STREAM),
+                ('127.0.0.1', int(address)))
+    return socket.socket(socket.AF_UNIX, socket.SOCK_STREAM), address
+
+
+def token_path(address):
+    """Return the path of the file holding the token of the server
+    listening on the given TCP port, or None for a Unix socket.
+
+    """
+    if not address.isdigit():
+        return None
+    return os.path.join(TOKEN_DIRECTORY,
+                        '.quichem-{}.token'.format(address))
+
+
+def _lines(connection):
+    """Yield newline-terminated lines received from a socket, without
+    their line endings.
+
+    """
+    buffer_ = b''
+    while True:
+        data = connection.recv(4096)
+        if not data:
+            return
+        buffer_ += data
+        *lines, buffer_ = buffer_.split(b'\n')
+        for line in lines:
+            yield line.decode('utf-8')
+
 
-from modgrammar import ParseError
+def _answer(connection, token, lock):
+    """Answer the render requests received on a connection until it
+    is closed or idle for `CONNECTION_TIMEOUT` seconds.
 
-import quichem.parser
-import quichem.compilers.latex
+    If `token` is not None, the first line must be the token, or the
+    connection is closed without an answer.
+
+    """
+    import hmac
+    import socket
+    with connection:
+        connection.settimeout(CONNECTION_TIMEOUT)
+        try:
+            lines = _lines(connection)
+            if token is not None and not hmac.compare_digest(
+                    next(lines, ''), token):
+                return
+            for formula in lines:
+                with lock:
+                    output = render(formula)
+                connection.sendall((output + '\n').encode('utf-8'))
+        except (ConnectionError, socket.timeout, UnicodeDecodeError):
+            pass
+
+
+def serve(address, timeout=None):
+    """Answer render requests on the given address until no
+    connection has been made for `timeout` seconds (or forever if
+    `timeout` is None).
+
+    Each request is one line containing a formula; the reply is one
+    line containing the output of `render`. A connection may be used
+    for any number of requests, and is closed once idle for
+    `CONNECTION_TIMEOUT` seconds. Each connection is served on its own
+    thread, so an idle client does not hold up the others.
+
+    On a TCP port, clients must first send the token written to
+    `token_path`.
+
+    """
+    import socket
+    render('')  # Load the parser before accepting any requests.
+    token = None
+    path = token_path(address)
+    server, address = _socket(address)
+    if isinstance(address, str) and os.path.exists(address):
+        os.remove(address)  # Left behind by a server that was killed.
+    server.bind(address)
+    if path is not None:
+        token = os.urandom(16).hex()
+        if os.path.exists(path):
+            os.remove(path)
+        with os.fdopen(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL,
+                               0o600), 'w') as file_:
+            file_.write(token)
+    server.listen(16)
+    server.settimeout(timeout)
+    # The compiler is not thread-safe; rendering takes far less time than
+    # the round trip of a request anyway.
+    lock = threading.Lock()
+    threads = []
+    try:
+        while True:
+            try:
+                connection = server.accept()[0]
+            except socket.timeout:
+                return
+            thread = threading.Thread(target=_answer,
+                                      args=(connection, token, lock))
+            thread.daemon = True
+            thread.start()
+            threads = [thread_ for thread_ in threads
+                       if thread_.is_alive()] + [thread]
+    finally:
+        server.close()
+        for thread in threads:
+            thread.join()
+        if isinstance(address, str):
+            os.remove(address)
+        if path is not None:
+            os.remove(path)
+
+
+def request(address, formula):
+    """Ask the server at the given address to render a formula.
+
+    Renders the formula in this process if the server cannot be
+    reached.
+
+    """
+    message = formula + '\n'
+    path = token_path(address)
+    connection, address = _socket(address)
+    try:
+        if path is not None:
+            with open(path) as file_:
+                message = file_.read() + '\n' + message
+        connection.connect(address)
+    except OSError:
+        connection.close()
+        return render(formula)
+    with connection:
+        connection.sendall(message.encode('utf-8'))
+        result = next(_lines(connection), None)
+    return render(formula) if result is None else result
+
+
+def _render(formula, address=None, cache=None, evict=True):
+    """Render a formula with `render`, or with `request` if a server
+    address is given, looking the result up in the given
+    `quichem.tools.cache.RenderCache` first.
+
+    `evict` is passed on to `quichem.tools.cache.RenderCache.set`.
+
+    """
+    output = None if cache is None else cache.get(formula, COMPILER_NAME)
+    if output is None:
+        output = (render(formula) if address is None else
+                  request(address, formula))
+        if cache is not None:
+            cache.set(formula, COMPILER_NAME, output, evict)
+    return output
+
+
+def collect(sources):
+    """Return the formulas used in the given files, in order of first
+    use and without duplicates.
+
+    Files ending in ``.tex`` are searched for ``\\qc`` and ``\\dqc``
+    (ignoring comments); other files contain one formula per line.
+    Files which do not exist are skipped.
+
+    """
+    formulas = []
+    for source in sources:
+        try:
+            with open(source, encoding='utf-8') as file_:
+                text = file_.read()
+        except IOError:
+            continue
+        if source.endswith('.tex'):
+            formulas.extend(_QC_RE.findall(_COMMENT_RE.sub('', text)))
+        else:
+            formulas.extend(text.splitlines())
+    seen = set()
+    return [formula for formula in formulas if formula and
+            not _UNSAFE_RE.search(formula) and
+            not (formula in seen or seen.add(formula))]
+
+
+def prerender(sources, output=None, cache=None):
+    """Render every formula used in the given sources (see `collect`)
+    and write a LaTeX lookup file defining the output of each one.
+
+    `output` defaults to the first source with its extension replaced
+    by ``.qcl``. The file is replaced atomically.
+
+    """
+    if output is None:
+        output = os.path.splitext(sources[0])[0] + LOOKUP_EXTENSION
+    lines = ['% Generated by quichem.tools.latex. Do not edit.\n']
+    for formula in collect(sources):
+        lines.append('\\@namedef{{quichem@f@{}}}{{{}}}\n'.format(
+            formula, _render(formula, cache=cache, evict=False)))
+    if cache is not None:
+        cache.evict()
+    temp = output + '.tmp'
+    with open(temp, 'w', encoding='utf-8') as file_:
+        file_.writelines(lines)
+    os.replace(temp, output)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        prog='python -m quichem.tools.latex',
+        description='Render quichem input as LaTeX mhchem code.')
+    parser.add_argument('formula', nargs='?', help='quichem input to render')
+    parser.add_argument('-s', '--socket', dest='address',
+                        help='address of the render server: a Unix socket '
+                             'path, or a TCP port number on localhost')
+    parser.add_argument('--serve', action='store_true',
+                        help='run a render server on the given address')
+    parser.add_argument('--timeout', type=float,
+                        help='with --serve, stop after this many seconds '
+                             'without a connection')
+    parser.add_argument('-c', '--cache', dest='cache_directory',
+                        help='directory of an on-disk cache of rendered '
+                             'formulas')
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_MAX_SIZE,
+                        help='maximum size of the cache in bytes; default '
+                             'is %(default)s')
+    parser.add_argument('--prerender', nargs='+', dest='sources',
+                        metavar='SOURCE',
+                        help='render all formulas used in the given LaTeX '
+                             'sources or formula lists into a lookup file')
+    parser.add_argument('-o', '--output',
+                        help='with --prerender, the lookup file to write; '
+                             'default is the first source with the '
+                             'extension ' + LOOKUP_EXTENSION)
+    args = parser.parse_args()
+    if args.serve and args.address is None:
+        parser.error('--serve requires --socket')
+    if not (args.serve or args.sources) and args.formula is None:
+        parser.error('no formula given')
+    return args
 
 
 def main():
@@ -40,14 +373,17 @@ def main():
         print('Congratulations! Your quichem installation is set up with '
               'LaTeX support.')
         return
-    compiler = quichem.compilers.latex.LatexMhchemV3Compiler()
-    parser = quichem.parser.make_parser()
-    try:
-        print(compiler.compile(quichem.parser.parse(sys.argv[1], parser)))
-    except ParseError as e:
-        print((r"\PackageError{{quichem}}{{ \protect {} }}{{"
-               r"I don't know what to do with \protect {}}}").format(
-                   e, sys.argv[1]))
+    args = parse_args()
+    if args.serve:
+        serve(args.address, args.timeout)
+        return
+    cache = None
+    if args.cache_directory is not None:
+        cache = RenderCache(args.cache_directory, args.cache_size)
+    if args.sources:
+        prerender(args.sources, args.output, cache)
+        return
+    print(_render(args.formula, args.address, cache))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,413 @@
+# This file is part of quichem.
+#
+# quichem is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# quichem is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with quichem.  If not, see <http://www.gnu.org/licenses/>.
+
+"""An HTTP service rendering ``quichem`` input.
+
+The service keeps one parser loaded and a pool of compilers for each
+output format, so requests only pay for parsing and compiling. Rendered
+output is kept in a bounded cache shared by all requests.
+
+    $ python -m quichem.tools.serve --port 8000 &
+    $ curl 'http://localhost:8000/render?q=h%3D%3Doh-&target=LaTeX_mhchem_V3'
+    \\ce{H^+ + OH^-}
+
+Many formulas can be rendered with one request by posting a JSON array
+of strings to ``/batch``. The reply is an array of the same length
+holding, for each string, either ``{"output": ...}`` or
+``{"error": ...}``.
+
+    $ curl -d '["h==oh-", "x"]' 'http://localhost:8000/batch?target=plain'
+    [{"output": "H\\u207a + OH\\u207b"}, {"error": "[line 1, column 1] ..."}]
+
+Connections are kept alive between requests (HTTP/1.1). Each open
+connection is served by one thread of a fixed pool, and is closed after
+`Handler.timeout` seconds without a request so that idle clients do not
+hold on to the threads.
+
+"""
+
+from __future__ import absolute_import, print_function
+
+import argparse
+import collections
+import concurrent.futures
+import contextlib
+import http.server
+import json
+import queue
+import sys
+import threading
+import urllib.parse
+
+from modgrammar import ParseError
+
+import quichem
+import quichem.parser
+import quichem.compilers.html
+import quichem.compilers.latex
+import quichem.compilers.mathml
+import quichem.compilers.plain
+import quichem.compilers.rst
+import quichem.compilers.svg
+
+
+__all__ = ['TARGETS', 'CompilerPool', 'ResponseCache', 'Handler',
+           'RenderServer', 'render']
+
+TARGETS = collections.OrderedDict((
+    ('HTML', quichem.compilers.html.HtmlCompiler),
+    ('LaTeX', quichem.compilers.latex.LatexCompiler),
+    ('LaTeX_mhchem_V3', quichem.compilers.latex.LatexMhchemV3Compiler),
+    ('MathML', quichem.compilers.mathml.MathmlCompiler),
+    ('plain', quichem.compilers.plain.PlainCompiler),
+    ('plain_ASCII', quichem.compilers.plain.PlainAsciiCompiler),
+    ('reStructuredText', quichem.compilers.rst.RstCompiler),
+    ('SVG', quichem.compilers.svg.SvgCompiler),
+))
+DEFAULT_TARGET = 'HTML'
+CONTENT_TYPES = {'HTML': 'text/html', 'MathML': 'application/mathml+xml',
+                 'SVG': 'image/svg+xml'}
+# The largest request body accepted, in bytes.
+MAX_BODY = 1 << 20
+
+
+class CompilerPool(object):
+
+    """Hands out compilers for each target, so that no compiler is used
+    by two threads at once.
+
+    A compiler is created (and frozen) when a target is asked for and
+    all of its compilers are in use, so the pool grows to the number of
+    threads rendering that target at the same time.
+
+    """
+
+    def __init__(self, targets=TARGETS):
+        self.targets = targets
+        self._free = dict((target, queue.LifoQueue()) for target in targets)
+
+    @contextlib.contextmanager
+    def compiler(self, target):
+        """Return a context manager lending a compiler for the given
+        target.
+
+        Raises
+        ------
+        KeyError
+            If the target is unknown.
+
+        """
+        free = self._free[target]
+        try:
+            compiler = free.get_nowait()
+        except queue.Empty:
+            compiler = self.targets[target]().freeze()
+        try:
+            yield compiler
+        finally:
+            free.put(compiler)
+
+
+class ResponseCache(object):
+
+    """Bounded cache of rendered output, keyed by the input string and
+    the target, which discards the least recently used output first.
+
+    Parse errors are cached as well. The cache may be used from several
+    threads.
+
+    Parameters
+    ----------
+    max_entries : int
+        The maximum number of cached outputs. With 0, nothing is
+        cached.
+
+    Attributes
+    ----------
+    hits : int
+        The number of lookups which found a cached output.
+    misses : int
+        The number of lookups which did not.
+
+    """
+
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, string, target):
+        """Return the cached output for a string, or None."""
+        key = string, target
+        with self._lock:
+            try:
+                output = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return output
+
+    def set(self, string, target, output):
+        """Store the output for a string."""
+        with self._lock:
+            self._entries[string, target] = output
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+def render(string, target, parser, compilers, cache=None):
+    """Parse and compile a string for the given target.
+
+    Parameters
+    ----------
+    string : string
+    target : string
+        One of `TARGETS`.
+    parser
+        A parser which may be used from several threads, such as one
+        made by ``quichem.parser.make_parser('predictive')``.
+    compilers : CompilerPool
+    cache : ResponseCache
+
+    Returns
+    -------
+    The output, or the `modgrammar.ParseError` raised for the string.
+
+    """
+    output = None if cache is None else cache.get(string, target)
+    if output is None:
+        try:
+            ast = quichem.parser.parse(string, parser,
+                                       quichem.parser.PARSE_CACHE)
+        except ParseError as e:
+            output = e
+        else:
+            with compilers.compiler(target) as compiler:
+                output = compiler.compile(ast)
+        if cache is not None:
+            cache.set(string, target, output)
+    return output
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+
+    """Answers ``GET /render?q=...&target=...`` and
+    ``POST /batch?target=...`` with the output of the server's parser
+    and compilers.
+
+    """
+
+    protocol_version = 'HTTP/1.1'
+    server_version = 'quichem-serve/' + quichem.__version__
+    # Seconds an idle keep-alive connection is kept open.
+    timeout = 5
+    # The headers and body are written separately; with Nagle's
+    # algorithm the body of each response on a kept-alive connection
+    # waits for the client to acknowledge the headers.
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        if url.path != '/render':
+            self.send_text(404, 'Not found')
+            return
+        query = urllib.parse.parse_qs(url.query, keep_blank_values=True)
+        target = self.target(query)
+        if target is None:
+            return
+        if 'q' not in query:
+            self.send_text(400, 'Missing parameter: q')
+            return
+        output = self.server.render(query['q'][0], target)
+        if isinstance(output, ParseError):
+            self.send_text(422, str(output))
+        else:
+            self.send_text(200, output,
+                           CONTENT_TYPES.get(target, 'text/plain'))
+
+    def do_POST(self):
+        # The body is read before anything else is checked, so that it
+        # is not taken for the next request on the connection. If it
+        # cannot be read, the connection is closed instead.
+        try:
+            length = int(self.headers['Content-Length'])
+        except (TypeError, ValueError):
+            length = -1
+        if length < 0:
+            self.close_connection = True
+            self.send_text(411, 'Content-Length required')
+            return
+        if length > MAX_BODY:
+            self.close_connection = True
+            self.send_text(413, 'Request body too large')
+            return
+        body = self.rfile.read(length)
+        url = urllib.parse.urlsplit(self.path)
+        if url.path != '/batch':
+            self.send_text(404, 'Not found')
+            return
+        target = self.target(urllib.parse.parse_qs(url.query))
+        if target is None:
+            return
+        try:
+            strings = json.loads(body.decode('utf-8'))
+        except ValueError:
+            strings = None
+        if (not isinstance(strings, list) or
+                not all(isinstance(string, str) for string in strings)):
+            self.send_text(400, 'Expected a JSON array of strings')
+            return
+        results = []
+        for string in strings:
+            output = self.server.render(string, target)
+            if isinstance(output, ParseError):
+                results.append({'error': str(output)})
+            else:
+                results.append({'output': output})
+        self.send_text(200, json.dumps(results), 'application/json')
+
+    def target(self, query):
+        """Return the target asked for in a parsed query string.
+
+        Sends an error and returns None if the target is unknown.
+
+        """
+        target = query.get('target', [DEFAULT_TARGET])[0]
+        if target not in TARGETS:
+            self.send_text(400, 'Unknown target: {}; expected one of: {}'
+                           .format(target, ', '.join(TARGETS)))
+            return None
+        return target
+
+    def send_text(self, status, text, content_type='text/plain'):
+        """Send a complete response with the given text as its body."""
+        body = text.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type',
+                         '{}; charset=utf-8'.format(content_type))
+        self.send_header('Content-Length', str(len(body)))
+        if self.close_connection:
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            http.server.BaseHTTPRequestHandler.log_message(
+                self, format, *args)
+
+
+class RenderServer(http.server.HTTPServer):
+
+    """An HTTP server rendering ``quichem`` input with one parser, a
+    `CompilerPool` and a `ResponseCache`, serving connections on a fixed
+    pool of threads.
+
+    Parameters
+    ----------
+    address : tuple
+        The host and port to listen on. Port 0 picks a free port.
+    threads : int
+        The number of connections served at once. Further connections
+        wait for a thread.
+    cache_size : int
+        The maximum number of outputs in the response cache.
+    verbose : bool
+        Whether to log each request to stderr.
+
+    Attributes
+    ----------
+    parser
+    compilers : CompilerPool
+    cache : ResponseCache
+
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, threads=8, cache_size=4096, verbose=False):
+        self.parser = quichem.parser.make_parser('predictive')
+        self.compilers = CompilerPool()
+        self.cache = ResponseCache(cache_size)
+        self.verbose = verbose
+        self._pool = concurrent.futures.ThreadPoolExecutor(threads)
+        http.server.HTTPServer.__init__(self, address, Handler)
+
+    def render(self, string, target):
+        """Render a string with `render`, using the server's parser,
+        compilers and cache.
+
+        """
+        return render(string, target, self.parser, self.compilers,
+                      self.cache)
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self._process_request, request, client_address)
+
+    def _process_request(self, request, client_address):
+        # As in socketserver.ThreadingMixIn.process_request_thread.
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        http.server.HTTPServer.server_close(self)
+        self._pool.shutdown(wait=False)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        prog='quichem-serve',
+        description='Serve rendered quichem input over HTTP.')
+    parser.add_argument('--host', default='127.0.0.1',
+                        help='address to listen on; default is %(default)s')
+    parser.add_argument('-p', '--port', type=int, default=8000,
+                        help='port to listen on; default is %(default)s')
+    parser.add_argument('-t', '--threads', type=int, default=8,
+                        help='number of connections served at once; '
+                             'default is %(default)s')
+    parser.add_argument('--cache-size', type=int, default=4096,
+                        help='maximum number of rendered outputs kept in '
+                             'memory; default is %(default)s')
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help='log every request')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    server = RenderServer((args.host, args.port), args.threads,
+                          args.cache_size, args.verbose)
+    print('Serving on http://{}:{}/'.format(*server.server_address[:2]),
+          file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -18,11 +18,17 @@ ez_setup.use_setuptools()
 
 from setuptools import setup, find_packages
 
+from quichem import __version__
+
 
 setup(
     name = 'quichem',
-    version = '2014-03-28',
+    version = __version__,
     packages = find_packages(exclude=['tests']),
+    # The web files of the GUI are memory-mapped, so they must be a
+    # real file.
+    package_data = {'quichem.gui': ['web.tar']},
+    zip_safe = False,
     description = ('Parser and utilities for extremely fast input of chemical '
                    'formulae and equations.'),
     license = 'LGPLv3',
@@ -46,6 +52,7 @@ setup(
     entry_points = {
         'console_scripts': [
             'quichem-latex-tool = quichem.tools.latex:main',
+            'quichem-serve = quichem.tools.serve:main',
         ],
         'gui_scripts': [
             'quichem-pyside = quichem.gui.pyside:main [pyside]',
@@ -0,0 +1,63 @@
+# This file is part of quichem.
+#
+# quichem is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# quichem is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with quichem.  If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import absolute_import, unicode_literals
+
+import io
+import itertools
+import unittest
+
+import modgrammar
+
+import quichem.compilers.latex
+import quichem.tools.batch
+
+
+class TestRenderAll(unittest.TestCase):
+
+    def setUp(self):
+        self.compiler = quichem.compilers.latex.LatexMhchemV3Compiler()
+        self.output = io.StringIO()
+
+    def render(self, strings, **kwargs):
+        return quichem.tools.batch.render_all(
+            strings, self.output.write, self.compiler, **kwargs)
+
+    def test_render(self):
+        self.assertEqual((2, 0), self.render(['h==oh-', 'o2;g']))
+        self.assertEqual('\\ce{H^+ + OH^-}\n\\ce{O2 _{(g)}}\n',
+                         self.output.getvalue())
+
+    def test_errors(self):
+        with self.assertRaises(modgrammar.ParseError):
+            self.render(['h2o', 'x', 'o2'])
+        self.output = io.StringIO()
+        self.assertEqual((2, 1), self.render(['h2o', 'x', 'o2'],
+                                             separator=';', errors='ignore'))
+        self.assertEqual(r'\ce{H2O};;\ce{O2};', self.output.getvalue())
+        with self.assertRaises(ValueError):
+            self.render(['h2o'], errors='replace')
+
+    def test_workers(self):
+        strings = itertools.islice(itertools.cycle(['h2o', 'x', 'nacl']),
+                                   3000)
+        self.assertEqual((2000, 1000), self.render(
+            strings, errors='ignore', jobs=2))
+        self.assertEqual('\\ce{H2O}\n\n\\ce{NaCl}\n' * 1000,
+                         self.output.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,497 @@
+# This file is part of quichem.
+#
+# quichem is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# quichem is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with quichem.  If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import absolute_import, unicode_literals
+
+import concurrent.futures
+import io
+import random
+import re
+import sys
+import unittest
+import xml.etree.ElementTree
+
+import modgrammar
+
+import quichem.compilers.cache
+import quichem.compilers.html
+import quichem.compilers.latex
+import quichem.compilers.mathml
+import quichem.compilers.plain
+import quichem.compilers.rst
+import quichem.compilers.svg
+import quichem.parser
+import quichem.tokens
+from quichem.compilers.compiler import Compiler
+from tests.test_parser import CORPUS_PIECES, TEST_CASES
+
+
+def legacy_html(output):
+    return re.sub(r'<(sup|sub)>(.+?)</\1><\1>(.+?)</\1>', r'<\1>\2\3</\1>',
+                  output)
+
+
+def legacy_latex(output):
+    def replace(match):
+        command = match.group(1)
+        return ''.join(
+            [command, '{',
+             re.sub('\\' + command + r'\{(.*?)\}', r'\1', match.group(0)),
+             '}'])
+    return r'\({}\)'.format(re.sub(
+        r'(_|\^|\\mathrm)\{([^{}]+?)\}(?:\{\})?(?:\1\{([^{}]+?)\})+',
+        replace, output))
+
+
+def legacy_rst(output):
+    return re.sub(r'(\\ :(?:sub|sup):`)([^`]+?)`\\ \1([^`]+?)`\\ ',
+                  r'\1\2\3`\\ ', output
+                  ).replace(r'\ \ ', r'\ ').rstrip(r'\ ')
+
+
+# The compilers, and how their output used to be post-processed with
+# regular expressions instead of merging runs while compiling.
+LEGACY = [
+    (quichem.compilers.html.HtmlCompiler(), legacy_html),
+    (quichem.compilers.latex.LatexCompiler(), legacy_latex),
+    (quichem.compilers.latex.LatexMhchemV3Compiler(),
+     r'\ce{{{}}}'.format),
+    (quichem.compilers.rst.RstCompiler(), legacy_rst),
+    (quichem.compilers.plain.PlainCompiler(), str),
+    (quichem.compilers.plain.PlainAsciiCompiler(), str),
+]
+
+
+class Unmerged(Compiler):
+
+    """Joins the output of each token from another compiler without
+    merging anything."""
+
+    def __init__(self, compiler):
+        Compiler.__init__(self)
+        self.compiler = compiler
+
+    def compile(self, ast):
+        return ''.join(Compiler.compile(self, ast))
+
+    def handle(self, token):
+        return self.compiler.handle(token)
+
+
+class TestDispatch(unittest.TestCase):
+
+    def setUp(self):
+        self.compiler = quichem.compilers.plain.PlainCompiler()
+
+    def test_subclass(self):
+        class Element(quichem.tokens.Element):
+            __slots__ = ()
+        token = Element.from_attributes(symbol='na')
+        self.assertEqual('Na', self.compiler.handle(token))
+        self.assertIs(self.compiler.fragments['element'],
+                      self.compiler.dispatch[Element])
+
+    def test_unknown(self):
+        with self.assertRaises(KeyError):
+            self.compiler.handle(object())
+        self.assertNotIn(object, self.compiler.dispatch)
+
+
+class TestMergeRuns(unittest.TestCase):
+
+    def setUp(self):
+        self.parser = quichem.parser.make_parser('predictive')
+
+    def assertSameOutput(self, string):
+        try:
+            ast = quichem.parser.parse(string, self.parser)
+        except modgrammar.ParseError:
+            return
+        for compiler, legacy in LEGACY:
+            self.assertEqual(legacy(Unmerged(compiler).compile(ast)),
+                             compiler.compile(ast), (string, compiler))
+
+    def test_merged(self):
+        compiler = quichem.compilers.latex.LatexCompiler()
+        self.assertEqual(r'\(\mathrm{NaCl}_{2}{}\)', compiler.compile(
+            quichem.parser.parse('nacl2', self.parser)))
+        compiler = quichem.compilers.html.HtmlCompiler()
+        self.assertEqual('O<sub>2(g)</sub>', compiler.compile(
+            quichem.parser.parse('o2;g', self.parser)))
+
+    def test_cases(self):
+        for case in TEST_CASES:
+            self.assertSameOutput(case)
+
+    def test_generated_corpus(self):
+        random_ = random.Random(0)
+        for _ in range(3000):
+            self.assertSameOutput(''.join(
+                random_.choice(CORPUS_PIECES)
+                for _ in range(random_.randint(1, 12))))
+
+    def test_generated_equations(self):
+        species = ['o2;g', "ca'oh'2;s", 'nacl', 'so4.2-', 'h=;aq', '1/2o2',
+                   "k4fe'cn'6", 'cuso4', '5h2o;l', 'e-', 'nh4=;aq', '3.5c']
+        random_ = random.Random(0)
+        for _ in range(300):
+            parts = [random_.choice(species)]
+            for _ in range(random_.randint(0, 4)):
+                parts += [random_.choice(['=', '-', '/', '-/', '=/', '=,']),
+                          random_.choice(species)]
+            self.assertSameOutput(''.join(parts))
+
+
+class TestOutputCache(unittest.TestCase):
+
+    def setUp(self):
+        self.parser = quichem.parser.make_parser('predictive')
+        self.cache = quichem.compilers.cache.OutputCache(max_entries=2)
+
+    def compile(self, string, compiler=LEGACY[0][0]):
+        return self.cache.compile(quichem.parser.parse(string, self.parser),
+                                  compiler)
+
+    def test_equivalent_inputs(self):
+        output = self.compile('c.mgali')
+        self.assertIs(output, self.compile('cmg.ali'))
+        self.assertEqual((1, 1), (self.cache.hits, self.cache.misses))
+        self.assertEqual(0.5, self.cache.hit_rate)
+
+    def test_compilers(self):
+        for compiler, _ in LEGACY:
+            ast = quichem.parser.parse("ca'oh'2;s", self.parser)
+            self.assertEqual(compiler.compile(ast),
+                             self.compile("ca'oh'2;s", compiler))
+        self.assertEqual((0, len(LEGACY)),
+                         (self.cache.hits, self.cache.misses))
+
+    def test_evicts_least_recently_used(self):
+        self.compile('h2o')
+        self.compile('o2')
+        self.compile('h2o1')
+        self.compile('co2')
+        self.assertEqual(2, len(self.cache))
+        self.compile('1h2o')
+        self.compile('o2')
+        self.assertEqual((2, 4), (self.cache.hits, self.cache.misses))
+        self.cache.clear()
+        self.assertEqual((0, 0, 0), (len(self.cache), self.cache.hits,
+                                     self.cache.misses))
+
+
+class TestItemCache(unittest.TestCase):
+
+    EDITS = ['2h2o;l', "2h2o;l=ca'oh'2;s", "2h2o;l=ca'oh'2;s-/1/2o2;g",
+             "2h2o;l=ca'oh'2;s-/1/2o2;g=h=", "2h2o;l=ca'oh'2;s-/1/2o2;g=h=o",
+             "2h2o;l=ca'oh'2;s-/o2;g=h=o", "h2o;l=ca'oh'2;s-/o2;g=h=o", '',
+             'h2o;l']
+
+    def setUp(self):
+        self.parser = quichem.parser.make_parser('incremental')
+
+    def assertSameOutput(self, compiler):
+        cache = quichem.compilers.cache.ItemCache(compiler)
+        for case in self.EDITS:
+            ast = quichem.parser.parse(case, self.parser, cache=None)
+            self.assertEqual(compiler.compile(ast), cache.compile(ast))
+        return cache
+
+    def test_compilers(self):
+        for compiler in [compiler for compiler, _ in LEGACY] + [
+                quichem.compilers.mathml.MathmlCompiler(),
+                quichem.compilers.svg.SvgCompiler()]:
+            cache = self.assertSameOutput(compiler)
+            self.assertGreater(cache.hits, 0)
+
+
+class TestStreaming(unittest.TestCase):
+
+    def test_same_output(self):
+        parser = quichem.parser.make_parser('predictive')
+        for case in list(TEST_CASES) + ["2h2o;l=ca'oh'2;s-/1/2o2;g", '']:
+            ast = quichem.parser.parse(case, parser)
+            for compiler, _ in LEGACY:
+                output = io.StringIO()
+                self.assertIsNone(compiler.compile_to(ast, output.write))
+                self.assertEqual(compiler.compile(ast), output.getvalue())
+                self.assertEqual(compiler.compile(ast),
+                                 ''.join(compiler.compile_iter(ast)))
+
+    def test_iter_lazily(self):
+        parser = quichem.parser.make_parser('predictive')
+        compiler = quichem.compilers.html.HtmlCompiler()
+        ast = quichem.parser.parse('o2;g=h2o=nacl', parser)
+        pulled = []
+
+        def tokens():
+            for token in ast:
+                pulled.append(token)
+                yield token
+
+        pieces = compiler.compile_iter(tokens())
+        self.assertEqual('O', next(pieces))
+        self.assertEqual(1, len(pulled))
+        # The subscript of the first item is held back for merging
+        # until the separator after it is pulled.
+        self.assertEqual('<sub>2(g)</sub>', next(pieces))
+        self.assertEqual(2, len(pulled))
+        self.assertEqual(compiler.compile(ast),
+                         'O<sub>2(g)</sub>' + ''.join(pieces))
+        self.assertEqual(len(ast), len(pulled))
+
+
+class TestFreeze(unittest.TestCase):
+
+    def setUp(self):
+        self.parser = quichem.parser.make_parser('predictive')
+        self.frozen = [(type(compiler)().freeze(), compiler)
+                       for compiler, _ in LEGACY]
+
+    def assertSameOutput(self, string):
+        try:
+            ast = quichem.parser.parse(string, self.parser)
+        except modgrammar.ParseError:
+            return
+        for frozen, compiler in self.frozen:
+            self.assertEqual(compiler.compile(ast), frozen.compile(ast),
+                             (string, compiler))
+
+    def test_specialized(self):
+        for frozen, _ in self.frozen:
+            for fragment in frozen.fragments.values():
+                self.assertIsNot(getattr(fragment.render, '__self__', None),
+                                 fragment)
+
+    def test_generated_corpus(self):
+        random_ = random.Random(1)
+        for case in TEST_CASES:
+            self.assertSameOutput(case)
+        for _ in range(2000):
+            self.assertSameOutput(''.join(
+                random_.choice(CORPUS_PIECES)
+                for _ in range(random_.randint(1, 12))))
+
+    def test_fallback(self):
+        # Wraps which are not plain substitutions cannot be split, and
+        # leave the fragment rendering as before.
+        compiler = quichem.compilers.plain.PlainCompiler()
+        compiler.fragments['element'].wrap = ('{0!r}',)
+        compiler.fragments['counter'].literals = {'2': '_2'}
+        compiler.freeze()
+        for name in ('element', 'counter'):
+            fragment = compiler.fragments[name]
+            self.assertIs(fragment, fragment.render.__self__)
+        self.assertEqual("'Na''Cl'_2", compiler.compile(
+            quichem.parser.parse('nacl2', self.parser)))
+
+    def test_refreeze(self):
+        compiler = quichem.compilers.plain.PlainCompiler().freeze()
+        compiler.fragments['element'].wrap = ('<{}>',)
+        compiler.freeze()
+        self.assertEqual('<Na><Cl>', compiler.compile(
+            quichem.parser.parse('nacl', self.parser)))
+
+
+class TestDeepNesting(unittest.TestCase):
+
+    DEPTH = 3000
+
+    def setUp(self):
+        self.ast = quichem.parser.parse(
+            '2' + "'" * self.DEPTH + 'h' + "'2" * self.DEPTH + ';g=o2',
+            quichem.parser.make_parser('predictive'))
+
+    def test_compile(self):
+        compiler = quichem.compilers.plain.PlainAsciiCompiler()
+        self.assertEqual('2 ' + '(' * self.DEPTH + 'H' + ')2' * self.DEPTH +
+                         '(g) + O2', compiler.compile(self.ast))
+
+    def test_same_output(self):
+        for compiler, legacy in LEGACY:
+            output = compiler.compile(self.ast)
+            self.assertEqual(legacy(Unmerged(compiler).compile(self.ast)),
+                             output)
+            self.assertEqual(output, ''.join(compiler.compile_iter(self.ast)))
+
+
+class TestMathml(unittest.TestCase):
+
+    NAMESPACE = '{http://www.w3.org/1998/Math/MathML}'
+
+    def setUp(self):
+        self.parser = quichem.parser.make_parser('predictive')
+        self.compiler = quichem.compilers.mathml.MathmlCompiler()
+
+    def compile(self, string):
+        output = self.compiler.compile(quichem.parser.parse(string,
+                                                            self.parser))
+        prefix = '<math xmlns="http://www.w3.org/1998/Math/MathML">'
+        self.assertTrue(output.startswith(prefix))
+        self.assertTrue(output.endswith('</math>'))
+        return output[len(prefix):-len('</math>')].replace(
+            ' mathvariant="normal"', '')
+
+    def test_scripts(self):
+        self.assertEqual('<msub><mi>H</mi><mrow><mn>2</mn></mrow></msub>'
+                         '<mi>O</mi>', self.compile('h2o'))
+        self.assertEqual('<msub><mi>O</mi><mrow><mn>2</mn><mo>(</mo>'
+                         '<mi>g</mi><mo>)</mo></mrow></msub>',
+                         self.compile('o2;g'))
+        self.assertEqual('<mi>S</mi><msup><msub><mi>O</mi><mrow><mn>4</mn>'
+                         '</mrow></msub><mrow><mn>2</mn><mo>&#x2212;</mo>'
+                         '</mrow></msup>', self.compile('so4.2-'))
+
+    def test_groups(self):
+        self.assertEqual('<mi>Ca</mi><msub><mrow><mo>(</mo><mi>O</mi>'
+                         '<mi>H</mi><mo>)</mo></mrow><mrow><mn>2</mn>'
+                         '</mrow></msub>', self.compile("ca'oh'2"))
+        self.assertEqual('<msub><mrow><mo>(</mo><msub><mrow><mo>(</mo>'
+                         '<mi>H</mi><mo>)</mo></mrow><mrow><mn>2</mn>'
+                         '</mrow></msub><mo>)</mo></mrow><mrow><mn>3</mn>'
+                         '</mrow></msub>', self.compile("''h'2'3"))
+
+    def test_equation(self):
+        self.assertEqual('<mfrac><mn>1</mn><mn>2</mn></mfrac>'
+                         '<mspace width="0.167em"/><mi>H</mi><mo>&#x27f6;'
+                         '</mo><mn>2</mn><mspace width="0.167em"/>'
+                         '<msup><mi>H</mi><mrow><mo>+</mo></mrow></msup>',
+                         self.compile('1/2h-2h='))
+
+    def test_well_formed(self):
+        random_ = random.Random(0)
+        frozen = quichem.compilers.mathml.MathmlCompiler().freeze()
+        for _ in range(1000):
+            string = ''.join(random_.choice(CORPUS_PIECES)
+                             for _ in range(random_.randint(1, 12)))
+            try:
+                ast = quichem.parser.parse(string, self.parser)
+            except modgrammar.ParseError:
+                continue
+            output = self.compiler.compile(ast)
+            self.assertEqual(output, frozen.compile(ast))
+            self.assertEqual(output,
+                             ''.join(self.compiler.compile_iter(ast)))
+            root = xml.etree.ElementTree.fromstring(output)
+            self.assertEqual(self.NAMESPACE + 'math', root.tag)
+            for tag in ('msub', 'msup', 'mfrac'):
+                for element in root.iter(self.NAMESPACE + tag):
+                    self.assertEqual(2, len(element), string)
+
+
+class TestSvg(unittest.TestCase):
+
+    NAMESPACE = '{http://www.w3.org/2000/svg}'
+
+    def setUp(self):
+        self.parser = quichem.parser.make_parser('predictive')
+        self.compiler = quichem.compilers.svg.SvgCompiler()
+
+    def compile(self, string):
+        return xml.etree.ElementTree.fromstring(self.compiler.compile(
+            quichem.parser.parse(string, self.parser)))
+
+    def texts(self, root):
+        return [(float(text.get('x')), float(text.get('y')), text.text)
+                for text in root.iter(self.NAMESPACE + 'text')]
+
+    def test_text(self):
+        root = self.compile("ca'oh'2=h2o")
+        self.assertEqual(['Ca(OH)', '2', '+ H', '2', 'O'],
+                         [text for _, _, text in self.texts(root)])
+        (x, y, _), (sub_x, sub_y, _) = self.texts(root)[:2]
+        self.assertEqual(0, y)
+        self.assertGreater(sub_y, y)
+        # "+" follows a space.
+        self.assertGreater(self.texts(root)[2][0], sub_x + 5)
+        width = float(root.get('width'))
+        self.assertLess(self.texts(root)[-1][0], width)
+        self.assertEqual(width, float(root.get('viewBox').split()[2]))
+
+    def test_fragment_scripts(self):
+        for fragment in self.compiler.fragments.values():
+            self.assertIsNone(fragment.script)
+
+    def test_stacked_scripts(self):
+        texts = self.texts(self.compile('so4.2-;aq'))
+        self.assertEqual(['SO', '4', '2\u2212', '(aq)'],
+                         [text for _, _, text in texts])
+        self.assertEqual(texts[1][0], texts[2][0])
+        self.assertLess(texts[2][1], 0)
+        self.assertGreater(texts[3][0], texts[1][0])
+        self.assertEqual(texts[1][1], texts[3][1])
+
+    def test_shapes(self):
+        root = self.compile('1/2o2;g-/o2;g')
+        paths = list(root.iter(self.NAMESPACE + 'path'))
+        self.assertEqual(2, len(paths))
+        self.assertEqual(['1', '2', 'O', '2(g)', 'O', '2(g)'],
+                         [text for _, _, text in self.texts(root)])
+        # The fraction is stacked, and the arrow drawn after it.
+        numerator, denominator = self.texts(root)[:2]
+        self.assertEqual(numerator[0], denominator[0])
+        self.assertLess(numerator[1], denominator[1])
+        self.assertEqual(2, paths[1].get('d').count('H'))
+
+    def test_same_output(self):
+        random_ = random.Random(0)
+        frozen = quichem.compilers.svg.SvgCompiler().freeze()
+        for _ in range(500):
+            string = ''.join(random_.choice(CORPUS_PIECES)
+                             for _ in range(random_.randint(1, 12)))
+            try:
+                ast = quichem.parser.parse(string, self.parser)
+            except modgrammar.ParseError:
+                continue
+            output = self.compiler.compile(ast)
+            self.assertEqual(output, frozen.compile(ast))
+            self.assertEqual(output,
+                             ''.join(self.compiler.compile_iter(ast)))
+            xml.etree.ElementTree.fromstring(output)
+
+
+class TestThreadSafety(unittest.TestCase):
+
+    def setUp(self):
+        self.interval = sys.getswitchinterval()
+        # Switch threads as often as possible, so that compilations
+        # sharing a compiler are interleaved.
+        sys.setswitchinterval(1e-6)
+
+    def tearDown(self):
+        sys.setswitchinterval(self.interval)
+
+    def test_shared_compilers(self):
+        parser = quichem.parser.make_parser('predictive')
+        compilers = [compiler for compiler, _ in LEGACY]
+        random_ = random.Random(0)
+        species = ["ca'oh'2;s", 'nacl', 'so4.2-', '1/2o2;g', 'h=;aq']
+        asts = [quichem.parser.parse('='.join(
+            random_.choice(species) for _ in range(random_.randint(1, 20))),
+            parser) for _ in range(20)]
+        expected = [[compiler.compile(ast) for compiler in compilers]
+                    for ast in asts]
+        jobs = [(index, compiler) for index in range(len(asts))
+                for compiler in range(len(compilers))] * 10
+        random_.shuffle(jobs)
+        with concurrent.futures.ThreadPoolExecutor(8) as executor:
+            results = list(executor.map(
+                lambda job: compilers[job[1]].compile(asts[job[0]]), jobs))
+        for (index, compiler), result in zip(jobs, results):
+            self.assertEqual(expected[index][compiler], result)
+
+
+if __name__ == '__main__':
+    unittest.main()
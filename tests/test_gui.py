@@ -0,0 +1,159 @@
+# This file is part of quichem.
+#
+# quichem is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# quichem is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with quichem.  If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import absolute_import, unicode_literals
+
+import html
+import queue
+import sys
+import unittest
+from unittest import mock
+
+from quichem.gui import generic
+
+
+class FakeGui(generic.GenericGui):
+
+    """A GUI without a toolkit. Functions passed to `call_in_ui` are
+    queued until `drain` is called, as an event loop would. Only the
+    source widget at index `visible` is shown.
+
+    """
+
+    def __init__(self, compilers=('plain_ASCII',)):
+        generic.GenericGui.__init__(self)
+        self.scripts = []
+        self.calls = queue.Queue()
+        self.visible = 0
+        with mock.patch.object(sys, 'argv', ['quichem', '-c'] +
+                               list(compilers)):
+            self.run()
+
+    def make_source(self, name):
+        return []
+
+    def run_script(self, js):
+        self.scripts.append(js)
+
+    def set_source(self, widget, source_factory):
+        if widget is self.sources[self.visible]:
+            widget.append(source_factory())
+
+    def call_in_ui(self, function):
+        self.calls.put(function)
+
+    def drain(self, count, timeout=5):
+        """Wait for `count` calls and make them."""
+        for _ in range(count):
+            self.calls.get(timeout=timeout)()
+
+
+class TestGenericGui(unittest.TestCase):
+
+    def setUp(self):
+        self.gui = FakeGui()
+
+    def test_synchronous(self):
+        self.gui.background = False
+        self.gui.change_value('h==oh-')
+        self.assertEqual(self.gui.sources, [['H + + OH -']])
+        self.assertEqual(len(self.gui.scripts), 1)
+        self.gui.change_value('h==')
+        self.assertEqual(self.gui.sources, [['H + + OH -', '']])
+        self.assertIn('text', self.gui.scripts[-1])
+
+    def test_debounce(self):
+        self.gui.debounce = 0.2
+        for value in ['h', 'h=', 'h==', 'h==oh-']:
+            self.gui.change_value(value)
+        self.gui.drain(1)
+        self.assertEqual(self.gui.sources, [['H + + OH -']])
+        self.assertEqual(len(self.gui.scripts), 1)
+        self.assertTrue(self.gui.calls.empty())
+
+    def test_stale_results_dropped(self):
+        self.gui.debounce = 0
+        self.gui.change_value('h')
+        call = self.gui.calls.get(timeout=5)
+        self.gui.change_value('h==oh-')
+        call()
+        self.assertEqual(self.gui.sources, [[]])
+        self.assertEqual(self.gui.scripts, [])
+        self.gui.drain(1)
+        self.assertEqual(self.gui.sources, [['H + + OH -']])
+
+
+class TestLazySources(unittest.TestCase):
+
+    def setUp(self):
+        self.gui = FakeGui(['plain_ASCII', 'HTML', 'LaTeX'])
+        self.gui.background = False
+
+    def test_hidden_sources_not_compiled(self):
+        self.gui.change_value('h==oh-')
+        self.assertEqual(self.gui.sources, [['H + + OH -'], [], []])
+        self.assertEqual(set(self.gui._outputs), {'LaTeX', 'plain_ASCII'})
+
+    def test_refresh_source(self):
+        self.gui.change_value('h==oh-')
+        self.gui.visible = 1
+        self.gui.refresh_source(1)
+        self.gui.refresh_source(1)
+        self.gui.visible = 0
+        self.gui.refresh_source(0)
+        self.assertEqual(self.gui.sources, [
+            ['H + + OH -'],
+            ['H<sup>+</sup>&nbsp;+ OH<sup>&#x2212;</sup>'],
+            []])
+
+    def test_compiled_once(self):
+        self.gui.change_value('h==oh-')
+        self.gui.visible = 1
+        self.gui.refresh_source(1)
+        with mock.patch.object(generic.ItemCache, 'compile') as compile_:
+            self.assertEqual(self.gui.html, self.gui.sources[1][0])
+            self.gui.visible = 2
+            self.gui.refresh_source(2)
+        compile_.assert_not_called()
+
+    def test_parse_error(self):
+        self.gui.change_value('h==')
+        self.assertEqual(self.gui.sources, [[''], [], []])
+        self.assertEqual(self.gui.html, html.escape(self.gui.plain))
+        self.assertTrue(self.gui.plain)
+        self.assertEqual(self.gui.mathml, '')
+        self.assertEqual(generic.word_equation_from_mathml(self.gui.mathml),
+                         '')
+
+    def test_incremental_errors(self):
+        # Values typed on the way to valid input: operators, unclosed
+        # brackets and stray characters.
+        values = ['h==', 'h2o=+', "'h2", "ca'oh", "'h2'", 'h2o;', 'o2-=/',
+                  'nacl;aq=na=/', '2h2o;lx', '1/', '.']
+        errors = []
+        for incremental in (True, False):
+            gui = FakeGui()
+            gui.background = False
+            gui.incremental = incremental
+            for value in values:
+                gui.change_value(value)
+                errors.append(gui.plain)
+        self.assertEqual(errors[:len(values)], errors[len(values):])
+        self.assertEqual(errors[0], "[line 1, column 4] Expected ',' or "
+                         "'/' or item: Found (end of input)")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,171 @@
+# This file is part of quichem.
+#
+# quichem is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# quichem is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with quichem.  If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import absolute_import, unicode_literals
+
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+import quichem.tools.cache
+import quichem.tools.latex
+
+
+class TestServer(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.address = os.path.join(self.directory, 'quichem.sock')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_request_without_server(self):
+        self.assertEqual(
+            quichem.tools.latex.request(self.address, 'h==oh-'),
+            r'\ce{H^+ + OH^-}')
+
+    def test_request(self):
+        server = threading.Thread(target=quichem.tools.latex.serve,
+                                  args=(self.address, 0.5))
+        server.start()
+        while not os.path.exists(self.address):
+            time.sleep(0.01)
+        for case in ('h==oh-', '2cl-aq=2ag=aq-2agcl;s', 'x'):
+            self.assertEqual(quichem.tools.latex.request(self.address, case),
+                             quichem.tools.latex.render(case))
+        server.join()
+        self.assertFalse(os.path.exists(self.address))
+
+    def test_idle_connection(self):
+        server = threading.Thread(target=quichem.tools.latex.serve,
+                                  args=(self.address, 0.5))
+        server.start()
+        while not os.path.exists(self.address):
+            time.sleep(0.01)
+        with socket.socket(socket.AF_UNIX) as idle, \
+                socket.socket(socket.AF_UNIX) as connection:
+            idle.connect(self.address)
+            connection.connect(self.address)
+            connection.settimeout(5)
+            connection.sendall(b'h==oh-\n')
+            self.assertEqual(b'\\ce{H^+ + OH^-}\n', connection.recv(4096))
+        server.join()
+
+    def test_tcp_token(self):
+        with socket.socket() as free:
+            free.bind(('127.0.0.1', 0))
+            address = str(free.getsockname()[1])
+        with mock.patch.object(quichem.tools.latex, 'TOKEN_DIRECTORY',
+                               self.directory):
+            path = quichem.tools.latex.token_path(address)
+            server = threading.Thread(target=quichem.tools.latex.serve,
+                                      args=(address, 0.5))
+            server.start()
+            while not os.path.exists(path):
+                time.sleep(0.01)
+            self.assertEqual(0o600, os.stat(path).st_mode & 0o777)
+            with socket.create_connection(('127.0.0.1', int(address))) as (
+                    connection):
+                connection.sendall(b'wrong\nh==oh-\n')
+                self.assertEqual(b'', connection.recv(4096))
+            self.assertEqual(
+                quichem.tools.latex.request(address, 'h==oh-'),
+                r'\ce{H^+ + OH^-}')
+            server.join()
+        self.assertFalse(os.path.exists(path))
+
+
+class TestPrerender(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, text):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as file_:
+            file_.write(text)
+        return path
+
+    def test_collect(self):
+        tex = self.write('doc.tex', '\n'.join([
+            r'\qc{h2o;l} and \qc {h2o;l}, \dqc[.]{co2;g} \dqc{h=}',
+            r'% \qc{commented} 50\% \qc{h-}']))
+        list_ = self.write('doc.qcf', 'h=\nmg\n\n')
+        self.assertEqual(
+            quichem.tools.latex.collect(
+                [tex, list_, os.path.join(self.directory, 'missing')]),
+            ['h2o;l', 'co2;g', 'h=', 'mg'])
+
+    def test_prerender(self):
+        tex = self.write('doc.tex', r'\qc{h2o} \qc{x}')
+        quichem.tools.latex.prerender([tex])
+        with open(os.path.join(self.directory, 'doc.qcl')) as file_:
+            lines = file_.read().splitlines()
+        self.assertEqual(lines[1], r'\@namedef{quichem@f@h2o}{\ce{H2O}}')
+        self.assertEqual(
+            lines[2], r'\@namedef{{quichem@f@x}}{{{}}}'.format(
+                quichem.tools.latex.render('x')))
+
+
+class TestRenderCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = quichem.tools.cache.RenderCache(self.directory, 11)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_get(self):
+        self.assertIsNone(self.cache.get('h2o', 'LaTeX'))
+        self.cache.set('h2o', 'LaTeX', r'\ce{H2O}')
+        self.assertEqual(self.cache.get('h2o', 'LaTeX'), r'\ce{H2O}')
+        self.assertIsNone(self.cache.get('h2o', 'HTML'))
+
+    def test_evict(self):
+        self.cache.set('a', 'LaTeX', '1234')
+        self.cache.set('b', 'LaTeX', '1234')
+        os.utime(self.cache.path('a', 'LaTeX'), (0, 0))
+        self.cache.set('c', 'LaTeX', '1234')
+        self.assertIsNone(self.cache.get('a', 'LaTeX'))
+        self.assertEqual(self.cache.get('b', 'LaTeX'), '1234')
+        self.assertEqual(self.cache.get('c', 'LaTeX'), '1234')
+        self.assertEqual(sorted(os.listdir(self.directory)), sorted(
+            os.path.basename(self.cache.path(string, 'LaTeX'))
+            for string in 'bc'))
+
+    def test_evict_lists_directory_once(self):
+        with mock.patch('os.listdir', wraps=os.listdir) as listdir:
+            self.cache.set('a', 'LaTeX', '1234')
+            self.cache.set('b', 'LaTeX', '1234')
+        self.assertEqual(1, listdir.call_count)
+        with mock.patch('os.listdir', wraps=os.listdir) as listdir:
+            self.cache.set('c', 'LaTeX', '1234')
+            self.cache.set('d', 'LaTeX', '1')
+        self.assertEqual(1, listdir.call_count)
+        self.assertEqual(3, len(os.listdir(self.directory)))
+
+
+if __name__ == '__main__':
+    unittest.main()
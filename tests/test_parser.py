@@ -15,7 +15,12 @@
 
 from __future__ import absolute_import, unicode_literals
 
+import itertools
+import random
+import threading
+import time
 import unittest
+from unittest import mock
 
 import modgrammar
 
@@ -192,6 +197,14 @@ TEST_CASES = {
 
 ERROR_CAUSING_TEST_CASES = {'x', "'c'"}
 
+# Pieces of generated input for comparing parser engines, chosen to
+# exercise ambiguous splits of letters, states, charges and separators.
+CORPUS_PIECES = [
+    'h', 'o', 'c', 'n', 's', 'a', 'l', 'g', 'i', 'e', 'q', 'x', 'na', 'cl',
+    'li', 'co', 'fe', 'aq', 'mon', 'sln', 'ads', 'cd', 'cr', 'am', 'lc',
+    'uuo', '2', '12', '.', "'", "'", '=', '-', '/', ';', ',', '3.5', '1/2',
+    ' ']
+
 
 class TestStringList(unittest.TestCase):
 
@@ -211,5 +224,295 @@ class TestStringList(unittest.TestCase):
                 quichem.parser.parse(case, self.parser)
 
 
+class TestPredictiveStringList(TestStringList):
+
+    def setUp(self):
+        self.parser = quichem.parser.make_parser('predictive')
+
+
+class TestIncrementalStringList(TestStringList):
+
+    def setUp(self):
+        self.parser = quichem.parser.make_parser('incremental')
+
+
+class TestPackratStringList(TestStringList):
+
+    def setUp(self):
+        self.parser = quichem.parser.make_parser(memoize=True)
+
+    def test_stats(self):
+        quichem.parser.parse('2cl-aq=2ag=aq-2agcl;s', self.parser)
+        self.assertGreater(self.parser.hits, 0)
+        self.assertGreater(self.parser.misses, self.parser.hits)
+        self.parser.reset_stats()
+        self.assertEqual((0, 0), (self.parser.hits, self.parser.misses))
+
+
+class TestEngines(unittest.TestCase):
+
+    def setUp(self):
+        self.parsers = [quichem.parser.make_parser(engine)
+                        for engine in quichem.parser.ENGINES]
+        self.parsers.append(quichem.parser.make_parser(memoize=True))
+
+    def assertSameResults(self, case):
+        results = []
+        for parser in self.parsers:
+            try:
+                results.append(str(quichem.parser.parse(case, parser)))
+            except modgrammar.ParseError as e:
+                results.append('{} ({})'.format(e, e.buffer_pos))
+        self.assertEqual(len(set(results)), 1, (case, results))
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            quichem.parser.make_parser('yacc')
+
+    def test_short_strings(self):
+        for length in range(1, 4):
+            for case in itertools.product("ha'2.=;-/,l", repeat=length):
+                self.assertSameResults(''.join(case))
+
+    def test_generated_corpus(self):
+        random_ = random.Random(0)
+        for _ in range(1000):
+            self.assertSameResults(''.join(
+                random_.choice(CORPUS_PIECES)
+                for _ in range(random_.randint(1, 8))))
+
+    def test_errors(self):
+        # Prefixes of valid input, as typed, and random edits of it.
+        cases = set()
+        for case in TEST_CASES:
+            cases.update(case[:end] for end in range(1, len(case)))
+        random_ = random.Random(0)
+        characters = "abcdefghijklmnopqrstuvwxyz0123456789.;'=-/+ "
+        for _ in range(300):
+            case = list(random_.choice(sorted(TEST_CASES)))
+            for _ in range(random_.randint(1, 3)):
+                position = random_.randint(0, len(case))
+                if random_.random() < 0.5 or not case:
+                    case.insert(position, random_.choice(characters))
+                else:
+                    del case[min(position, len(case) - 1)]
+            # Longer strings can take the unmemoized engine too long.
+            if len(case) <= 24:
+                cases.add(''.join(case))
+        for case in sorted(cases):
+            self.assertSameResults(case)
+
+    def test_long_errors(self):
+        case = 'h2o=' * 50 + '+'
+        self.assertGreater(len(case), quichem.parser.MAX_EXPLAINED_LENGTH)
+        for engine in ('predictive', 'incremental'):
+            with self.assertRaises(modgrammar.ParseError) as raised:
+                quichem.parser.parse(
+                    case, quichem.parser.make_parser(engine), cache=None)
+            self.assertEqual("[line 1, column 201] Unexpected '+'",
+                             str(raised.exception))
+
+    def test_nested_groups(self):
+        for depth in range(1, 12):
+            self.assertSameResults("'" * depth + 'h' + "'2" * depth)
+            self.assertSameResults("ca'" * depth + 'oh' + "'2" * depth)
+            self.assertSameResults("'" * depth + 'h' + "'2" * (depth - 1))
+
+
+class TestIncrementalParser(unittest.TestCase):
+
+    def setUp(self):
+        self.parser = quichem.parser.make_parser('incremental')
+        self.predictive = quichem.parser.make_parser('predictive')
+
+    def parse(self, string, parser=None):
+        try:
+            return str(quichem.parser.parse(string, parser or self.parser,
+                                            cache=None))
+        except modgrammar.ParseError as e:
+            return str(e)
+
+    def assertEdits(self, strings):
+        for string in strings:
+            self.assertEqual(self.parse(string, self.predictive),
+                             self.parse(string), string)
+
+    def test_typing(self):
+        self.assertEdits('2cl-aq=2ag=aq-2agcl;s'[:end] for end in range(22))
+        self.assertEdits(["h=", "h=o", "h=", "h=o-", "h=o-/", "h=o-/o"])
+
+    def test_random_edits(self):
+        random_ = random.Random(0)
+        cases = sorted(TEST_CASES)
+        pieces = [piece for piece in CORPUS_PIECES if piece != ' ']
+        strings = []
+        for _ in range(100):
+            string = random_.choice(['=', '-', '-/', ';=']).join(
+                random_.sample(cases, random_.randint(2, 6)))
+            strings.append(string)
+            for _ in range(20):
+                position = random_.randint(0, len(string))
+                if random_.random() < 0.5:
+                    string = (string[:position] + random_.choice(pieces) +
+                              string[position:])
+                else:
+                    string = string[:position] + string[position + 1:]
+                strings.append(string)
+        self.assertEdits(strings)
+
+    def test_reuses_items(self):
+        first = quichem.parser.parse('h2o=nacl;aq-/2h2', self.parser,
+                                     cache=None)
+        self.parser.reset_stats()
+        second = quichem.parser.parse('h2o=nacl;aq-/2h2;g', self.parser,
+                                      cache=None)
+        self.assertIs(first[0], second[0])
+        self.assertIs(first[2], second[2])
+        self.assertIsNot(first[4], second[4])
+        self.assertGreater(self.parser.hits, self.parser.misses)
+        third = quichem.parser.parse('2h2o=nacl;aq-/2h2;g', self.parser,
+                                     cache=None)
+        self.assertIs(second[2], third[2])
+        self.assertIs(second[4], third[4])
+
+
+class TestGetParser(unittest.TestCase):
+
+    def test_shared(self):
+        self.assertIs(quichem.parser.get_parser('predictive'),
+                      quichem.parser.get_parser('predictive'))
+
+    def test_threads(self):
+        make_parser = quichem.parser.make_parser
+
+        def slow_make_parser(engine):
+            time.sleep(0.05)
+            return make_parser(engine)
+
+        parsers = []
+        with mock.patch.dict(quichem.parser._parsers, clear=True), \
+                mock.patch('quichem.parser.make_parser',
+                           side_effect=slow_make_parser) as make:
+            threads = [threading.Thread(target=lambda: parsers.append(
+                quichem.parser.get_parser('predictive')))
+                for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(1, make.call_count)
+        self.assertEqual(1, len(set(map(id, parsers))))
+
+
+class TestParseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.parser = quichem.parser.make_parser('predictive')
+        self.cache = quichem.parser.ParseCache(max_entries=2)
+
+    def parse(self, string, parser=None):
+        return quichem.parser.parse(string, parser or self.parser,
+                                    self.cache)
+
+    def test_hits(self):
+        first = self.parse('h2o')
+        second = self.parse('h2o')
+        self.assertEqual(str(first), str(second))
+        self.assertIsNot(first, second)
+        self.assertIs(first[0], second[0])
+        self.assertEqual((1, 1), (self.cache.hits, self.cache.misses))
+        self.assertEqual(0.5, self.cache.hit_rate)
+
+    def test_engine_key(self):
+        self.parse('h2o')
+        self.parse('h2o', quichem.parser.make_parser('predictive'))
+        self.assertEqual((1, 1), (self.cache.hits, self.cache.misses))
+        self.parse('h2o', quichem.parser.make_parser('incremental'))
+        self.assertEqual((1, 2), (self.cache.hits, self.cache.misses))
+
+    def test_opt_in(self):
+        parser = quichem.parser.make_parser()
+        first = quichem.parser.parse('h2o', parser)
+        second = quichem.parser.parse('h2o', parser)
+        self.assertIsNot(first[0], second[0])
+
+    def test_evicts_least_recently_used(self):
+        self.parse('h2o')
+        self.parse('o2')
+        self.parse('h2o')
+        self.parse('co2')
+        self.assertEqual(2, len(self.cache))
+        self.parse('h2o')
+        self.parse('o2')
+        self.assertEqual((2, 4), (self.cache.hits, self.cache.misses))
+
+    def test_max_bytes(self):
+        self.parse('h2o')
+        self.assertEqual(0, self.cache.size)
+        self.cache = quichem.parser.ParseCache(max_bytes=10 ** 6)
+        self.parse('h2o')
+        size = self.cache.size
+        self.assertGreater(size, 0)
+        self.cache = quichem.parser.ParseCache(max_bytes=size)
+        self.parse('h2o')
+        self.parse('h2o', quichem.parser.make_parser('incremental'))
+        self.assertEqual(1, len(self.cache))
+        self.assertEqual(size, self.cache.size)
+
+    def test_errors_not_cached(self):
+        for _ in range(2):
+            with self.assertRaises(modgrammar.ParseError):
+                self.parse('x')
+        self.assertEqual((0, 2), (self.cache.hits, self.cache.misses))
+        self.assertEqual(0, len(self.cache))
+
+
+class TestDeepNesting(unittest.TestCase):
+
+    DEPTH = 5000
+
+    def setUp(self):
+        self.parser = quichem.parser.make_parser('predictive')
+
+    def test_parse(self):
+        ast = quichem.parser.parse(
+            "'" * self.DEPTH + 'h' + "'2" * self.DEPTH + '=o2', self.parser)
+        self.assertEqual(3, len(ast))
+        counter = ast[0].compound.list_[0]
+        for _ in range(self.DEPTH):
+            self.assertEqual('2', counter.count)
+            counter, = counter.item.list_
+        self.assertEqual('h', counter.item.symbol)
+
+    def test_errors(self):
+        for case in ("'" * self.DEPTH + 'h' + "'2" * (self.DEPTH - 1),
+                     "'" * self.DEPTH + 'h' + "'2" * self.DEPTH + "'"):
+            with self.assertRaises(modgrammar.ParseError):
+                quichem.parser.parse(case, self.parser)
+
+
+class TestParseMany(unittest.TestCase):
+
+    def check(self, results):
+        self.assertEqual(len(TEST_CASES) + 1, len(results))
+        for case, result in zip(TEST_CASES, results):
+            self.assertEqual(TEST_CASES[case], str(result))
+        self.assertIsInstance(results[-1], modgrammar.ParseError)
+
+    def test_workers(self):
+        self.check(list(quichem.parser.parse_many(
+            list(TEST_CASES) + ['x'], jobs=2, chunksize=3)))
+
+    def test_in_process(self):
+        for engine in quichem.parser.ENGINES:
+            self.check(list(quichem.parser.parse_many(
+                list(TEST_CASES) + ['x'], jobs=1, engine=engine)))
+
+    def test_modgrammar_workers(self):
+        self.check(list(quichem.parser.parse_many(
+            list(TEST_CASES) + ['x'], jobs=2, chunksize=3,
+            engine='modgrammar')))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,75 @@
+# This file is part of quichem.
+#
+# quichem is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# quichem is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with quichem.  If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import absolute_import, unicode_literals
+
+import io
+import os
+import shutil
+import tarfile
+import tempfile
+import unittest
+
+from quichem.gui import resources
+
+
+class TestArchive(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def make_archive(self, files, format_=tarfile.USTAR_FORMAT):
+        path = os.path.join(self.directory, 'test.tar')
+        with tarfile.open(path, 'w', format=format_) as tar:
+            for name, data in files.items():
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+        return resources.Archive(path)
+
+    def test_web_archive(self):
+        archive = resources.web_archive()
+        with tarfile.open(archive.path) as tar:
+            for member in tar:
+                if member.isfile():
+                    self.assertEqual(bytes(archive.read(member.name)),
+                                     tar.extractfile(member).read())
+        self.assertIn('web/page.html', archive)
+
+    def test_read(self):
+        files = {'a.txt': b'a' * 1000, 'b/' * 60 + 'c.js': b'',
+                 'd': b'd' * 512}
+        archive = self.make_archive(files)
+        self.assertEqual(sorted(archive.names()), sorted(files))
+        for name, data in files.items():
+            self.assertEqual(bytes(archive.read(name)), data)
+        self.assertNotIn('e', archive)
+        self.assertRaises(KeyError, archive.read, 'e')
+        archive.close()
+        self.assertEqual(bytes(archive.read('d')), b'd' * 512)
+
+    def test_extended_headers(self):
+        files = {'x' * 200: b'long', '\u00e9.txt': b'pax'}
+        archive = self.make_archive(files, tarfile.PAX_FORMAT)
+        self.assertEqual(sorted(archive.names()), sorted(files))
+        for name, data in files.items():
+            self.assertEqual(bytes(archive.read(name)), data)
+
+
+if __name__ == '__main__':
+    unittest.main()
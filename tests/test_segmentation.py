@@ -0,0 +1,65 @@
+# This file is part of quichem.
+#
+# quichem is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# quichem is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with quichem.  If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import absolute_import, unicode_literals
+
+import random
+import unittest
+
+import quichem.parser
+
+
+class TestSegmenter(unittest.TestCase):
+
+    def setUp(self):
+        self.segmenter = quichem.parser.SEGMENTER
+
+    def test_matches(self):
+        self.assertEqual(['uuo', 'u'], self.segmenter.matches('uuo'))
+        self.assertEqual(['he', 'h'], self.segmenter.matches('hex'))
+        self.assertEqual(['h'], self.segmenter.matches('hex', end=1))
+        self.assertEqual([], self.segmenter.matches('hex', 2))
+
+    def test_split(self):
+        self.assertEqual((['c', 'ne', 'rg', 'y'], 6),
+                         self.segmenter.split('cnergy'))
+        self.assertEqual((['he'], 2), self.segmenter.split('heg', stops={2}))
+        self.assertIsNone(self.segmenter.split('hex'))
+        self.assertEqual(2, self.segmenter.split_end('hex'))
+
+    def test_segmentations(self):
+        self.assertEqual([['cl', 'i', 'na'], ['c', 'li', 'na']],
+                         quichem.parser.segmentations('clina'))
+        self.assertEqual([['c', 'ne', 'rg', 'y']],
+                         quichem.parser.segmentations('cnergy'))
+        self.assertEqual([], quichem.parser.segmentations('hex'))
+
+    def test_same_as_parser(self):
+        parser = quichem.parser.get_parser()
+        random_ = random.Random(0)
+        symbols = quichem.parser.ELEMENTS.split()
+        for _ in range(200):
+            string = ''.join(random_.choice(symbols)
+                             for _ in range(random_.randint(1, 8)))
+            compound = quichem.parser.parse(string, parser)[0].compound
+            splits = quichem.parser.segmentations(string)
+            self.assertEqual([counter.item.symbol
+                              for counter in compound.list_], splits[0])
+            self.assertEqual((splits[0], len(string)),
+                             self.segmenter.split(string))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+# This file is part of quichem.
+#
+# quichem is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# quichem is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with quichem.  If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import absolute_import, unicode_literals
+
+import http.client
+import json
+import threading
+import unittest
+import urllib.parse
+
+import quichem.tools.serve
+
+
+class TestServer(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = quichem.tools.serve.RenderServer(('127.0.0.1', 0),
+                                                      threads=2)
+        thread = threading.Thread(target=cls.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.connection = http.client.HTTPConnection(
+            *self.server.server_address[:2], timeout=10)
+
+    def tearDown(self):
+        self.connection.close()
+
+    def request(self, method, path, body=None):
+        self.connection.request(method, path, body)
+        response = self.connection.getresponse()
+        return response.status, response.read().decode('utf-8')
+
+    def render(self, string, target='LaTeX_mhchem_V3'):
+        return self.request('GET', '/render?' + urllib.parse.urlencode(
+            {'q': string, 'target': target}))
+
+    def test_render(self):
+        self.assertEqual((200, r'\ce{H^+ + OH^-}'), self.render('h==oh-'))
+        self.assertEqual(
+            (200, 'H<sup>+</sup>&nbsp;+ OH<sup>&#x2212;</sup>'),
+            self.request('GET', '/render?q=h%3D%3Doh-'))
+        self.assertEqual((200, r'\ce{}'), self.render(''))
+
+    def test_errors(self):
+        status, message = self.render('x')
+        self.assertEqual(422, status)
+        self.assertIn('column 1', message)
+        self.assertEqual(400, self.render('h', 'Word')[0])
+        self.assertEqual(400, self.request('GET', '/render')[0])
+        self.assertEqual(404, self.request('GET', '/')[0])
+        self.assertEqual(404, self.request('POST', '/render', '[]')[0])
+
+    def test_batch(self):
+        status, body = self.request('POST', '/batch?target=plain_ASCII',
+                                    json.dumps(['h==oh-', 'x', 'o2;g']))
+        self.assertEqual(200, status)
+        results = json.loads(body)
+        self.assertEqual([{'output': 'H + + OH -'}, {'output': 'O2(g)'}],
+                         results[::2])
+        self.assertEqual(['error'], list(results[1]))
+        for body in ['{"q": "h"}', '[1]', 'h']:
+            self.assertEqual(400, self.request('POST', '/batch', body)[0])
+
+    def test_rejected_body_read(self):
+        for path in ['/batch?target=Word', '/render']:
+            self.assertEqual((200, r'\ce{H2O}'), self.render('h2o'))
+            sock = self.connection.sock
+            self.assertIn(self.request('POST', path, '["h2o"]')[0],
+                          (400, 404))
+            self.assertEqual((200, r'\ce{H2O}'), self.render('h2o'))
+            self.assertIs(sock, self.connection.sock)
+
+    def test_missing_length(self):
+        self.connection.putrequest('POST', '/batch')
+        self.connection.endheaders()
+        response = self.connection.getresponse()
+        response.read()
+        self.assertEqual(411, response.status)
+        self.assertTrue(response.will_close)
+
+    def test_keep_alive(self):
+        self.render('h2o')
+        sock = self.connection.sock
+        self.assertIsNotNone(sock)
+        self.render('h2o2')
+        self.assertIs(sock, self.connection.sock)
+
+    def test_cache(self):
+        cache = self.server.cache
+        hits = cache.hits
+        for _ in range(3):
+            self.assertEqual((200, r'\ce{NaCl _{(aq)}}'),
+                             self.render('nacl;aq'))
+        self.assertEqual(hits + 2, cache.hits)
+
+
+class TestResponseCache(unittest.TestCase):
+
+    def test_eviction(self):
+        cache = quichem.tools.serve.ResponseCache(2)
+        cache.set('a', 'HTML', '1')
+        cache.set('b', 'HTML', '2')
+        self.assertEqual('1', cache.get('a', 'HTML'))
+        cache.set('c', 'HTML', '3')
+        self.assertIsNone(cache.get('b', 'HTML'))
+        self.assertEqual('1', cache.get('a', 'HTML'))
+        self.assertIsNone(cache.get('a', 'plain'))
+        self.assertEqual(2, len(cache))
+
+
+if __name__ == '__main__':
+    unittest.main()
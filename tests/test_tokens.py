@@ -0,0 +1,142 @@
+# This file is part of quichem.
+#
+# quichem is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# quichem is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with quichem.  If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import absolute_import, unicode_literals
+
+import pickle
+import unittest
+
+import modgrammar
+
+import quichem.compilers.html
+import quichem.compilers.latex
+import quichem.compilers.plain
+import quichem.compilers.rst
+import quichem.parser
+import quichem.tokens
+
+
+CASES = ["h2o", "2h2o;l", "ca'oh'2;s", "2h=o2-2h2o", "so4.2-", "1/2o2",
+         "cuso4/5h2o", "k4fe'cn'6", "nh4=;aq=cl-;aq=,nh4cl;s"]
+COMPILERS = [quichem.compilers.plain.PlainCompiler(),
+             quichem.compilers.plain.PlainAsciiCompiler(),
+             quichem.compilers.html.HtmlCompiler(),
+             quichem.compilers.latex.LatexCompiler(),
+             quichem.compilers.latex.LatexMhchemV3Compiler(),
+             quichem.compilers.rst.RstCompiler()]
+
+
+def walk(ast):
+    """Yield every token in an AST."""
+    pending = list(ast)
+    while pending:
+        token = pending.pop()
+        yield token
+        for name in type(token).__slots__:
+            value = getattr(token, name)
+            if isinstance(value, list):
+                pending.extend(value)
+            elif isinstance(value, quichem.tokens.Token):
+                pending.append(value)
+
+
+class TestToAst(unittest.TestCase):
+
+    def setUp(self):
+        self.parser = quichem.parser.make_parser()
+
+    def parse(self, string):
+        return quichem.parser.parse(string, self.parser, cache=None)
+
+    def test_plain(self):
+        for case in CASES:
+            ast = quichem.tokens.to_ast(self.parse(case))
+            self.assertEqual(str(self.parse(case)), str(ast))
+            for token in walk(ast):
+                self.assertNotIsInstance(token, modgrammar.Grammar)
+                self.assertFalse(hasattr(token, '__dict__'))
+
+    def test_plain_unchanged(self):
+        ast = quichem.tokens.to_ast(self.parse('h2o'))
+        self.assertIs(ast[0], ast[0].detach())
+        ast = quichem.parser.make_parser('predictive').parse_string('h2o')
+        self.assertIs(ast.elements[0], ast.elements[0].detach())
+
+    def test_pickle(self):
+        for case in CASES:
+            ast = quichem.tokens.to_ast(self.parse(case))
+            self.assertEqual(str(ast), str(pickle.loads(pickle.dumps(ast))))
+
+    def test_compilers(self):
+        for case in CASES:
+            tokens = self.parse(case)
+            ast = quichem.tokens.to_ast(tokens)
+            for compiler in COMPILERS:
+                self.assertEqual(compiler.compile(tokens),
+                                 compiler.compile(ast))
+
+    def test_size(self):
+        tokens = self.parse(CASES[-1])
+        self.assertLess(quichem.parser._size(quichem.tokens.to_ast(tokens)),
+                        quichem.parser._size(tokens) / 4)
+
+
+class TestCanonical(unittest.TestCase):
+
+    EQUIVALENT = [('c.mgali', 'cmg.ali'), ('h2=,o2', 'h2,=o2'),
+                  ('h2o', 'h2o1'), ('h2o', '1h2o'), ('2h2', '2/1h2'),
+                  ('na', 'na.0='), ('na=', 'na.1=')]
+
+    def setUp(self):
+        self.parser = quichem.parser.make_parser('predictive')
+
+    def canonical(self, string):
+        return quichem.tokens.canonical(quichem.parser.parse(
+            string, self.parser))
+
+    def test_equivalent(self):
+        for first, second in self.EQUIVALENT:
+            self.assertEqual(self.canonical(first), self.canonical(second))
+            for compiler in COMPILERS:
+                self.assertEqual(
+                    compiler.compile(quichem.parser.parse(first, self.parser)),
+                    compiler.compile(quichem.parser.parse(second,
+                                                          self.parser)))
+
+    def test_distinct(self):
+        keys = {self.canonical(case) for case in CASES}
+        self.assertEqual(len(CASES), len(keys))
+        hash(keys.pop())
+
+    def test_engines(self):
+        parser = quichem.parser.make_parser('modgrammar')
+        for case in CASES:
+            self.assertEqual(self.canonical(case), quichem.tokens.canonical(
+                quichem.parser.parse(case, parser, cache=None)))
+
+    def test_deep_nesting(self):
+        depth = 5000
+        keys = [self.canonical("'" * depth + 'h' + "'2" * depth),
+                self.canonical("'" * depth + 'h1' + "'2." * depth)]
+        self.assertEqual(keys[0], keys[1])
+        self.assertNotEqual(keys[0], self.canonical(
+            "'" * depth + 'h' + "'3" + "'2" * (depth - 1)))
+        ast = quichem.parser.parse("'" * depth + 'h' + "'2" * depth,
+                                   self.parser)
+        self.assertIs(ast[0], quichem.tokens.to_ast(ast)[0])
+
+
+if __name__ == '__main__':
+    unittest.main()